@@ -1,62 +1,16 @@
 import streamlit as st
-from graph import process_vocab_query, generate_workflow_graph
-from models import VocabDatabase
+from models import CHAT_LIST_LIMIT, VocabDatabase
+from vocab_parser import parse_vocab_response
+from spaced_repetition import GRADE_LABELS_ZH
+from metrics import start_metrics_server
+from warmup import start_warmup
 from dotenv import load_dotenv
 import uuid
 
 load_dotenv()
 
-def parse_vocab_response(response: str) -> dict:
-    """解析工具回應的內容,區分是否為結構化單字資訊"""
-    try:
-        lines = response.split('\n')
-        vocab_info = {
-            "is_word": False,  # 預設為非結構化單字
-            "word": None,
-            "definition": None,
-            "examples": [],
-            "part_of_speech": None,
-            "related_words": None,
-            "tips": None,
-            "content": response  # 保存原始回應
-        }
-        
-        # 檢查是否包含結構化單字資訊的關鍵標記
-        if "單字：" in response and "定義：" in response:
-            vocab_info["is_word"] = True
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line == "---":
-                    continue
-                    
-                if line.startswith("單字："):
-                    vocab_info["word"] = line.replace("單字：", "").strip()
-                elif line.startswith("詞性："):
-                    vocab_info["part_of_speech"] = line.replace("詞性：", "").strip()
-                elif line.startswith("定義："):
-                    vocab_info["definition"] = line.replace("定義：", "").strip()
-                elif line.startswith("相關詞彙："):
-                    vocab_info["related_words"] = line.replace("相關詞彙：", "").strip()
-                elif line.startswith("使用建議："):
-                    vocab_info["tips"] = line.replace("使用建議：", "").strip()
-                elif line.startswith("-> "):
-                    example = line.replace("-> ", "").strip()
-                    vocab_info["examples"].append(example)
-                elif line.startswith("   (中文翻譯：") and line.endswith(")"):
-                    if vocab_info["examples"]:
-                        translation = line.replace("   (中文翻譯：", "").rstrip(")")
-                        last_example = vocab_info["examples"][-1]
-                        vocab_info["examples"][-1] = f"{last_example}\n{translation}"
-                        
-        return vocab_info
-        
-    except Exception as e:
-        print(f"解析錯誤：{str(e)}")
-        return {
-            "is_word": False,
-            "content": response
-        }
+# Prometheus 指標端點（重複 rerun 不會重複啟動）
+start_metrics_server()
 
 # 初始化資料庫
 db = VocabDatabase()
@@ -67,6 +21,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# 在背景預熱（載入工作流程、資料庫、檢索器），登入畫面不必等它完成；
+# 透過 serve.py 啟動時預熱已在伺服器啟動前完成，這裡不會重複執行
+start_warmup()
+
 # 簡化的用戶管理
 if 'username' not in st.session_state:
     st.session_state.username = None
@@ -91,7 +49,7 @@ else:
         st.title(f"Hi! {st.session_state.username}~ 👋")
         app_mode = st.selectbox(
             "選擇功能",
-            ["聊天學習", "我的單字本", "使用指南", "系統架構"]
+            ["聊天學習", "我的單字本", "單字複習", "使用指南", "系統架構"]
         )
 
         if st.button("登出"):
@@ -102,6 +60,10 @@ else:
                 del st.session_state.messages
             if "current_chat_id" in st.session_state:
                 del st.session_state.current_chat_id
+            if "review_queue" in st.session_state:
+                del st.session_state.review_queue
+            if "chat_list_limit" in st.session_state:
+                del st.session_state.chat_list_limit
             st.rerun()
 
     # 主要功能區域
@@ -110,8 +72,8 @@ else:
         
         # 初始化聊天管理
         if "current_chat_id" not in st.session_state:
-            # 獲取用戶的聊天列表
-            user_chats = db.get_user_chats(st.session_state.user_id)
+            # 只需要最新的一個聊天
+            user_chats = db.get_user_chats(st.session_state.user_id, limit=1)
             if not user_chats:
                 # 如果用戶沒有聊天記錄，創建第一個聊天
                 chat_id = str(uuid.uuid4())  # 使用 UUID 生成唯一ID
@@ -129,8 +91,12 @@ else:
             # 聊天管理
             st.markdown("### 聊天管理")
             
-            # 獲取用戶的所有聊天
-            user_chats = db.get_user_chats(st.session_state.user_id)
+            # 獲取用戶最近的聊天；多取一筆用來判斷是否還有更早的聊天
+            if "chat_list_limit" not in st.session_state:
+                st.session_state.chat_list_limit = CHAT_LIST_LIMIT
+            user_chats = db.get_user_chats(st.session_state.user_id, limit=st.session_state.chat_list_limit + 1)
+            has_more_chats = len(user_chats) > st.session_state.chat_list_limit
+            user_chats = user_chats[:st.session_state.chat_list_limit]
             
             # 下拉式選單選擇聊天
             chat_options = {chat["id"]: chat["name"] for chat in user_chats}
@@ -163,6 +129,10 @@ else:
                 if new_chat_name != current_chat_name:
                     if db.update_chat_name(selected_chat, new_chat_name):
                         st.rerun()
+
+            if has_more_chats and st.button("顯示更多聊天", key="more_chats_button"):
+                st.session_state.chat_list_limit += CHAT_LIST_LIMIT
+                st.rerun()
             
             # 新增和刪除按鈕並排
             button_container = st.container()
@@ -171,7 +141,7 @@ else:
                 with col1:
                     if st.button("➕", key="new_chat_button", help="新增聊天"):
                         # 創建新的聊天會話
-                        chat_count = len(user_chats)
+                        chat_count = db.count_user_chats(st.session_state.user_id) if has_more_chats else len(user_chats)
                         new_chat_name = f"聊天 {chat_count + 1}"
                         new_chat_id = str(uuid.uuid4())  # 使用 UUID 生成唯一ID
                         db.create_chat_session(st.session_state.user_id, new_chat_name, new_chat_id)
@@ -182,7 +152,7 @@ else:
                     if st.button("🗑️", key="delete_chat_button", help="刪除目前的聊天"):
                         if db.delete_chat_session(selected_chat):
                             # 如果刪除成功，更新當前聊天ID
-                            remaining_chats = db.get_user_chats(st.session_state.user_id)
+                            remaining_chats = db.get_user_chats(st.session_state.user_id, limit=1)
                             if remaining_chats:
                                 st.session_state.current_chat_id = remaining_chats[0]["id"]
                             else:
@@ -278,6 +248,7 @@ else:
             with st.chat_message("assistant"):
                 with st.spinner("撰寫中..."):
                     try:
+                        from graph import process_vocab_query
                         response = process_vocab_query(user_query)
                         parsed_response = parse_vocab_response(response)
 
@@ -345,6 +316,8 @@ else:
                                 st.write(f"- {example}")
                         if vocab['notes']:
                             st.write(f"**筆記:** {vocab['notes']}")
+                        if vocab.get('personal_notes'):
+                            st.write(f"**個人筆記:** {vocab['personal_notes']}")
                     
                     with col2:
                         if st.button("🗑️", key=f"delete_{vocab['word']}", help="刪除這個單字"):
@@ -356,6 +329,45 @@ else:
         else:
             st.info("還沒有儲存的單字。開始聊天學習來添加新單字吧！")
 
+    elif app_mode == "單字複習":
+        st.title("🔁 單字複習")
+
+        # 一次取出最多 20 個到期的單字，複習完再取下一批
+        if not st.session_state.get("review_queue"):
+            st.session_state.review_queue = db.get_due_vocabulary(st.session_state.user_id, limit=20)
+            st.session_state.review_revealed = False
+
+        review_queue = st.session_state.review_queue
+        if not review_queue:
+            st.info("目前沒有需要複習的單字，晚點再回來吧！")
+        else:
+            vocab = review_queue[0]
+            st.caption(f"本輪剩下 {len(review_queue)} 個單字")
+            st.subheader(vocab["word"])
+
+            if not st.session_state.get("review_revealed"):
+                if st.button("顯示答案"):
+                    st.session_state.review_revealed = True
+                    st.rerun()
+            else:
+                st.write(f"**定義:** {vocab['definition']}")
+                if vocab["examples"]:
+                    st.write("**例句:**")
+                    for example in vocab["examples"]:
+                        st.write(f"- {example}")
+                if vocab["notes"]:
+                    st.write(f"**筆記:** {vocab['notes']}")
+
+                st.write("你記得這個單字嗎？")
+                columns = st.columns(len(GRADE_LABELS_ZH))
+                for column, (grade, label) in zip(columns, GRADE_LABELS_ZH.items()):
+                    with column:
+                        if st.button(label, key=f"review_{grade}", use_container_width=True):
+                            db.record_review(st.session_state.user_id, vocab["key"], grade, vocab["review"])
+                            review_queue.pop(0)
+                            st.session_state.review_revealed = False
+                            st.rerun()
+
     elif app_mode == "使用指南":
         st.title("💡 使用指南")
         st.markdown("""
@@ -414,5 +426,6 @@ else:
         LangGraph 流程圖
         """)
         # 顯示系統架構圖
+        from graph import generate_workflow_graph
         dot = generate_workflow_graph()
         st.graphviz_chart(dot)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""批次查詢：從 JSONL 讀取查詢，並行送進 process_vocab_query，結果與耗時串流寫入 JSONL
+
+輸入每行格式：{"id": "q1", "query": "resilient 是什麼意思", "user_id": "...", "thread_id": "..."}
+（只有 query 是必填；id 預設為行號，thread_id 預設為新的 UUID，也就是沒有聊天歷史）
+
+使用方式：
+    python batch_query.py queries.jsonl results.jsonl --concurrency 8 --resume
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from percentiles import percentile
+
+
+def load_queries(path: str) -> list[dict]:
+    """讀取查詢，補上預設的 id"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_no))
+            item["id"] = str(item["id"])
+            queries.append(item)
+    return queries
+
+
+def load_completed_ids(path: str) -> set[str]:
+    """讀取已成功完成的查詢 id（失敗的會在續跑時重試）"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 上次中斷時可能寫到一半
+                continue
+            if not record.get("error"):
+                completed.add(str(record["id"]))
+    return completed
+
+
+def truncate_partial_line(path: str):
+    """續跑前去掉輸出檔結尾寫到一半的一行，新的結果才不會接在殘缺的內容後面"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if not data or data.endswith(b"\n"):
+            return
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def run_query(item: dict, default_user_id: str) -> dict:
+    """執行單一查詢並記錄耗時"""
+    from langchain_core.messages import HumanMessage
+    from graph import process_vocab_query
+
+    query_data = {
+        "messages": [HumanMessage(content=item["query"])],
+        "user_id": item.get("user_id") or default_user_id,
+        "thread_id": item.get("thread_id") or str(uuid.uuid4()),
+    }
+    record = {
+        "id": item["id"],
+        "query": item["query"],
+        "started_at": str(datetime.now()),
+    }
+    start = time.perf_counter()
+    try:
+        record["response"] = process_vocab_query(query_data)
+        record["error"] = None
+    except Exception as e:
+        record["response"] = None
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+    record["elapsed"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="批次執行 VocabVoyage 查詢")
+    parser.add_argument("input", help="查詢 JSONL 檔案")
+    parser.add_argument("output", help="結果 JSONL 檔案（串流寫入）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時執行的查詢數")
+    parser.add_argument("--resume", action="store_true", help="略過輸出檔中已成功完成的查詢")
+    parser.add_argument("--user-id", default="batch", help="查詢未指定 user_id 時使用的用戶")
+    args = parser.parse_args(argv)
+
+    queries = load_queries(args.input)
+    if args.resume:
+        truncate_partial_line(args.output)
+        completed = load_completed_ids(args.output)
+        queries = [item for item in queries if item["id"] not in completed]
+        print(f"續跑：略過 {len(completed)} 筆已完成的查詢")
+    print(f"共 {len(queries)} 筆查詢，並行數 {args.concurrency}")
+
+    write_lock = threading.Lock()
+    elapsed = []
+    errors = 0
+    start = time.perf_counter()
+    with open(args.output, "a" if args.resume else "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run_query, item, args.user_id) for item in queries]
+        for done, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            elapsed.append(record["elapsed"])
+            if record["error"]:
+                errors += 1
+            print(f"[{done}/{len(queries)}] {record['id']} {record['elapsed']:.2f}s"
+                  + (f" 錯誤：{record['error']}" if record["error"] else ""))
+
+    total = time.perf_counter() - start
+    print(json.dumps({
+        "queries": len(queries),
+        "errors": errors,
+        "wall_time": round(total, 3),
+        "throughput_qps": round(len(queries) / total, 3) if total > 0 else 0.0,
+        "latency_p50": percentile(elapsed, 50),
+        "latency_p95": percentile(elapsed, 95),
+        "latency_max": max(elapsed) if elapsed else 0.0,
+    }, ensure_ascii=False))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
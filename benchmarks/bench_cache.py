@@ -0,0 +1,76 @@
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.harness import measure
+from cache import MemoryBackend, RedisBackend, SharedCache, SQLiteBackend
+from fake_redis import FakeRedisServer
+
+VALUE = ("deadline｜名詞｜截止期限｜" * 40).encode("utf-8")
+
+
+def _backend_results(name: str, backend, iterations: int) -> dict:
+    cache = SharedCache("bench", backend=backend)
+    cache.set_bytes("hot", VALUE)
+    counter = iter(range(10 ** 9))
+    return {
+        f"cache.{name}.get_hit": measure(lambda: cache.get_bytes("hot"), iterations * 10),
+        f"cache.{name}.get_miss": measure(lambda: cache.get_bytes("missing"), iterations * 10),
+        f"cache.{name}.set": measure(lambda: cache.set_bytes(f"k{next(counter)}", VALUE), iterations * 10),
+    }
+
+
+def _stampede(backend, callers: int = 16, compute_seconds: float = 0.05) -> dict:
+    """兩個「副本」（各自的 SharedCache）同時有 callers 個請求未命中同一個鍵，量測實際計算次數"""
+    replicas = [SharedCache("stampede", backend=backend), SharedCache("stampede", backend=backend)]
+    computations = []
+
+    def compute():
+        computations.append(1)
+        time.sleep(compute_seconds)
+        return {"word": "deadline"}
+
+    barrier = threading.Barrier(callers)
+
+    def caller(i: int):
+        barrier.wait()
+        replicas[i % 2].get_or_compute("deadline", compute)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = round((time.perf_counter() - start) * 1000, 4)
+    return {
+        "iterations": callers,
+        "concurrency": callers,
+        "mean_ms": elapsed,
+        "p50_ms": elapsed,
+        "p95_ms": elapsed,
+        "p99_ms": elapsed,
+        "max_ms": elapsed,
+        "throughput_ops": round(callers / elapsed * 1000, 2),
+        "computations": len(computations),
+    }
+
+
+def run(iterations: int) -> dict:
+    """三種後端的讀寫延遲，以及跨副本同時未命中時的擊穿保護"""
+    server = FakeRedisServer().start()
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            "memory": MemoryBackend(),
+            "sqlite": SQLiteBackend(os.path.join(directory, "cache.db")),
+            "redis": RedisBackend(port=server.port),
+        }
+        results = {}
+        try:
+            for name, backend in backends.items():
+                results.update(_backend_results(name, backend, iterations))
+                results[f"cache.{name}.stampede"] = _stampede(backend)
+        finally:
+            server.stop()
+    return results
@@ -0,0 +1,57 @@
+import tempfile
+import uuid
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import FakeChatModel
+from benchmarks.harness import measure
+from cassette import Cassette, cassette_chat_model
+
+QUERIES = {
+    "word_lookup_llm": "resilient 是什麼意思",
+    "category": "想了解商業相關單字",
+    "direct": "我想學習英文，但不知道從何開始？",
+}
+
+
+def run(graph, iterations: int, llm_latency: float = 0.02, per_token_latency: float = 0.0001) -> dict:
+    """先以假模型（代表真實 API）錄製一輪查詢，再離線重播：立即回傳與重現錄製耗時兩種模式"""
+    directory = tempfile.mkdtemp(prefix="cassettes_")
+    original = graph.create_chat_model
+    user_id = graph.db.get_or_create_user("bench")
+    thread_id = str(uuid.uuid4())
+
+    def use(cassette: Cassette):
+        graph.create_chat_model = lambda purpose: cassette_chat_model(
+            FakeChatModel,
+            cassette=cassette,
+            latency=llm_latency,
+            per_token_latency=per_token_latency,
+            callbacks=[graph.LLMMetricsHandler(purpose)],
+        )
+
+    def query(text: str) -> str:
+        return graph.process_vocab_query({
+            "messages": [HumanMessage(content=text)],
+            "user_id": user_id,
+            "thread_id": thread_id,
+        })
+
+    results = {}
+    try:
+        use(Cassette(directory, "record"))
+        recorded = {name: query(text) for name, text in QUERIES.items()}
+        for name, text in QUERIES.items():
+            results[f"cassette.record.{name}"] = measure(lambda t=text: query(t), iterations)
+
+        for mode, scale in (("replay_instant", 0.0), ("replay_timed", 1.0)):
+            cassette = Cassette(directory, "replay", latency_scale=scale)
+            use(cassette)
+            for name, text in QUERIES.items():
+                stats = measure(lambda t=text: query(t), iterations)
+                stats["identical"] = query(text) == recorded[name]
+                results[f"cassette.{mode}.{name}"] = stats
+            results[f"cassette.{mode}.{name}"]["hits"] = cassette.stats()["hits"]
+    finally:
+        graph.create_chat_model = original
+    return results
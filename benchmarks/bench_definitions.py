@@ -0,0 +1,69 @@
+import json
+
+from benchmarks.harness import measure
+from fake_firebase import FakeDatabase
+from models import VocabDatabase
+
+NOTES = "`詞性: 名詞`\n`相關詞彙: due date, time limit, cutoff`\n`使用建議: 常用於工作與學業情境，" + "說明" * 120 + "`"
+
+
+def _seed(users: int, words: int) -> tuple[FakeDatabase, VocabDatabase, list[str]]:
+    """users 位用戶都收藏同樣 words 個熱門單字（先以舊格式內嵌寫入，之後再遷移）"""
+    fake = FakeDatabase(count_bytes=True)
+    db = VocabDatabase(fake.reference())
+    user_ids = []
+    for u in range(users):
+        user_id = fake.push_id()
+        user_ids.append(user_id)
+        fake.load(f"vocabulary/{user_id}", {
+            fake.push_id(): {
+                "word": f"word{i}",
+                "definition": f"定義 {i}：在規定時間之前必須完成的期限",
+                "examples": [f"The deadline for word{i} is tomorrow.", f"We met the word{i} deadline."],
+                "notes": NOTES,
+                "created_at": "2024-01-01 00:00:00",
+            }
+            for i in range(words)
+        })
+    return fake, db, user_ids
+
+
+def _stored_bytes(fake: FakeDatabase) -> int:
+    data = fake.reference().get()
+    return len(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _read_cost(fake: FakeDatabase, fn) -> dict:
+    fake.reset_stats()
+    fn()
+    stats = fake.stats()
+    return {"bytes_read": stats["bytes_read"], "round_trips": stats["round_trips"]}
+
+
+def run(iterations: int, users: int = 50, words: int = 100) -> dict:
+    """同樣的熱門單字被許多用戶收藏時：內嵌定義與共用 definitions/{hash} 的儲存量、讀取傳輸量與延遲"""
+    fake, db, user_ids = _seed(users, words)
+    user_id = user_ids[0]
+    results = {}
+
+    inline_stored = _stored_bytes(fake)
+    results["definitions.inline.get_user_vocabulary"] = measure(lambda: db.get_user_vocabulary(user_id), iterations)
+    results["definitions.inline.get_user_vocabulary"].update(
+        _read_cost(fake, lambda: db.get_user_vocabulary(user_id)), stored_bytes=inline_stored)
+
+    for uid in user_ids:
+        db.migrate_user_definitions(uid)
+    shared_stored = _stored_bytes(fake)
+
+    # 冷快取：新的 VocabDatabase（例如剛啟動的副本）第一次讀取
+    cold = VocabDatabase(fake.reference())
+    results["definitions.shared.get_user_vocabulary.cold"] = _read_cost(fake, lambda: cold.get_user_vocabulary(user_id))
+    results["definitions.shared.get_user_vocabulary.cold"].update(
+        measure(lambda: VocabDatabase(fake.reference()).get_user_vocabulary(user_id), iterations),
+        stored_bytes=shared_stored)
+    # 熱快取：另一位收藏相同單字的用戶，定義已在快取中
+    results["definitions.shared.get_user_vocabulary.warm"] = measure(
+        lambda: cold.get_user_vocabulary(user_ids[1]), iterations)
+    results["definitions.shared.get_user_vocabulary.warm"].update(
+        _read_cost(fake, lambda: cold.get_user_vocabulary(user_ids[1])), stored_bytes=shared_stored)
+    return results
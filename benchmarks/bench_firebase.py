@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.harness import measure
+from fake_firebase import FakeDatabase
+from models import CHAT_LIST_LIMIT, VocabDatabase
+
+
+def _actions(db: VocabDatabase, user_id: str, chat_id: str) -> dict:
+    """模擬 app.py 中每個用戶操作所呼叫的資料庫方法"""
+    counter = iter(range(10 ** 9))
+
+    def login():
+        db.get_or_create_user("bench")
+
+    def open_chat_page():
+        # 側邊欄每次 rerun 都會讀最近的聊天列表，主畫面讀取訊息
+        db.get_user_chats(user_id, limit=CHAT_LIST_LIMIT + 1)
+        db.get_chat_messages(chat_id)
+
+    def send_message():
+        db.add_chat_message(chat_id, "user", "resilient 是什麼意思")
+        db.add_chat_message(chat_id, "assistant", "單字：resilient")
+
+    def save_word():
+        db.add_vocabulary(user_id, f"word{next(counter)}", "定義", ["example"], "notes")
+
+    def open_notebook():
+        db.get_user_vocabulary(user_id)
+
+    def rename_chat():
+        db.update_chat_name(chat_id, f"聊天 {next(counter)}")
+
+    def new_and_delete_chat():
+        new_chat = db.create_chat_session(user_id, "tmp", str(uuid.uuid4()))
+        db.delete_chat_session(new_chat)
+
+    return {
+        "login": login,
+        "open_chat_page": open_chat_page,
+        "send_message": send_message,
+        "save_word": save_word,
+        "open_notebook": open_notebook,
+        "rename_chat": rename_chat,
+        "new_and_delete_chat": new_and_delete_chat,
+    }
+
+
+def _seed(fake: FakeDatabase, users: int, messages: int, chats: int = 1) -> tuple[VocabDatabase, str, str]:
+    """以 load() 直接建立大量資料（不計來回）；測試用戶有 chats 個聊天"""
+    db = VocabDatabase(fake.reference())
+    start = datetime(2024, 1, 1)
+    user_ids = [fake.push_id() for _ in range(users)]
+    fake.load("users", {uid: {"username": f"user{i}", "created_at": str(start)} for i, uid in enumerate(user_ids)})
+    user_id = user_ids[-1]
+    fake.load(f"users/{user_id}/username", "bench")
+
+    chat_id = str(uuid.uuid4())
+    fake.load("chats", {
+        uid: {str(uuid.uuid4()): {"name": "聊天 1", "created_at": str(start)}} for uid in user_ids[:-1]
+    })
+    fake.load(f"chats/{user_id}", {
+        str(uuid.uuid4()): {
+            "name": f"聊天 {i + 2}",
+            "created_at": str(start + timedelta(minutes=i + 1)),
+            "created_ts": int((start + timedelta(minutes=i + 1)).timestamp() * 1000),
+        }
+        for i in range(chats - 1)
+    })
+    fake.load(f"chats/{user_id}/{chat_id}", {
+        "name": "聊天 1", "created_at": str(start), "created_ts": int(start.timestamp() * 1000)
+    })
+    fake.load(f"messages/{chat_id}", {
+        fake.push_id(): {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i}",
+            "created_at": str(start + timedelta(seconds=i)),
+        }
+        for i in range(messages)
+    })
+    return db, user_id, chat_id
+
+
+def run(iterations: int, latency: float = 0.001, scale_messages: int = 100_000) -> dict:
+    """每個用戶操作的資料庫來回次數，以及 10 萬則訊息時的延遲"""
+    results = {}
+
+    fake = FakeDatabase(latency=latency)
+    db, user_id, chat_id = _seed(fake, users=100, messages=20)
+    for name, action in _actions(db, user_id, chat_id).items():
+        fake.reset_stats()
+        action()
+        round_trips = fake.stats()["round_trips"]
+        stats = measure(action, iterations)
+        stats["round_trips"] = round_trips
+        results[f"firebase.action.{name}"] = stats
+
+    fake = FakeDatabase(latency=latency)
+    db, user_id, chat_id = _seed(fake, users=1000, messages=scale_messages, chats=500)
+    scale_iterations = max(1, iterations // 5)
+    results["firebase.scale.get_chat_messages"] = measure(
+        lambda: db.get_chat_messages(chat_id), scale_iterations, warmup=0
+    )
+    # 500 個聊天：全部讀取與側邊欄只讀最近的 CHAT_LIST_LIMIT + 1 筆
+    results["firebase.scale.get_user_chats"] = measure(lambda: db.get_user_chats(user_id), iterations)
+    results["firebase.scale.get_user_chats_recent"] = measure(
+        lambda: db.get_user_chats(user_id, limit=CHAT_LIST_LIMIT + 1), iterations
+    )
+    results["firebase.scale.update_chat_name"] = measure(
+        lambda: db.update_chat_name(chat_id, "renamed"), scale_iterations, warmup=0
+    )
+
+    print("\n每個操作的資料庫來回次數：")
+    for name, stats in results.items():
+        if "round_trips" in stats:
+            print(f"  {name.replace('firebase.action.', ''):<22}{stats['round_trips']}")
+    return results
@@ -0,0 +1,85 @@
+import uuid
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.harness import measure
+
+QUERIES = {
+    "word_lookup_lexicon": "deadline 是什麼意思",
+    "word_lookup_llm": "resilient 是什麼意思",
+    "category": "想了解商業相關單字",
+    "category_unseen": "天文學相關單字",
+    "quiz": "我想測驗科技相關的單字",
+    "direct": "我想學習英文，但不知道從何開始？",
+}
+
+
+def run(graph, iterations: int) -> dict:
+    """process_vocab_query 端到端與各工具"""
+    results = {}
+    user_id = graph.db.get_or_create_user("bench")
+    thread_id = str(uuid.uuid4())
+    graph.db.create_chat_session(user_id, "bench", thread_id)
+    for role, content in [("user", "hello"), ("assistant", "hi " * 200)] * 3:
+        graph.db.add_chat_message(thread_id, role, content)
+
+    for name, query in QUERIES.items():
+        query_data = {
+            "messages": [HumanMessage(content=query)],
+            "user_id": user_id,
+            "thread_id": thread_id,
+        }
+        results[f"process_vocab_query.{name}"] = measure(
+            lambda q=query_data: graph.process_vocab_query(q), iterations
+        )
+
+    results["process_vocab_query.direct.concurrent8"] = measure(
+        lambda: graph.process_vocab_query({
+            "messages": [HumanMessage(content=QUERIES["direct"])],
+            "user_id": user_id,
+            "thread_id": thread_id,
+        }),
+        iterations * 2,
+        concurrency=8,
+    )
+
+    # A/B：不需工具的問題由路由器一次回答（single_pass）與原本的兩次呼叫比較
+    for mode in ("two_pass", "single_pass"):
+        graph.ROUTER_MODE = mode
+        for name in ("direct", "word_lookup_llm"):
+            results[f"router_mode.{mode}.{name}"] = measure(
+                lambda q=QUERIES[name]: graph.process_vocab_query({
+                    "messages": [HumanMessage(content=q)],
+                    "user_id": user_id,
+                    "thread_id": thread_id,
+                }),
+                iterations,
+            )
+    graph.ROUTER_MODE = "two_pass"
+
+    # 推測執行：路由器呼叫的同時先跑預判的路徑
+    for enabled in (False, True):
+        graph.SPECULATION = enabled
+        label = "on" if enabled else "off"
+        for name in ("direct", "word_lookup_llm", "category"):
+            results[f"speculation.{label}.{name}"] = measure(
+                lambda q=QUERIES[name]: graph.process_vocab_query({
+                    "messages": [HumanMessage(content=q)],
+                    "user_id": user_id,
+                    "thread_id": thread_id,
+                }),
+                iterations,
+            )
+    graph.SPECULATION = False
+
+    results["tool.search_vocabulary.lexicon"] = measure(lambda: graph.search_vocabulary("deadline"), iterations)
+    results["tool.search_vocabulary.llm"] = measure(lambda: graph.search_vocabulary("resilient"), iterations)
+    results["tool.get_category_vocabulary"] = measure(lambda: graph.get_category_vocabulary("商業"), iterations)
+    results["tool.get_category_vocabulary.unseen"] = measure(
+        lambda: graph.get_category_vocabulary("天文學"), iterations
+    )
+    results["tool.generate_quiz"] = measure(lambda: graph.generate_quiz("科技"), iterations)
+    results["get_recent_chat_history"] = measure(
+        lambda: graph.get_recent_chat_history(thread_id), iterations * 5
+    )
+    return results
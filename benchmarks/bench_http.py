@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from benchmarks.harness import measure
+from http_client import HTTP_CONNECTIONS, create_http_client, model_client_kwargs
+
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "單字：resilient"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """模擬 OpenAI chat completions 端點的 HTTP/1.1 keep-alive 伺服器"""
+
+    protocol_version = "HTTP/1.1"
+    # 標頭與內容一起送出，避免 Nagle 與延遲 ACK 造成每次約 40 ms 的等待
+    wbufsize = 64 * 1024
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(COMPLETION).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _connections() -> tuple[float, float]:
+    return HTTP_CONNECTIONS.labels("new").get(), HTTP_CONNECTIONS.labels("reused").get()
+
+
+def _with_connections(fn, iterations: int) -> dict:
+    new_before, reused_before = _connections()
+    stats = measure(fn, iterations)
+    new_after, reused_after = _connections()
+    stats["new_connections"] = int(new_after - new_before)
+    stats["reused_connections"] = int(reused_after - reused_before)
+    return stats
+
+
+def run(iterations: int) -> dict:
+    """每次呼叫新建客戶端（原本每個模型實例各自建立）與共用連線池的比較"""
+    from langchain_openai import ChatOpenAI
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    url = f"{base_url}/chat/completions"
+    iterations = iterations * 5
+    results = {}
+    try:
+        def new_client():
+            with create_http_client(http2=False) as client:
+                client.post(url, json={}).read()
+
+        shared = create_http_client(http2=False)
+        results["http.post.new_client"] = _with_connections(new_client, iterations)
+        results["http.post.shared_pool"] = _with_connections(lambda: shared.post(url, json={}).read(), iterations)
+        shared.close()
+
+        # 與 graph.create_chat_model 相同：每次請求建立新的 ChatOpenAI
+        def chat(**kwargs):
+            return ChatOpenAI(model="gpt-4o-mini", base_url=base_url, api_key="bench", **kwargs).invoke("hi")
+
+        results["http.chat_openai.default_client"] = measure(lambda: chat(), iterations)
+        results["http.chat_openai.own_client"] = measure(lambda: chat(http_client=httpx.Client()), iterations)
+        results["http.chat_openai.shared_pool"] = _with_connections(lambda: chat(**model_client_kwargs()), iterations)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
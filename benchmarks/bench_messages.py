@@ -0,0 +1,71 @@
+import base64
+import uuid
+import zlib
+
+import models
+from benchmarks.harness import measure
+from fake_firebase import FakeDatabase
+from lexicon import load_lexicon
+from models import VocabDatabase, decode_message_content, encode_message_content
+from quiz_builder import build_quiz
+
+
+def _conversation(turns: int) -> list[tuple[str, str]]:
+    """交替的短提問與長回覆：測驗、類別單字表（多 KB 的 markdown）與單字卡"""
+    lexicon = load_lexicon()
+    topics = list(lexicon.topics)
+    messages = []
+    for i in range(turns):
+        topic = topics[i % len(topics)]
+        if i % 3 == 0:
+            messages.append(("user", f"給我一個{topic}的測驗"))
+            messages.append(("assistant", build_quiz(lexicon, topic, seed=i)))
+        elif i % 3 == 1:
+            messages.append(("user", f"{topic}相關的單字有哪些"))
+            messages.append(("assistant", lexicon.topics[topic]["content"]))
+        else:
+            messages.append(("user", "deadline 是什麼意思"))
+            messages.append(("assistant", "單字：deadline\n詞性：名詞\n定義：截止期限\n例句：\n1. The deadline is Friday."))
+    return messages
+
+
+def _chat(threshold: int, conversation: list[tuple[str, str]]) -> tuple[FakeDatabase, VocabDatabase, str]:
+    models.MESSAGE_COMPRESS_THRESHOLD = threshold
+    fake = FakeDatabase(count_bytes=True)
+    db = VocabDatabase(fake.reference())
+    chat_id = str(uuid.uuid4())
+    for role, content in conversation:
+        db.add_chat_message(chat_id, role, content)
+    return fake, db, chat_id
+
+
+def run(iterations: int, turns: int = 30) -> dict:
+    """每次 rerun 載入一個聊天：壓縮與否的下載位元組數、讀取延遲，以及單則訊息的解壓縮成本"""
+    conversation = _conversation(turns)
+    original_threshold = models.MESSAGE_COMPRESS_THRESHOLD
+    results = {}
+    try:
+        for name, threshold in (("plain", 0), ("compressed", original_threshold or 1024)):
+            fake, db, chat_id = _chat(threshold, conversation)
+            written = fake.stats()["bytes_written"]
+            stats = measure(lambda: db.get_chat_messages(chat_id), iterations)
+            fake.reset_stats()
+            db.get_chat_messages(chat_id)
+            stats.update(bytes_read=fake.stats()["bytes_read"], bytes_written=written,
+                         messages=len(conversation))
+            results[f"messages.{name}.get_chat_messages"] = stats
+    finally:
+        models.MESSAGE_COMPRESS_THRESHOLD = original_threshold
+
+    longest = max((content for _, content in conversation), key=len)
+    models.MESSAGE_COMPRESS_THRESHOLD = 1
+    try:
+        encoded = encode_message_content(longest)
+    finally:
+        models.MESSAGE_COMPRESS_THRESHOLD = original_threshold
+    results["messages.encode_longest"] = measure(
+        lambda: base64.b64encode(zlib.compress(longest.encode("utf-8"), 6)), iterations * 10)
+    results["messages.decode_longest"] = measure(lambda: decode_message_content(encoded), iterations * 10)
+    results["messages.decode_longest"].update(raw_bytes=len(longest.encode("utf-8")),
+                                              stored_bytes=len(encoded["content"]))
+    return results
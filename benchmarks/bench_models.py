@@ -0,0 +1,55 @@
+import uuid
+
+from benchmarks.harness import measure
+from fake_firebase import FakeDatabase
+from models import VocabDatabase
+
+
+def _seeded_database(words: int, chats: int, messages: int) -> tuple[VocabDatabase, str, str]:
+    db = VocabDatabase(FakeDatabase().reference())
+    user_id = db.get_or_create_user("bench")
+    for i in range(words):
+        db.add_vocabulary(user_id, f"word{i}", f"定義 {i}", [f"example {i}"], f"notes {i}")
+    chat_id = None
+    for i in range(chats):
+        chat_id = db.create_chat_session(user_id, f"聊天 {i + 1}", str(uuid.uuid4()))
+    for i in range(messages):
+        db.add_chat_message(chat_id, "user" if i % 2 == 0 else "assistant", f"message {i} " * 20)
+    return db, user_id, chat_id
+
+
+def run(iterations: int) -> dict:
+    """VocabDatabase 每個方法（記憶體 Firebase 替身）"""
+    results = {}
+    db, user_id, chat_id = _seeded_database(words=200, chats=50, messages=100)
+    counter = iter(range(10 ** 9))
+
+    results["db.get_or_create_user.existing"] = measure(lambda: db.get_or_create_user("bench"), iterations)
+    results["db.get_or_create_user.new"] = measure(
+        lambda: db.get_or_create_user(f"user{next(counter)}"), iterations
+    )
+    results["db.add_vocabulary"] = measure(
+        lambda: db.add_vocabulary(user_id, f"new{next(counter)}", "定義", ["ex"], "notes"), iterations
+    )
+    results["db.get_user_vocabulary"] = measure(lambda: db.get_user_vocabulary(user_id), iterations)
+
+    def add_and_delete():
+        word = f"tmp{next(counter)}"
+        db.add_vocabulary(user_id, word, "定義", [], "")
+        db.delete_vocabulary(user_id, word)
+    results["db.add_then_delete_vocabulary"] = measure(add_and_delete, iterations)
+
+    results["db.create_chat_session"] = measure(
+        lambda: db.create_chat_session(user_id, "bench", str(uuid.uuid4())), iterations
+    )
+    results["db.get_user_chats"] = measure(lambda: db.get_user_chats(user_id), iterations)
+    results["db.add_chat_message"] = measure(lambda: db.add_chat_message(chat_id, "user", "hello"), iterations)
+    results["db.get_chat_messages"] = measure(lambda: db.get_chat_messages(chat_id), iterations)
+    results["db.update_chat_name"] = measure(lambda: db.update_chat_name(chat_id, "renamed"), iterations)
+
+    def create_and_delete_chat():
+        new_chat = db.create_chat_session(user_id, "tmp", str(uuid.uuid4()))
+        db.add_chat_message(new_chat, "user", "hello")
+        db.delete_chat_session(new_chat)
+    results["db.create_then_delete_chat_session"] = measure(create_and_delete_chat, iterations)
+    return results
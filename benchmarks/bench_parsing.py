@@ -0,0 +1,14 @@
+from benchmarks.fakes import SEARCH_CARD
+from benchmarks.harness import measure
+from vocab_parser import parse_vocab_response
+
+QUIZ_RESPONSE = "【第一種：選擇題】(共5題)\n" + "1. 題目\n   A) option\n" * 200
+
+
+def run(iterations: int) -> dict:
+    """parse_vocab_response：單字卡與長篇非單字回應"""
+    card = SEARCH_CARD.format(word="resilient", filler="使用建議 " * 50)
+    return {
+        "parse_vocab_response.word_card": measure(lambda: parse_vocab_response(card), iterations * 50),
+        "parse_vocab_response.long_quiz": measure(lambda: parse_vocab_response(QUIZ_RESPONSE), iterations * 50),
+    }
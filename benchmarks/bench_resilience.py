@@ -0,0 +1,49 @@
+import itertools
+import random
+import time
+
+from benchmarks.harness import measure
+from resilience import CircuitBreaker, ResilientCaller
+
+
+def _heavy_tail(seed: int, fast: float = 0.02, slow: float = 0.4, slow_ratio: float = 0.04):
+    """96% 的請求 20 ms、4% 卡住 400 ms（每次呼叫各自抽樣，對沖的第二個請求通常是快的）"""
+    rng = random.Random(seed)
+    lock_free = iter(rng.random() for _ in itertools.count())
+
+    def call():
+        time.sleep(slow if next(lock_free) < slow_ratio else fast)
+        return "ok"
+    return call
+
+
+def _failing(latency: float = 0.05):
+    def call():
+        time.sleep(latency)
+        raise TimeoutError("provider degraded")
+    return call
+
+
+def run(iterations: int) -> dict:
+    """長尾延遲下的對沖，以及供應商故障時斷路器的快速失敗"""
+    iterations = max(100, iterations * 10)
+    results = {}
+    for name, purposes in (("off", set()), ("on", {"router"})):
+        caller = ResilientCaller(CircuitBreaker(f"bench_hedge_{name}"), hedge_purposes=purposes)
+        call = _heavy_tail(seed=7)
+        # 先累積延遲樣本，讓對沖延遲以 p95 計算
+        for _ in range(50):
+            caller.call("router", call)
+        caller.hedged = 0
+        stats = measure(lambda: caller.call("router", call), iterations)
+        stats["hedge_rate"] = round(caller.hedged / iterations, 3)
+        stats["hedge_delay_ms"] = round(caller.hedge_delay("router") * 1000, 1)
+        results[f"resilience.hedge.{name}"] = stats
+
+    for name, enabled in (("off", False), ("on", True)):
+        breaker = CircuitBreaker(f"bench_breaker_{name}", min_calls=10 if enabled else 10 ** 9)
+        caller = ResilientCaller(breaker, hedge_purposes=set())
+        stats = measure(lambda: caller.call("search", _failing(), fallback=lambda: "cached"), iterations // 2)
+        stats["rejected"] = caller.rejected
+        results[f"resilience.breaker.{name}"] = stats
+    return results
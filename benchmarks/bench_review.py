@@ -0,0 +1,61 @@
+import random
+
+from benchmarks.harness import measure
+from fake_firebase import FakeDatabase
+from models import VocabDatabase
+from spaced_repetition import DAY_MS, new_review_state, now_ms
+
+
+def _seed(fake: FakeDatabase, words: int) -> tuple[VocabDatabase, str]:
+    """建立一個有 words 個單字的用戶，約一成已到期，其餘分散在未來 30 天"""
+    db = VocabDatabase(fake.reference())
+    user_id = fake.push_id()
+    rng = random.Random(42)
+    now = now_ms()
+    vocabulary = {}
+    for i in range(words):
+        review = new_review_state(now)
+        review["due"] = now - rng.randrange(DAY_MS) if i % 10 == 0 else now + rng.randrange(30 * DAY_MS)
+        vocabulary[fake.push_id()] = {
+            "word": f"word{i}",
+            "definition": f"定義 {i}",
+            "examples": [f"example sentence {i}"],
+            "notes": "",
+            "created_at": "2024-01-01 00:00:00",
+            "review": review,
+        }
+    fake.load(f"vocabulary/{user_id}", vocabulary)
+    return db, user_id
+
+
+def _full_scan_due(db: VocabDatabase, user_id: str, limit: int = 20) -> list[dict]:
+    """沒有索引時的做法：讀取整本單字本再篩選排序"""
+    now = now_ms()
+    vocabulary = db.db.child("vocabulary").child(user_id).get() or {}
+    due = [v for v in vocabulary.values() if (v.get("review") or {}).get("due", 0) <= now]
+    return sorted(due, key=lambda v: v["review"]["due"])[:limit]
+
+
+def run(iterations: int, latency: float = 0.001, words: int = 10_000) -> dict:
+    """每位用戶 1 萬個單字時，取得下一批 20 個到期單字與記錄複習"""
+    fake = FakeDatabase(latency=latency)
+    db, user_id = _seed(fake, words)
+    results = {
+        "review.next20_due.range_query": measure(lambda: db.get_due_vocabulary(user_id, limit=20), iterations),
+        "review.next20_due.full_scan": measure(lambda: _full_scan_due(db, user_id), max(1, iterations // 2)),
+    }
+    # 每次傳回的單字數（真實 Firebase 上決定傳輸量）
+    results["review.next20_due.range_query"]["rows"] = len(db.get_due_vocabulary(user_id, limit=20))
+    results["review.next20_due.full_scan"]["rows"] = words
+
+    due = db.get_due_vocabulary(user_id, limit=iterations + 1)
+    cards = iter(due)
+
+    def review_next():
+        card = next(cards)
+        db.record_review(user_id, card["key"], "good", card["review"])
+
+    fake.reset_stats()
+    results["review.record_review"] = measure(review_next, iterations)
+    results["review.record_review"]["round_trips"] = fake.stats()["round_trips"] / (iterations + 1)
+    return results
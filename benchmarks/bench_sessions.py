@@ -0,0 +1,216 @@
+"""並行使用者負載測試：以 Streamlit AppTest 在同一個行程模擬多個使用者，各自走完
+登入 → 聊天 → 查單字 → 單字本，搭配假 LLM、假嵌入與記憶體資料庫，
+量測每次 rerun 的延遲、單一實例在延遲目標內可承受的並行工作階段數與記憶體成長
+
+使用方式（在專案根目錄執行）：
+    python -m benchmarks.bench_sessions                                  # 並行 1、2、4、8、16 個使用者
+    python -m benchmarks.bench_sessions --sessions 1,8,32 --duration 30 --slo-ms 1500
+"""
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.harness import summarize
+from percentiles import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+# 每次 rerun（含觸發的 st.rerun）最長等待秒數
+RERUN_TIMEOUT = 60
+
+STEPS = ("open", "login", "chat", "lookup", "notebook")
+CHAT_PROMPT = "幫我寫一句關於冒險的英文句子"
+LOOKUP_PROMPT = "resilient 是什麼意思"
+
+_user_counter = itertools.count()
+
+
+def rss_mb() -> float:
+    """目前的常駐記憶體（MB）；沒有 /proc 時改用 ru_maxrss（峰值）"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def concurrent_app_tests():
+    """讓多個 AppTest 可以在不同執行緒同時執行
+
+    AppTest 假設一次只跑一個：每次執行前把 Runtime._instance 換成自己的替身、結束時設回 None，
+    並暫時打開 global.appTest 設定、結束時還原。並行時其他仍在執行的工作階段會因此找不到 Runtime
+    （表單與 session_state 改走「沒有 Runtime」的分支）或在執行到一半時失去測試模式。
+    負載測試期間改為：沒有 Runtime 時回傳一個共用的替身，global.appTest 整段期間保持開啟；
+    所有工作階段也像實際的伺服器一樣共用一個 ScriptCache（app.py 只編譯一次，
+    各自編譯在 Python 3.11 並行時偶爾會出現 AST 編譯錯誤）。
+    """
+    import logging
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import patch_config_options
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    original_instance, original_exists = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+    # 工作階段執行緒本身不是腳本執行緒，建立 AppTest 時的「missing ScriptRunContext」警告可以忽略
+    context_logger = logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context")
+    original_level = context_logger.level
+    context_logger.setLevel(logging.ERROR)
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        Runtime.instance, Runtime.exists = original_instance, original_exists
+        app_test.patch_config_options = patch_config_options
+        local_script_runner.ScriptCache = ScriptCache
+        context_logger.setLevel(original_level)
+
+
+def session_flow() -> list[tuple[str, float]]:
+    """一個使用者的完整流程，回傳 [(步驟, 毫秒)]；任一步驟出現例外時拋出 RuntimeError"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT)
+    username = f"load_user_{next(_user_counter)}"
+    timings = []
+
+    def step(name, action):
+        start = time.perf_counter()
+        action()
+        timings.append((name, (time.perf_counter() - start) * 1000))
+        if app.exception:
+            raise RuntimeError(f"{name}：{app.exception[0].message}")
+
+    step("open", app.run)
+
+    def login():
+        app.text_input[0].input(username)
+        app.button[0].click().run()
+    step("login", login)
+    step("chat", lambda: app.chat_input[0].set_value(CHAT_PROMPT).run())
+    step("lookup", lambda: app.chat_input[0].set_value(LOOKUP_PROMPT).run())
+    step("notebook", lambda: app.sidebar.selectbox[0].select("我的單字本").run())
+    return timings
+
+
+def run_level(sessions: int, flows_per_session: int | None = None, duration: float | None = None) -> dict:
+    """sessions 個使用者並行，每人重複流程 flows_per_session 次或直到 duration 秒"""
+    lock = threading.Lock()
+    timings: dict[str, list[float]] = defaultdict(list)
+    errors: list[str] = []
+    flows = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        nonlocal flows
+        count = 0
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if deadline is None and count >= flows_per_session:
+                break
+            count += 1
+            try:
+                result = session_flow()
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                flows += 1
+                for name, ms in result:
+                    timings[name].append(ms)
+
+    gc.collect()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    # 節點與工具會 print 進度，負載測試時不輸出
+    with contextlib.redirect_stdout(io.StringIO()), concurrent_app_tests():
+        threads = [threading.Thread(target=worker, name=f"session-{i}") for i in range(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+    gc.collect()
+    rss_growth = rss_mb() - rss_before
+
+    reruns = [ms for name in STEPS for ms in timings[name]]
+    stats = summarize(reruns, wall, sessions)
+    stats.update({
+        "flows": flows,
+        "errors": len(errors),
+        "flows_per_s": round(flows / wall, 2) if wall > 0 else 0.0,
+        "rss_growth_mb": round(rss_growth, 1),
+        "rss_per_flow_kb": round(rss_growth * 1024 / flows, 1) if flows else 0.0,
+        "steps_p95_ms": {name: round(percentile(timings[name], 95), 1) for name in STEPS},
+    })
+    if errors:
+        stats["first_error"] = errors[0]
+    return stats
+
+
+def run(iterations: int, levels: tuple[int, ...] = (1, 4)) -> dict:
+    """每個並行數各跑 max(1, iterations // 5) 次流程（先以單一使用者暖機）"""
+    flows = max(1, iterations // 5)
+    run_level(1, flows_per_session=1)
+    return {f"sessions.rerun.c{level}": run_level(level, flows_per_session=flows) for level in levels}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="VocabVoyage 並行使用者負載測試")
+    parser.add_argument("--sessions", default="1,2,4,8,16", help="要測試的並行使用者數，以逗號分隔")
+    parser.add_argument("--duration", type=float, default=10, help="每個並行數持續的秒數")
+    parser.add_argument("--slo-ms", type=float, default=2000, help="rerun p95 延遲目標（毫秒）")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="假 LLM 每次呼叫的固定延遲（秒）")
+    parser.add_argument("--per-token-latency", type=float, default=0.001, help="假 LLM 每個輸出 token 的延遲（秒）")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="假嵌入每次呼叫的延遲（秒）")
+    args = parser.parse_args(argv)
+
+    from benchmarks.fakes import install_fakes
+    install_fakes(args.llm_latency, args.per_token_latency, embed_latency=args.embed_latency)
+
+    levels = [int(level) for level in args.sessions.split(",") if level.strip()]
+    print(f"暖機中（{APP_PATH}）...")
+    run_level(1, flows_per_session=1)
+
+    header = f"{'sessions':>8}{'flows/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'RSS +MB':>10}"
+    print(header)
+    print("-" * len(header))
+    sustained = 0
+    for level in levels:
+        stats = run_level(level, duration=args.duration)
+        print(f"{level:>8}{stats['flows_per_s']:>10.2f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}{stats['errors']:>8}{stats['rss_growth_mb']:>10.1f}")
+        print(f"{'':>8}  各步驟 p95：" + "、".join(f"{k} {v:.0f}ms" for k, v in stats["steps_p95_ms"].items()))
+        if stats.get("first_error"):
+            print(f"{'':>8}  錯誤：{stats['first_error']}")
+        if stats["errors"] == 0 and stats["flows"] and stats["p95_ms"] <= args.slo_ms:
+            sustained = level
+    print(f"\n在 p95 ≤ {args.slo_ms:.0f}ms 且沒有錯誤的情況下，單一實例可承受 {sustained} 個並行使用者")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""啟動時間：在全新的直譯器中量測各階段的 import 時間，並以 -X importtime 統計各套件的成本
+
+使用方式（在專案根目錄執行）：
+    python -m benchmarks.bench_startup            # 輸出各階段的 import 時間分解
+    python -m benchmarks.bench_startup --write    # 同時更新 benchmarks/startup_profile.md
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.harness import measure
+
+PROFILE_PATH = os.path.join(os.path.dirname(__file__), "startup_profile.md")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各階段需要載入的模組
+STAGES = {
+    # app.py 顯示登入畫面前
+    "login": ["streamlit", "models", "metrics", "vocab_parser"],
+    # 第一次查詢前（背景預先載入）
+    "graph": ["graph"],
+    # 第一次呼叫 LLM
+    "llm_client": ["langchain_openai"],
+    # 第一次向量檢索（類別查詢）
+    "vector_store": ["langchain_chroma"],
+    # 「系統架構」頁面
+    "workflow_chart": ["graphviz"],
+}
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("VOCAB_DB_BACKEND", "memory")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def _run(modules: list[str], importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", "; ".join(f"import {m}" for m in modules)]
+    return subprocess.run(command, cwd=ROOT, env=_env(), capture_output=True, text=True, check=True)
+
+
+def import_times(modules: list[str]) -> dict[str, float]:
+    """以 -X importtime 取得每個被載入模組的 self 時間，回傳 {模組: 毫秒}"""
+    times = {}
+    for line in _run(modules, importtime=True).stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_us) / 1000
+    return times
+
+
+def stage_breakdown(loaded: list[str], modules: list[str]) -> dict[str, float]:
+    """在已載入 loaded 的情況下再載入 modules 時，新增的模組依最上層套件加總（由大到小）"""
+    before = set(import_times(loaded)) if loaded else set()
+    totals: dict[str, float] = defaultdict(float)
+    for name, ms in import_times(loaded + modules).items():
+        if name not in before:
+            totals[name.split(".")[0]] += ms
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def run(iterations: int) -> dict:
+    """每個階段在全新直譯器中 import 的牆鐘時間（含直譯器啟動）"""
+    iterations = max(3, iterations // 3)
+    results = {"startup.interpreter": measure(lambda: _run([]), iterations, warmup=1)}
+    for stage, modules in STAGES.items():
+        results[f"startup.import.{stage}"] = measure(lambda m=modules: _run(m), iterations, warmup=1)
+    return results
+
+
+def format_profile(top: int = 12) -> str:
+    lines = ["# 啟動時間分解", "",
+             "由 `python -m benchmarks.bench_startup --write` 產生；數值為 `-X importtime` 的 self 時間加總（毫秒），",
+             "前一階段已載入的模組不重複計算，因此各階段只列出該階段新增的成本。", ""]
+    loaded: list[str] = []
+    for stage, modules in STAGES.items():
+        added = stage_breakdown(loaded, modules)
+        lines.append(f"## {stage}（{', '.join(modules)}）：{sum(added.values()):.0f} ms")
+        lines.append("")
+        lines.append("| 套件 | ms |")
+        lines.append("| --- | ---: |")
+        for name, ms in list(added.items())[:top]:
+            lines.append(f"| {name} | {ms:.1f} |")
+        lines.append("")
+        loaded += modules
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="VocabVoyage 啟動時間分解")
+    parser.add_argument("--write", action="store_true", help=f"寫入 {PROFILE_PATH}")
+    args = parser.parse_args(argv)
+
+    profile = format_profile()
+    print(profile)
+    if args.write:
+        with open(PROFILE_PATH, "w", encoding="utf-8") as f:
+            f.write(profile + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
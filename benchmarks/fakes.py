@@ -0,0 +1,154 @@
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from embeddings import LocalHashEmbeddings
+
+_LATIN_WORD = re.compile(r"[A-Za-z][A-Za-z\- ]*[A-Za-z]")
+
+SEARCH_CARD = """---
+單字：{word}
+詞性：形容詞
+定義：有彈性的；能迅速恢復的
+例句：
+-> She is resilient in the face of challenges.
+    (中文翻譯：她面對挑戰時很有韌性。)
+-> Children are often more resilient than adults.
+    (中文翻譯：孩子往往比大人更能迅速恢復。)
+相關詞彙：resilience（名詞，韌性）、flexible（形容詞，靈活的）
+使用建議：{filler}
+---"""
+
+SEARCH_FILL = """例句：
+-> This is an example sentence.
+    (中文翻譯：這是一個例句。)
+-> Here is another example.
+    (中文翻譯：這是另一個例句。)
+使用建議：{filler}"""
+
+
+def route_query(query: str) -> tuple[str, str] | None:
+    """模擬路由器：依關鍵字決定要呼叫的工具與參數；不需要工具時回傳 None"""
+    if "測驗" in query or "quiz" in query.lower():
+        return "vocabulary_quiz_generator", query
+    if "相關" in query or "領域" in query or "主題" in query:
+        return "category_vocabulary_list", query
+    match = _LATIN_WORD.search(query)
+    if match and any(keyword in query for keyword in ("意思", "是什麼", "查詢", "解釋")):
+        return "search_vocabulary_details", match.group(0)
+    return None
+
+
+class FakeChatModel(BaseChatModel):
+    """可設定延遲與輸出長度的假聊天模型，支援 bind_tools 的路由行為"""
+
+    latency: float = 0.0
+    per_token_latency: float = 0.0
+    output_tokens: int = 200
+    tool_names: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: list, **kwargs: Any):
+        return self.model_copy(update={"tool_names": [tool.name for tool in tools]})
+
+    def _respond(self, messages: list[BaseMessage]) -> AIMessage:
+        prompt = str(messages[-1].content)
+        filler = " ".join(["token"] * self.output_tokens)
+        if self.tool_names:
+            human = [m for m in messages if isinstance(m, HumanMessage)]
+            route = route_query(str(human[-1].content)) if human else None
+            if route and route[0] in self.tool_names:
+                return AIMessage(content="", tool_calls=[{
+                    "name": route[0],
+                    "args": {"__arg1": route[1]},
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                }])
+            # 路由提示要求回傳標記時照做；single_pass 模式下直接回答
+            if "DIRECT_RESPONSE" in str(messages[0].content):
+                return AIMessage(content="DIRECT_RESPONSE")
+            return AIMessage(content=filler)
+
+        if "請只補充例句與使用建議" in prompt:
+            return AIMessage(content=SEARCH_FILL.format(filler=filler))
+        if "單字：[英文單字]" in prompt:
+            match = _LATIN_WORD.search(prompt.split("查詢單字:")[-1])
+            word = match.group(0) if match else "resilient"
+            return AIMessage(content=SEARCH_CARD.format(word=word, filler=filler))
+        return AIMessage(content=filler)
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self._respond(messages)
+        tokens = 0 if message.tool_calls or message.content == "DIRECT_RESPONSE" else self.output_tokens
+        time.sleep(self.latency + tokens * self.per_token_latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeEmbeddings(LocalHashEmbeddings):
+    """在本地雜湊嵌入外加上固定延遲，模擬嵌入 API 呼叫"""
+
+    def __init__(self, latency: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def prepare_environment():
+    """在匯入 graph 之前設定環境：記憶體資料庫、暫存測驗池"""
+    os.environ.setdefault("VOCAB_DB_BACKEND", "memory")
+    os.environ.setdefault("VOCAB_QUIZ_POOL", "0")
+    os.environ.setdefault("VOCAB_QUIZ_POOL_DIR", tempfile.mkdtemp(prefix="quiz_pool_"))
+    os.environ.setdefault("VOCAB_EMBEDDING_PROVIDER", "local")
+
+
+def install_fakes(llm_latency: float = 0.0, per_token_latency: float = 0.0,
+                  output_tokens: int = 200, embed_latency: float = 0.0):
+    """以假模型取代 graph 中的聊天模型與嵌入，並以記憶體中的 Chroma 作為向量檢索"""
+    prepare_environment()
+    import graph
+    from chromadb.config import Settings
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
+    from lexicon import load_lexicon
+
+    graph.create_chat_model = lambda purpose: FakeChatModel(
+        latency=llm_latency,
+        per_token_latency=per_token_latency,
+        output_tokens=output_tokens,
+        callbacks=[graph.LLMMetricsHandler(purpose)],
+    )
+    embeddings = FakeEmbeddings(latency=embed_latency)
+    graph.get_embeddings = lambda *args, **kwargs: embeddings
+
+    documents = [
+        Document(page_content=info["content"], metadata={"topic": topic})
+        for topic, info in load_lexicon().topics.items()
+    ]
+    vectorstore = Chroma.from_documents(
+        documents=documents,
+        embedding=embeddings,
+        collection_name=f"bench_{uuid.uuid4().hex[:8]}",
+        client_settings=Settings(anonymized_telemetry=False),
+    )
+    graph.setup_rag = lambda k=1: vectorstore.as_retriever(
+        search_type="similarity",
+        search_kwargs={"k": k}
+    )
+    graph.hybrid_retriever = None
+    return graph
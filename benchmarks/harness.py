@@ -0,0 +1,97 @@
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from percentiles import percentile
+
+
+def measure(fn: Callable[[], object], iterations: int = 20, warmup: int = 1,
+            concurrency: int = 1) -> dict:
+    """執行 fn 多次，回傳延遲百分位數（毫秒）與吞吐量（次/秒）"""
+    # 工具與節點都會 print 進度，量測時不輸出
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+
+        def timed(_):
+            start = time.perf_counter()
+            fn()
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                latencies = list(executor.map(timed, range(iterations)))
+        else:
+            latencies = [timed(i) for i in range(iterations)]
+        wall = time.perf_counter() - start
+
+    return summarize(latencies, wall, concurrency)
+
+
+def summarize(latencies: list[float], wall: float, concurrency: int = 1) -> dict:
+    """由每次的延遲（毫秒）與總耗時（秒）計算與 measure 相同格式的統計"""
+    iterations = len(latencies)
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "mean_ms": round(sum(latencies) / iterations, 4) if iterations else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 4),
+        "p95_ms": round(percentile(latencies, 95), 4),
+        "p99_ms": round(percentile(latencies, 99), 4),
+        "max_ms": round(max(latencies), 4) if latencies else 0.0,
+        "throughput_ops": round(iterations / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float,
+                     min_delta_ms: float = 1.0) -> list[str]:
+    """p50 延遲比基準慢超過 threshold（比例）且超過 min_delta_ms 才視為退步，避免微秒級量測的雜訊
+
+    並行量測受執行緒排程影響較大，容許範圍加倍。
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base or base["p50_ms"] <= 0:
+            continue
+        allowed = threshold * 2 if stats.get("concurrency", 1) > 1 else threshold
+        ratio = stats["p50_ms"] / base["p50_ms"]
+        if ratio > 1 + allowed and stats["p50_ms"] - base["p50_ms"] > min_delta_ms:
+            regressions.append(
+                f"{name}: p50 {stats['p50_ms']:.3f}ms，基準 {base['p50_ms']:.3f}ms（+{(ratio - 1) * 100:.0f}%）"
+            )
+    return regressions
+
+
+def format_table(results: dict, baseline: dict | None = None) -> str:
+    baseline = baseline or {}
+    header = f"{'benchmark':<42}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'vs base':>10}"
+    lines = [header, "-" * len(header)]
+    for name, stats in results.items():
+        base = baseline.get(name)
+        delta = ""
+        if base and base["p50_ms"] > 0:
+            delta = f"{(stats['p50_ms'] / base['p50_ms'] - 1) * 100:+.0f}%"
+        lines.append(
+            f"{name:<42}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+            f"{stats['p99_ms']:>10.3f}{stats['throughput_ops']:>10.1f}{delta:>10}"
+        )
+    return "\n".join(lines)
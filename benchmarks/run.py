@@ -0,0 +1,127 @@
+"""效能基準測試：以假 LLM、假嵌入與記憶體 Firebase 替身量測延遲與吞吐量
+
+使用方式（在專案根目錄執行）：
+    python -m benchmarks.run                       # 執行並與 benchmarks/baseline.json 比較
+    python -m benchmarks.run --only models         # 只跑名稱包含 models 的套件
+    python -m benchmarks.run --update-baseline     # 以本次結果更新基準
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks import harness
+from benchmarks.fakes import install_fakes, prepare_environment
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SUITES = ["parsing", "models", "firebase", "review", "definitions", "messages", "cache", "http", "resilience", "graph", "cassette", "sessions", "startup"]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="VocabVoyage 效能基準測試")
+    parser.add_argument("--only", action="append", default=[], help="只執行名稱包含此字串的套件，可重複指定")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="假 LLM 每次呼叫的固定延遲（秒）")
+    parser.add_argument("--per-token-latency", type=float, default=0.0001, help="假 LLM 每個輸出 token 的延遲（秒）")
+    parser.add_argument("--output-tokens", type=int, default=200, help="假 LLM 輸出的 token 數")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="假嵌入每次呼叫的延遲（秒）")
+    parser.add_argument("--db-latency", type=float, default=0.001, help="Firebase 替身每次來回的延遲（秒）")
+    parser.add_argument("--scale-messages", type=int, default=100_000, help="規模測試的訊息數")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="p50 比基準慢超過此比例即失敗")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="p50 差距小於此毫秒數不視為退步")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="將結果另存為 JSON")
+    args = parser.parse_args(argv)
+
+    config = {
+        "iterations": args.iterations,
+        "llm_latency": args.llm_latency,
+        "per_token_latency": args.per_token_latency,
+        "output_tokens": args.output_tokens,
+        "embed_latency": args.embed_latency,
+        "db_latency": args.db_latency,
+        "scale_messages": args.scale_messages,
+    }
+    suites = [s for s in SUITES if not args.only or any(o in s for o in args.only)]
+
+    prepare_environment()
+    results = {}
+    for suite in suites:
+        print(f"執行 {suite} ...", file=sys.stderr)
+        if suite == "parsing":
+            from benchmarks import bench_parsing
+            results.update(bench_parsing.run(args.iterations))
+        elif suite == "models":
+            from benchmarks import bench_models
+            results.update(bench_models.run(args.iterations))
+        elif suite == "firebase":
+            from benchmarks import bench_firebase
+            results.update(bench_firebase.run(args.iterations, args.db_latency, args.scale_messages))
+        elif suite == "review":
+            from benchmarks import bench_review
+            results.update(bench_review.run(args.iterations, args.db_latency))
+        elif suite == "definitions":
+            from benchmarks import bench_definitions
+            results.update(bench_definitions.run(args.iterations))
+        elif suite == "messages":
+            from benchmarks import bench_messages
+            results.update(bench_messages.run(args.iterations))
+        elif suite == "http":
+            from benchmarks import bench_http
+            results.update(bench_http.run(args.iterations))
+        elif suite == "resilience":
+            from benchmarks import bench_resilience
+            results.update(bench_resilience.run(args.iterations))
+        elif suite == "cache":
+            from benchmarks import bench_cache
+            results.update(bench_cache.run(args.iterations))
+        elif suite == "graph":
+            from benchmarks import bench_graph
+            graph = install_fakes(args.llm_latency, args.per_token_latency,
+                                  args.output_tokens, args.embed_latency)
+            results.update(bench_graph.run(graph, args.iterations))
+        elif suite == "cassette":
+            from benchmarks import bench_cassette
+            graph = install_fakes(args.llm_latency, args.per_token_latency,
+                                  args.output_tokens, args.embed_latency)
+            results.update(bench_cassette.run(graph, args.iterations, args.llm_latency, args.per_token_latency))
+        elif suite == "sessions":
+            from benchmarks import bench_sessions
+            install_fakes(args.llm_latency, args.per_token_latency, args.output_tokens, args.embed_latency)
+            results.update(bench_sessions.run(args.iterations))
+        elif suite == "startup":
+            from benchmarks import bench_startup
+            results.update(bench_startup.run(args.iterations))
+
+    baseline = harness.load_baseline(args.baseline)
+    comparable = baseline.get("config") == config
+    base_results = baseline.get("results", {}) if comparable else {}
+    print(harness.format_table(results, base_results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        merged = dict(base_results)
+        merged.update(results)
+        harness.save_baseline(args.baseline, {"config": config, "results": merged})
+        print(f"已更新基準：{args.baseline}")
+        return 0
+
+    if baseline and not comparable:
+        print("基準的設定與本次不同，略過退步檢查")
+        return 0
+
+    regressions = harness.find_regressions(results, base_results, args.threshold, args.min_delta_ms)
+    if regressions:
+        print("\n效能退步：")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,535 @@
+"""跨副本共用的快取層：記憶體、SQLite 檔案與 Redis 協定三種後端，支援 TTL、大小上限與防止快取擊穿
+
+VOCAB_CACHE_URL 決定後端：
+    memory://                 單一行程內（預設）
+    sqlite:///path/cache.db   同一台主機或共用磁碟上的多個副本
+    redis://host:6379/0       多個副本共用（可用 fake_redis.FakeRedisServer 在本地測試）
+"""
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Iterator, Sequence
+from urllib.parse import urlparse
+
+from metrics import record_cache
+from singleflight import SingleFlight
+
+CACHE_URL = os.getenv("VOCAB_CACHE_URL", "memory://")
+# 明確設定 VOCAB_CACHE_URL 時，嵌入與 LLM 回應改用共用快取（否則嵌入維持本地檔案快取）
+SHARED_CACHE_CONFIGURED = bool(os.getenv("VOCAB_CACHE_URL"))
+# 哪些用途的 LLM 回應可以快取（單字查詢的結果對相同輸入是穩定的）
+LLM_CACHE_PURPOSES = set(filter(None, os.getenv("VOCAB_LLM_CACHE_PURPOSES", "search,search_fill").split(",")))
+CACHE_MAX_ENTRIES = int(os.getenv("VOCAB_CACHE_MAX_ENTRIES", "10000"))
+# 超過此大小的值不寫入快取
+CACHE_MAX_VALUE_BYTES = int(os.getenv("VOCAB_CACHE_MAX_VALUE_BYTES", str(1024 * 1024)))
+# 預設 TTL（秒）；0 代表不過期
+CACHE_TTL = float(os.getenv("VOCAB_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class CacheBackend:
+    """快取後端介面：鍵為字串、值為 bytes，ttl 以秒為單位（None 代表不過期）"""
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        """只在鍵不存在時寫入，回傳是否寫入成功（用於分散式鎖）"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        raise NotImplementedError
+
+    def mget(self, keys: Sequence[str]) -> list[bytes | None]:
+        return [self.get(key) for key in keys]
+
+    def mset(self, items: Sequence[tuple[str, bytes]], ttl: float | None = None):
+        for key, value in items:
+            self.set(key, value, ttl)
+
+
+class MemoryBackend(CacheBackend):
+    """行程內的 LRU 快取，以筆數與總位元組數限制大小"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data: OrderedDict[str, tuple[bytes, float | None]] = OrderedDict()
+        self._bytes = 0
+
+    def _live(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        return value
+
+    def _remove(self, key: str):
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+
+    def _store(self, key: str, value: bytes, ttl: float | None):
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._bytes += len(value)
+        while len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+            self._remove(next(iter(self._data)))
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._live(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+        return iter(keys)
+
+
+class SQLiteBackend(CacheBackend):
+    """SQLite 檔案快取（WAL 模式），同一台主機或共用磁碟上的多個行程可共用"""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每個執行緒各自的連線
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> bytes | None:
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            return None
+        return value
+
+    def _after_write(self):
+        with self._writes_lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl if ttl else None, now),
+        )
+        self._after_write()
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl if ttl else None, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        rows = self._connect().execute(
+            "SELECT key FROM cache WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+        ).fetchall()
+        return iter(row[0] for row in rows)
+
+    def prune(self):
+        """刪除過期項目，並在超過筆數上限時刪除最早寫入的項目"""
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        (count,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """以 Redis 協定（RESP）直接透過 socket 溝通的後端，不需要 redis 套件
+
+    大小上限交給伺服器的 maxmemory 與淘汰策略；每個值都帶 TTL。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: str | None = None, timeout: float = 2.0, pool_size: int = 8):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+
+    def _open(self) -> tuple[socket.socket, Any]:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        if self.password:
+            self._send(conn, "AUTH", self.password)
+        if self.db:
+            self._send(conn, "SELECT", str(self.db))
+        return conn
+
+    @staticmethod
+    def _encode(args: Sequence[str | bytes]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis 連線已關閉")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RedisError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return reader.read(length + 2)[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"無法解析的回覆：{line!r}")
+
+    def _send(self, conn, *args) -> Any:
+        sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read_reply(reader)
+
+    def execute(self, *args) -> Any:
+        """從連線池取一條連線執行指令；連線失效時重新連線重試一次"""
+        for attempt in range(2):
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                result = self._send(conn, *args)
+            except (ConnectionError, OSError):
+                conn[0].close()
+                if attempt:
+                    raise
+                continue
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn[0].close()
+            return result
+
+    def get(self, key: str) -> bytes | None:
+        return self.execute("GET", key)
+
+    def mget(self, keys: Sequence[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        return self.execute("MGET", *keys)
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        if ttl:
+            self.execute("SET", key, value, "PX", str(int(ttl * 1000)))
+        else:
+            self.execute("SET", key, value)
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        args = ["SET", key, value, "NX"]
+        if ttl:
+            args += ["PX", str(int(ttl * 1000))]
+        return self.execute(*args) == "OK"
+
+    def delete(self, key: str):
+        self.execute("DEL", key)
+
+    def keys(self, prefix: str = "", count: int = 500) -> Iterator[str]:
+        """以 SCAN 分批列出鍵（KEYS 會在掃描所有鍵的期間阻塞整個 Redis）；掃描期間有增刪時可能重複或遺漏"""
+        pattern = "".join("\\" + char if char in "*?[]\\" else char for char in prefix) + "*"
+        cursor = "0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", pattern, "COUNT", str(count))
+            cursor = cursor.decode()
+            for key in keys:
+                yield key.decode()
+            if cursor == "0":
+                return
+
+
+def create_backend(url: str) -> CacheBackend:
+    """依網址建立後端：memory://、sqlite:///path、redis://[:password@]host:port/db"""
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(parsed.path if parsed.netloc == "" else parsed.netloc + parsed.path)
+    if parsed.scheme == "redis":
+        return RedisBackend(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=parsed.password,
+        )
+    raise ValueError(f"不支援的快取網址：{url}")
+
+
+@lru_cache(maxsize=None)
+def get_backend(url: str = CACHE_URL) -> CacheBackend:
+    """每個網址共用一個後端（連線池、SQLite 連線）"""
+    return create_backend(url)
+
+
+class SharedCache:
+    """以命名空間區隔的快取，提供 TTL、值大小上限與 get_or_compute 的擊穿保護
+
+    同一個鍵同時未命中時，行程內以 single-flight 合併，跨副本以後端的 add（SET NX）取得短暫的鎖，
+    只有一個副本真正計算，其他副本等待結果寫入。
+    """
+
+    def __init__(self, namespace: str, backend: CacheBackend | None = None,
+                 ttl: float | None = CACHE_TTL, max_value_bytes: int = CACHE_MAX_VALUE_BYTES,
+                 lock_ttl: float = 30.0, lock_wait: float = 10.0):
+        self.namespace = namespace
+        self.backend = backend or get_backend()
+        self.ttl = ttl or None
+        self.max_value_bytes = max_value_bytes
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self._flights = SingleFlight()
+        self.computations = 0
+
+    def _key(self, key: str) -> str:
+        return f"vocab:{self.namespace}:{key}"
+
+    def get_bytes(self, key: str) -> bytes | None:
+        try:
+            value = self.backend.get(self._key(key))
+        except Exception as e:
+            # 快取故障不影響功能，視為未命中
+            print(f"快取讀取失敗（{self.namespace}）：{str(e)}")
+            value = None
+        record_cache(f"shared_{self.namespace}", value is not None)
+        return value
+
+    def set_bytes(self, key: str, value: bytes, ttl: float | None = None):
+        if len(value) > self.max_value_bytes:
+            return
+        try:
+            self.backend.set(self._key(key), value, ttl or self.ttl)
+        except Exception as e:
+            print(f"快取寫入失敗（{self.namespace}）：{str(e)}")
+
+    def get(self, key: str) -> Any:
+        value = self.get_bytes(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        self.set_bytes(key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ttl)
+
+    def get_many(self, keys: Sequence[str]) -> list[Any]:
+        """一次讀取多個鍵（Redis 為一次 MGET），未命中的位置為 None"""
+        try:
+            values = self.backend.mget([self._key(key) for key in keys])
+        except Exception as e:
+            print(f"快取讀取失敗（{self.namespace}）：{str(e)}")
+            values = [None] * len(keys)
+        for value in values:
+            record_cache(f"shared_{self.namespace}", value is not None)
+        return [None if value is None else json.loads(value) for value in values]
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            print(f"快取刪除失敗（{self.namespace}）：{str(e)}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float | None = None) -> Any:
+        """讀取快取；未命中時只讓一個呼叫者（跨副本）計算並寫入"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self._flights.do(key, lambda: self._compute_once(key, compute, ttl))
+
+    def _compute_once(self, key: str, compute: Callable[[], Any], ttl: float | None) -> Any:
+        lock_key = self._key(f"{key}:lock")
+        try:
+            locked = self.backend.add(lock_key, b"1", self.lock_ttl)
+        except Exception:
+            locked = True
+        if not locked:
+            # 其他副本正在計算，等它寫入結果；逾時則自己計算
+            deadline = time.monotonic() + self.lock_wait
+            delay = 0.01
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+                value = self.get(key)
+                if value is not None:
+                    return value
+        try:
+            value = compute()
+            self.computations += 1
+            if value is not None:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                try:
+                    self.backend.delete(lock_key)
+                except Exception:
+                    pass
+
+
+def shared_byte_store(cache: SharedCache):
+    """讓 SharedCache 符合 LangChain 的 ByteStore 介面（給 CacheBackedEmbeddings 使用）"""
+    from langchain_core.stores import BaseStore
+
+    class _Store(BaseStore[str, bytes]):
+        def mget(self, keys: Sequence[str]) -> list[bytes | None]:
+            try:
+                values = cache.backend.mget([cache._key(key) for key in keys])
+            except Exception as e:
+                print(f"快取讀取失敗（{cache.namespace}）：{str(e)}")
+                values = [None] * len(keys)
+            for value in values:
+                record_cache(f"shared_{cache.namespace}", value is not None)
+            return values
+
+        def mset(self, key_value_pairs: Sequence[tuple[str, bytes]]):
+            for key, value in key_value_pairs:
+                cache.set_bytes(key, value)
+
+        def mdelete(self, keys: Sequence[str]):
+            for key in keys:
+                cache.delete(key)
+
+        def yield_keys(self, prefix: str | None = None) -> Iterator[str]:
+            base = cache._key("")
+            for key in cache.backend.keys(base + (prefix or "")):
+                yield key[len(base):]
+
+    return _Store()
+
+
+@lru_cache(maxsize=None)
+def core_load_kwargs(fn: Callable) -> dict:
+    """langchain_core.load 的 load／loads 只還原 langchain_core 型別的參數
+
+    較新的版本以 allowed_objects="core" 限制；鎖定的 0.3.28 沒有此參數（預設就只允許 langchain 命名空間），
+    傳入會拋出 TypeError。
+    """
+    import inspect
+
+    if "allowed_objects" in inspect.signature(fn).parameters:
+        return {"allowed_objects": "core"}
+    return {}
+
+
+def shared_llm_cache(cache: SharedCache):
+    """讓 SharedCache 符合 LangChain 的 BaseCache 介面，以提示詞與模型設定為鍵快取 LLM 回應"""
+    import hashlib
+    import warnings
+
+    from langchain_core.caches import BaseCache
+    from langchain_core.load import dumps, loads
+
+    class _LLMCache(BaseCache):
+        @staticmethod
+        def _key(prompt: str, llm_string: str) -> str:
+            return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+        def lookup(self, prompt: str, llm_string: str):
+            value = cache.get_bytes(self._key(prompt, llm_string))
+            if value is None:
+                return None
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    # 共用快取的內容只還原 langchain_core 的型別（ChatGeneration、AIMessage）
+                    return loads(value.decode("utf-8"), **core_load_kwargs(loads))
+            except (ValueError, KeyError, NotImplementedError) as e:
+                # 內容損毀或型別不允許時視為未命中（UnicodeDecodeError、JSONDecodeError 都是 ValueError）
+                print(f"LLM 快取內容無法還原（{cache.namespace}）：{str(e)}")
+                return None
+
+        def update(self, prompt: str, llm_string: str, return_val):
+            cache.set_bytes(self._key(prompt, llm_string), dumps(return_val).encode("utf-8"))
+
+        def clear(self, **kwargs):
+            for key in list(cache.backend.keys(cache._key(""))):
+                cache.backend.delete(key)
+
+    return _LLMCache()
@@ -0,0 +1,295 @@
+"""錄製／重播 LLM 與嵌入呼叫（cassette），讓效能量測與回歸測試不需要網路且結果固定
+
+VOCAB_CASSETTE_MODE：
+    off      直接呼叫 API（預設）
+    record   呼叫 API，並把回應與耗時寫入 VOCAB_CASSETTE_DIR
+    replay   只從檔案重播，找不到錄製時拋出 CassetteMiss（不會連網，也不需要 API key）
+    auto     有錄製就重播，沒有就呼叫 API 並錄製
+VOCAB_CASSETTE_LATENCY：重播時重現錄製耗時的倍數（0 代表立即回傳，1 代表與錄製時相同）
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from datetime import datetime
+from typing import Any, Callable, Literal, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+CassetteMode = Literal["off", "record", "replay", "auto"]
+CASSETTE_MODE: CassetteMode = os.getenv("VOCAB_CASSETTE_MODE", "off")
+CASSETTE_DIR = os.getenv("VOCAB_CASSETTE_DIR", "./cassettes")
+CASSETTE_LATENCY = float(os.getenv("VOCAB_CASSETTE_LATENCY", "0"))
+
+
+class CassetteMiss(KeyError):
+    """replay 模式下找不到對應的錄製"""
+
+
+class Cassette:
+    """以請求內容的雜湊為檔名，每個互動一個 JSON 檔（{directory}/{kind}/{key}.json）"""
+
+    def __init__(self, directory: str = CASSETTE_DIR, mode: CassetteMode = CASSETTE_MODE,
+                 latency_scale: float = CASSETTE_LATENCY):
+        if mode not in ("off", "record", "replay", "auto"):
+            raise ValueError(f"未知的 cassette 模式：{mode}")
+        self.directory = directory
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @staticmethod
+    def key(request: Any) -> str:
+        payload = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.json")
+
+    def load(self, kind: str, key: str) -> Optional[dict]:
+        """讀取錄製；record 模式一律回傳 None（重新錄製）"""
+        if self.mode == "record":
+            return None
+        try:
+            with open(self._path(kind, key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise CassetteMiss(f"找不到 {kind} 的錄製（{key[:12]}），請先以 record 或 auto 模式執行")
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def save(self, kind: str, key: str, request: Any, response: Any, latency: float):
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "request": request,
+            "response": response,
+            "latency": round(latency, 6),
+            "recorded_at": str(datetime.now()),
+        }
+        # 先寫暫存檔再替換，並行錄製時不會讀到寫到一半的檔案
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.recorded += 1
+
+    def replay_delay(self, latency: float):
+        """依設定的倍數重現錄製時的耗時"""
+        if self.latency_scale > 0 and latency > 0:
+            time.sleep(latency * self.latency_scale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+_default_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Cassette:
+    """依環境變數建立的預設 cassette"""
+    global _default_cassette
+    if _default_cassette is None:
+        _default_cassette = Cassette()
+    return _default_cassette
+
+
+def _message_request(message: BaseMessage) -> dict:
+    """訊息中影響回應的部分；不含每次執行都不同的訊息 ID 與工具呼叫 ID"""
+    request = {"type": message.type, "content": message.content}
+    if getattr(message, "name", None):
+        request["name"] = message.name
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        request["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+    return request
+
+
+def _dump_result(result: ChatResult) -> dict:
+    from langchain_core.load import dumpd
+
+    return {"generations": dumpd(result.generations), "llm_output": result.llm_output}
+
+
+def _load_result(response: dict) -> ChatResult:
+    from langchain_core.load import load
+
+    from cache import core_load_kwargs
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        generations = load(response["generations"], **core_load_kwargs(load))
+    return ChatResult(generations=generations, llm_output=response.get("llm_output"))
+
+
+class CassetteChatModel(BaseChatModel):
+    """包裝聊天模型：依 cassette 模式錄製或重播 _generate 的結果
+
+    實際的模型以 factory 延後建立，replay 模式下完全不會建立（不需要 API key）。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    cassette: Any
+    model_key: str
+    tools: list = []
+    tool_kwargs: dict = {}
+    _factory: Callable[[], BaseChatModel] = PrivateAttr()
+    _inner: Any = PrivateAttr(default=None)
+
+    def __init__(self, factory: Callable[[], BaseChatModel], **kwargs):
+        super().__init__(**kwargs)
+        self._factory = factory
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "CassetteChatModel":
+        """記下工具，實際綁定交給內部模型（重播時只用工具定義計算鍵）"""
+        bound = self.model_copy(update={"tools": list(tools), "tool_kwargs": kwargs})
+        bound._factory = self._factory
+        return bound
+
+    def _inner_target(self) -> tuple[BaseChatModel, dict]:
+        """回傳可呼叫 _generate 的模型與綁定的參數"""
+        from langchain_core.runnables import RunnableBinding
+
+        if self._inner is None:
+            model = self._factory()
+            if self.tools:
+                tool_kwargs = {k: v for k, v in self.tool_kwargs.items() if k != "ls_structured_output_format"}
+                model = model.bind_tools(self.tools, **tool_kwargs)
+            self._inner = model
+        if isinstance(self._inner, RunnableBinding):
+            return self._inner.bound, dict(self._inner.kwargs)
+        return self._inner, {}
+
+    def _request(self, messages: list[BaseMessage], stop: Optional[list[str]], kwargs: dict) -> dict:
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        return {
+            "model": self.model_key,
+            "messages": [_message_request(message) for message in messages],
+            "tools": [convert_to_openai_tool(tool) for tool in self.tools],
+            "tool_choice": self.tool_kwargs.get("tool_choice"),
+            "stop": stop,
+            "kwargs": {k: v for k, v in kwargs.items() if k != "ls_structured_output_format"},
+        }
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        request = self._request(messages, stop, kwargs)
+        key = Cassette.key(request)
+        entry = self.cassette.load("chat", key)
+        if entry is not None:
+            self.cassette.replay_delay(entry["latency"])
+            return _load_result(entry["response"])
+
+        model, bound_kwargs = self._inner_target()
+        start = time.perf_counter()
+        result = model._generate(messages, stop=stop, **{**bound_kwargs, **kwargs})
+        self.cassette.save("chat", key, request, _dump_result(result), time.perf_counter() - start)
+        return result
+
+
+class CassetteEmbeddings(Embeddings):
+    """包裝嵌入模型：每段文字各自錄製，批次大小不同也能重播"""
+
+    def __init__(self, factory: Callable[[], Embeddings], model_key: str, cassette: Cassette):
+        self._factory = factory
+        self._inner: Optional[Embeddings] = None
+        self.model_key = model_key
+        self.cassette = cassette
+
+    def _embed(self, texts: list[str], kind: str) -> list[list[float]]:
+        keys = [Cassette.key({"model": self.model_key, "kind": kind, "text": text}) for text in texts]
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+        delay = 0.0
+        for i, key in enumerate(keys):
+            entry = self.cassette.load("embeddings", key)
+            if entry is not None:
+                vectors[i] = entry["response"]
+                delay += entry["latency"]
+        self.cassette.replay_delay(delay)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            if self._inner is None:
+                self._inner = self._factory()
+            start = time.perf_counter()
+            if kind == "query":
+                embedded = [self._inner.embed_query(texts[missing[0]])]
+            else:
+                embedded = self._inner.embed_documents([texts[i] for i in missing])
+            # 一次批次的耗時平均分給每段文字
+            latency = (time.perf_counter() - start) / len(missing)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.cassette.save("embeddings", keys[i], {"model": self.model_key, "kind": kind,
+                                                           "text": texts[i]}, vector, latency)
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts, "documents")
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], "query")[0]
+
+
+# 設定在外層（錄製／重播）模型上的參數；其餘參數用來建立實際模型並組成錄製的鍵
+WRAPPER_KWARGS = ("callbacks", "cache", "tags", "metadata")
+
+
+# 連線與重試設定不影響回應內容，不列入錄製的鍵
+TRANSPORT_KWARGS = ("http_client", "http_async_client", "timeout", "request_timeout", "max_retries")
+
+
+def _model_key(model_class: type, kwargs: dict) -> str:
+    kwargs = {k: v for k, v in kwargs.items() if k not in TRANSPORT_KWARGS}
+    return json.dumps([model_class.__name__, kwargs], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def cassette_chat_model(model_class: Callable[..., BaseChatModel], cassette: Optional[Cassette] = None,
+                        **kwargs: Any) -> BaseChatModel:
+    """建立聊天模型，例如 cassette_chat_model(ChatOpenAI, model="gpt-4o-mini", temperature=0.7)
+
+    cassette 模式為 off 時等同直接呼叫 model_class(**kwargs)；否則回傳錄製／重播模型，
+    callbacks 與 cache 設定在外層，重播的呼叫也會經過。
+    """
+    cassette = cassette or get_cassette()
+    if cassette.mode == "off":
+        return model_class(**kwargs)
+    wrapper_kwargs = {k: v for k, v in kwargs.items() if k in WRAPPER_KWARGS}
+    model_kwargs = {k: v for k, v in kwargs.items() if k not in WRAPPER_KWARGS}
+    return CassetteChatModel(
+        lambda: model_class(**model_kwargs),
+        cassette=cassette,
+        model_key=_model_key(model_class, model_kwargs),
+        **wrapper_kwargs,
+    )
+
+
+def cassette_embeddings(model_class: Callable[..., Embeddings], cassette: Optional[Cassette] = None,
+                        **kwargs: Any) -> Embeddings:
+    """建立嵌入模型，例如 cassette_embeddings(OpenAIEmbeddings, model="text-embedding-3-small")"""
+    cassette = cassette or get_cassette()
+    if cassette.mode == "off":
+        return model_class(**kwargs)
+    return CassetteEmbeddings(lambda: model_class(**kwargs), _model_key(model_class, kwargs), cassette)
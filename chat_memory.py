@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable
+
+# 整段歷史（含摘要）送進提示詞的 token 上限
+HISTORY_TOKEN_BUDGET = int(os.getenv("VOCAB_HISTORY_TOKEN_BUDGET", "1200"))
+# 單則訊息最多保留的 token 數（測驗、單字卡等長篇助手回覆會被截斷）
+MESSAGE_TOKEN_LIMIT = int(os.getenv("VOCAB_HISTORY_MESSAGE_TOKENS", "300"))
+# 逐字保留的最近訊息數（與原本的兩輪對話相同），更早的訊息併入摘要
+RECENT_MESSAGES = int(os.getenv("VOCAB_HISTORY_RECENT_MESSAGES", "4"))
+# 是否以 LLM 維護滾動摘要（關閉時較早的訊息直接捨棄）
+SUMMARY_ENABLED = os.getenv("VOCAB_HISTORY_SUMMARY", "1") == "1"
+SUMMARY_TOKEN_LIMIT = int(os.getenv("VOCAB_HISTORY_SUMMARY_TOKENS", "200"))
+
+TRUNCATION_MARK = "…（內容過長，已省略）"
+
+_CJK_RE = re.compile(r"[　-ヿ㐀-鿿豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：中日文字元約一字一個 token，其餘約四個字元一個 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """保留開頭的完整行直到 token 上限，超過的部分以省略標記取代"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRUNCATION_MARK)
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            # 第一行就太長時，依字元截斷
+            if not kept:
+                cut = len(line)
+                while cut > 0 and estimate_tokens(line[:cut]) > budget:
+                    cut = cut * 3 // 4
+                kept.append(line[:cut])
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept).rstrip() + TRUNCATION_MARK
+
+
+def select_recent(messages: list[dict], summary: str = "",
+                  budget: int = HISTORY_TOKEN_BUDGET,
+                  message_limit: int = MESSAGE_TOKEN_LIMIT,
+                  recent: int = RECENT_MESSAGES) -> list[dict]:
+    """從最新的訊息往前選，每則先截斷，總量（含摘要）不超過 budget
+
+    回傳依時間排序的 {"role", "content"}，內容已截斷。
+    """
+    remaining = budget - estimate_tokens(summary)
+    selected = []
+    for msg in reversed(messages[-recent:] if recent else []):
+        content = truncate_text(msg["content"], message_limit)
+        cost = estimate_tokens(content)
+        if cost > remaining:
+            break
+        selected.append({"role": msg["role"], "content": content})
+        remaining -= cost
+    selected.reverse()
+    return selected
+
+
+def format_for_summary(messages: list[dict]) -> str:
+    lines = []
+    for msg in messages:
+        role = "用戶" if msg["role"] == "user" else "助手"
+        lines.append(f"{role}: {truncate_text(msg['content'], MESSAGE_TOKEN_LIMIT)}")
+    return "\n".join(lines)
+
+
+class SummaryUpdater:
+    """在背景增量更新每個聊天的摘要：只把尚未摘要過的舊訊息併入現有摘要
+
+    summarize(舊摘要, 新訊息文字) 回傳新摘要；save(chat_id, 摘要, 已涵蓋訊息數) 寫回資料庫。
+    同一個聊天同時只會有一個更新在進行，不影響回應延遲。
+    """
+
+    def __init__(self, summarize: Callable[[str, str], str],
+                 save: Callable[[str, str, int], None], workers: int = 1):
+        self._summarize = summarize
+        self._save = save
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-summary")
+        self._lock = threading.Lock()
+        self._running: set[str] = set()
+        self._futures = set()
+        self.updates = 0
+        self.errors = 0
+
+    def schedule(self, chat_id: str, messages: list[dict], summary: dict | None,
+                 recent: int = RECENT_MESSAGES) -> bool:
+        """若有新的舊訊息尚未摘要，排入背景更新；回傳是否已排入"""
+        older = messages[:-recent] if recent else list(messages)
+        covered = (summary or {}).get("covered", 0)
+        if len(older) <= covered:
+            return False
+        with self._lock:
+            if chat_id in self._running:
+                return False
+            self._running.add(chat_id)
+        future = self._executor.submit(self._update, chat_id, older, covered, (summary or {}).get("text", ""))
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return True
+
+    def _update(self, chat_id: str, older: list[dict], covered: int, previous: str):
+        try:
+            text = self._summarize(previous, format_for_summary(older[covered:]))
+            self._save(chat_id, truncate_text(text.strip(), SUMMARY_TOKEN_LIMIT), len(older))
+            self.updates += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"聊天摘要更新失敗：{str(e)}")
+        finally:
+            with self._lock:
+                self._running.discard(chat_id)
+
+    def wait_idle(self, timeout: float | None = None):
+        """等待目前排入的摘要更新完成（測試與預熱使用）"""
+        wait(list(self._futures), timeout=timeout)
@@ -0,0 +1,104 @@
+import os
+import zlib
+from typing import Literal
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 嵌入提供者：openai（預設，帶本地快取）或 local（離線、確定性的雜湊嵌入）
+EmbeddingProvider = Literal["openai", "local"]
+EMBEDDING_PROVIDER: EmbeddingProvider = os.getenv("VOCAB_EMBEDDING_PROVIDER", "openai")
+EMBEDDING_CACHE_DIR = os.getenv("VOCAB_EMBEDDING_CACHE_DIR", "./.embedding_cache")
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# 每個提供者對應的 Chroma collection（向量維度不同，不能共用）
+COLLECTION_NAMES = {
+    "openai": "vocabulary_v1",
+    "local": "vocabulary_v1_local",
+}
+
+
+class LocalHashEmbeddings(Embeddings):
+    """以字元 n-gram 雜湊產生的本地嵌入，不需要網路且結果固定"""
+
+    def __init__(self, dim: int = 512, ngram_range: tuple[int, int] = (2, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _ngram_hashes(self, text: str) -> np.ndarray:
+        text = f" {' '.join(text.lower().split())} "
+        grams = [
+            text[i:i + n]
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1)
+            for i in range(len(text) - n + 1)
+        ]
+        return np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+            dtype=np.uint32,
+            count=len(grams),
+        )
+
+    def embed_matrix(self, texts: list[str]) -> np.ndarray:
+        """回傳 (len(texts), dim) 的單位向量矩陣"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = self._ngram_hashes(text)
+            if hashes.size == 0:
+                continue
+            # 低位決定維度，最高位決定正負號，降低雜湊碰撞造成的偏差
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            matrix[row] = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_matrix([text])[0].tolist()
+
+
+def cached_embeddings(underlying: Embeddings, namespace: str,
+                      cache_dir: str = EMBEDDING_CACHE_DIR) -> Embeddings:
+    """以文字雜湊為鍵快取嵌入結果：設定 VOCAB_CACHE_URL 時存到跨副本共用快取，否則存到本地檔案"""
+    from langchain.embeddings import CacheBackedEmbeddings
+
+    from cache import SHARED_CACHE_CONFIGURED, SharedCache, shared_byte_store
+
+    if SHARED_CACHE_CONFIGURED:
+        # 嵌入結果不會過期
+        store = shared_byte_store(SharedCache("embeddings", ttl=None))
+    else:
+        from langchain.storage import LocalFileStore
+
+        store = LocalFileStore(cache_dir)
+    return CacheBackedEmbeddings.from_bytes_store(
+        underlying,
+        store,
+        namespace=namespace,
+        query_embedding_cache=True,
+    )
+
+
+def get_embeddings(provider: EmbeddingProvider | None = None) -> Embeddings:
+    """依提供者建立嵌入模型"""
+    provider = provider or EMBEDDING_PROVIDER
+    if provider == "local":
+        return LocalHashEmbeddings()
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        from cassette import cassette_embeddings
+        from http_client import model_client_kwargs
+
+        return cached_embeddings(
+            cassette_embeddings(OpenAIEmbeddings, model=OPENAI_EMBEDDING_MODEL, **model_client_kwargs()),
+            namespace=OPENAI_EMBEDDING_MODEL,
+        )
+    raise ValueError(f"未知的嵌入提供者：{provider}")
+
+
+def get_collection_name(provider: EmbeddingProvider | None = None) -> str:
+    """取得提供者對應的 Chroma collection 名稱"""
+    return COLLECTION_NAMES[provider or EMBEDDING_PROVIDER]
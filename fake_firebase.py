@@ -0,0 +1,304 @@
+import copy
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Firebase push ID 使用的字元（依 ASCII 排序，讓 ID 依時間先後排序）
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+class _PushIdGenerator:
+    """與 Firebase 相同規則的 push ID：前 8 碼為毫秒時間，後 12 碼在同一毫秒內遞增"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_time = 0
+        self._last_rand = [0] * 12
+
+    def __call__(self) -> str:
+        with self._lock:
+            now = int(time.time() * 1000)
+            duplicate = now == self._last_time
+            self._last_time = now
+
+            time_chars = []
+            for _ in range(8):
+                time_chars.append(PUSH_CHARS[now % 64])
+                now //= 64
+            push_id = "".join(reversed(time_chars))
+
+            if not duplicate:
+                self._last_rand = [random.randrange(64) for _ in range(12)]
+            else:
+                i = 11
+                while i >= 0 and self._last_rand[i] == 63:
+                    self._last_rand[i] = 0
+                    i -= 1
+                self._last_rand[i] += 1
+            return push_id + "".join(PUSH_CHARS[i] for i in self._last_rand)
+
+
+def _split(path: str) -> list[str]:
+    return [part for part in path.strip("/").split("/") if part]
+
+
+def _resolve_server_values(value: Any, now_ms: int) -> Any:
+    """與 Firebase 相同：寫入時把 {".sv": "timestamp"} 換成伺服器的毫秒時間"""
+    if isinstance(value, dict):
+        if value == {".sv": "timestamp"}:
+            return now_ms
+        return {key: _resolve_server_values(child, now_ms) for key, child in value.items()}
+    return value
+
+
+def _prune(value: Any) -> Any:
+    """與 Firebase 相同：None 與空的節點不會被儲存"""
+    if isinstance(value, dict):
+        pruned = {key: _prune(child) for key, child in value.items()}
+        return {key: child for key, child in pruned.items() if child is not None} or None
+    return value
+
+
+class FakeDatabase:
+    """記憶體中的 Firebase Realtime Database 替身，用於本地測試與效能量測
+
+    每次讀寫都算一次來回（round trip），並可注入固定延遲與隨機抖動來模擬網路。
+    count_bytes=True 時另外以 JSON 大小統計下載與上傳的位元組數（會增加序列化成本，只在量測傳輸量時開啟）。
+    """
+
+    def __init__(self, data: dict | None = None, latency: float = 0.0, jitter: float = 0.0,
+                 count_bytes: bool = False):
+        self._lock = threading.RLock()
+        self._data = copy.deepcopy(data) if data else {}
+        self.push_id = _PushIdGenerator()
+        self.latency = latency
+        self.jitter = jitter
+        self._stats_lock = threading.Lock()
+        self.round_trips = 0
+        self.operations: dict[str, int] = {}
+        self.count_bytes = count_bytes
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def _transfer(self, direction: str, value: Any) -> Any:
+        """統計 value 以 JSON 傳輸時的位元組數（Realtime Database REST 的傳輸格式）"""
+        if self.count_bytes and value is not None:
+            size = len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            with self._stats_lock:
+                if direction == "read":
+                    self.bytes_read += size
+                else:
+                    self.bytes_written += size
+        return value
+
+    def _round_trip(self, operation: str):
+        """記錄一次來回並模擬網路延遲（在資料鎖之外等待，讓並行請求互不阻塞）"""
+        with self._stats_lock:
+            self.round_trips += 1
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.round_trips = 0
+            self.operations = {}
+            self.bytes_read = 0
+            self.bytes_written = 0
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = {"round_trips": self.round_trips, "operations": dict(self.operations)}
+            if self.count_bytes:
+                stats["bytes_read"] = self.bytes_read
+                stats["bytes_written"] = self.bytes_written
+            return stats
+
+    def load(self, path: str, value: Any):
+        """直接寫入資料（不計來回），用於大量預先建立測試資料"""
+        self._write(_split(path), value)
+
+    def reference(self, path: str = "/") -> "FakeReference":
+        return FakeReference(self, _split(path))
+
+    def _read(self, parts: list[str], deep_copy: bool = True) -> Any:
+        with self._lock:
+            node = self._data
+            for part in parts:
+                if not isinstance(node, dict) or part not in node:
+                    return None
+                node = node[part]
+            return copy.deepcopy(node) if deep_copy else node
+
+    def _write(self, parts: list[str], value: Any):
+        value = _prune(_resolve_server_values(copy.deepcopy(value), int(time.time() * 1000)))
+        with self._lock:
+            if not parts:
+                self._data = value if isinstance(value, dict) else {}
+                return
+            # 沿路建立節點，並記錄路徑以便刪除後清除空節點
+            node = self._data
+            trail = []
+            for part in parts[:-1]:
+                if not isinstance(node.get(part), dict):
+                    if value is None:
+                        return
+                    node[part] = {}
+                trail.append((node, part))
+                node = node[part]
+            if value is None:
+                node.pop(parts[-1], None)
+                for parent, key in reversed(trail):
+                    if parent[key]:
+                        break
+                    del parent[key]
+            else:
+                node[parts[-1]] = value
+
+
+class FakeReference:
+    """實作 models.py 使用到的 firebase_admin.db.Reference 介面"""
+
+    def __init__(self, database: FakeDatabase, parts: list[str]):
+        self._database = database
+        self._parts = parts
+
+    @property
+    def key(self) -> str | None:
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str) -> "FakeReference":
+        return FakeReference(self._database, self._parts + _split(path))
+
+    def get(self, shallow: bool = False) -> Any:
+        """shallow=True 時與 REST 的 shallow 查詢相同：子節點只傳回 True，不傳內容"""
+        self._database._round_trip("get")
+        if shallow:
+            with self._database._lock:
+                value = self._database._read(self._parts, deep_copy=False)
+                if isinstance(value, dict):
+                    value = {key: True for key in value}
+            return self._database._transfer("read", value)
+        return self._database._transfer("read", self._database._read(self._parts))
+
+    def set(self, value: Any):
+        self._database._round_trip("set")
+        self._database._transfer("write", value)
+        self._database._write(self._parts, value)
+
+    def push(self, value: Any = "") -> "FakeReference":
+        """與 firebase_admin 相同：push() 會立即寫入（預設為空字串），因此也是一次來回"""
+        self._database._round_trip("push")
+        ref = self.child(self._database.push_id())
+        self._database._transfer("write", value)
+        self._database._write(ref._parts, value)
+        return ref
+
+    def update(self, value: dict):
+        """多路徑更新：鍵可以是 "a/b" 形式的子路徑"""
+        if not value:
+            raise ValueError("更新內容不可為空")
+        self._database._round_trip("update")
+        self._database._transfer("write", value)
+        with self._database._lock:
+            for path, child_value in value.items():
+                self._database._write(self._parts + _split(path), child_value)
+
+    def delete(self):
+        self._database._round_trip("delete")
+        self._database._write(self._parts, None)
+
+    def order_by_child(self, path: str) -> "FakeQuery":
+        return FakeQuery(self, lambda key, value: _child_value(value, path))
+
+    def order_by_key(self) -> "FakeQuery":
+        return FakeQuery(self, lambda key, value: key)
+
+    def order_by_value(self) -> "FakeQuery":
+        return FakeQuery(self, lambda key, value: value)
+
+
+def _child_value(value: Any, path: str) -> Any:
+    for part in _split(path):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _sort_key(value: Any) -> tuple:
+    """Firebase 排序規則：null < false < true < 數字 < 字串 < 物件"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4,)
+
+
+class FakeQuery:
+    """實作 firebase_admin.db.Query 的排序、篩選與筆數限制"""
+
+    def __init__(self, ref: FakeReference, order_value):
+        self._ref = ref
+        self._order_value = order_value
+        self._start = None
+        self._end = None
+        self._limit_first = None
+        self._limit_last = None
+
+    def equal_to(self, value: Any) -> "FakeQuery":
+        self._start = self._end = value
+        return self
+
+    def start_at(self, value: Any) -> "FakeQuery":
+        self._start = value
+        return self
+
+    def end_at(self, value: Any) -> "FakeQuery":
+        self._end = value
+        return self
+
+    def limit_to_first(self, limit: int) -> "FakeQuery":
+        self._limit_first = limit
+        return self
+
+    def limit_to_last(self, limit: int) -> "FakeQuery":
+        self._limit_last = limit
+        return self
+
+    def get(self) -> OrderedDict:
+        self._ref._database._round_trip("query")
+        database = self._ref._database
+        # 與伺服器端索引相同：在資料庫內篩選排序，只複製並傳回符合條件的項目
+        with database._lock:
+            data = database._read(self._ref._parts, deep_copy=False)
+            if not isinstance(data, dict):
+                return OrderedDict()
+
+            # 每個項目只計算一次排序值，先篩選範圍再排序
+            keyed = [((_sort_key(self._order_value(key, value)), key), key, value) for key, value in data.items()]
+            if self._start is not None:
+                start = _sort_key(self._start)
+                keyed = [item for item in keyed if item[0][0] >= start]
+            if self._end is not None:
+                end = _sort_key(self._end)
+                keyed = [item for item in keyed if item[0][0] <= end]
+            keyed.sort(key=lambda item: item[0])
+            items = [(key, value) for _, key, value in keyed]
+            if self._limit_first is not None:
+                items = items[:self._limit_first]
+            if self._limit_last is not None:
+                items = items[-self._limit_last:] if self._limit_last else []
+            return database._transfer("read", OrderedDict(copy.deepcopy(items)))
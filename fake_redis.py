@@ -0,0 +1,187 @@
+import re
+import socketserver
+import threading
+import time
+
+
+class _RedisHandler(socketserver.StreamRequestHandler):
+    """解析 RESP 指令陣列並回覆；只實作快取會用到的指令"""
+
+    def handle(self):
+        while True:
+            try:
+                command = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            self.wfile.write(self.server.store.execute(command))
+            self.wfile.flush()
+
+    def _read_line(self) -> bytes | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        return line.rstrip(b"\r\n")
+
+    def _read_command(self) -> list[bytes] | None:
+        header = self._read_line()
+        if header is None:
+            return None
+        if not header.startswith(b"*"):
+            # inline 指令（例如 redis-cli 的 PING）
+            return header.split()
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self._read_line()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+def _glob(pattern: str) -> re.Pattern:
+    """Redis 的 glob 樣式：* ? [...]，反斜線跳脫特殊字元"""
+    regex, i = [], 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex.append(re.escape(pattern[i]))
+        elif char == "*":
+            regex.append(".*")
+        elif char == "?":
+            regex.append(".")
+        elif char == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            regex.append("[" + pattern[i + 1:end].replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return re.compile("".join(regex), re.DOTALL)
+
+
+def _bulk(value: bytes | None) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class _Store:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.commands = 0
+
+    def _get(self, db: dict, key: bytes) -> bytes | None:
+        item = db.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del db[key]
+            return None
+        return value
+
+    def execute(self, command: list[bytes]) -> bytes:
+        name = command[0].upper().decode()
+        args = command[1:]
+        with self._lock:
+            self.commands += 1
+            db = self._data
+            if name == "PING":
+                return b"+PONG\r\n"
+            if name == "SELECT":
+                # 替身只有一個資料庫
+                return b"+OK\r\n"
+            if name == "GET":
+                return _bulk(self._get(db, args[0]))
+            if name == "MGET":
+                return b"*%d\r\n" % len(args) + b"".join(_bulk(self._get(db, key)) for key in args)
+            if name == "SET":
+                key, value = args[0], args[1]
+                expires_at = None
+                nx = False
+                options = [a.upper() for a in args[2:]]
+                for i, option in enumerate(options):
+                    if option == b"EX":
+                        expires_at = time.time() + float(args[2 + i + 1])
+                    elif option == b"PX":
+                        expires_at = time.time() + float(args[2 + i + 1]) / 1000
+                    elif option == b"NX":
+                        nx = True
+                if nx and self._get(db, key) is not None:
+                    return b"$-1\r\n"
+                db[key] = (value, expires_at)
+                return b"+OK\r\n"
+            if name == "DEL":
+                removed = sum(1 for key in args if self._get(db, key) is not None and db.pop(key, None))
+                return b":%d\r\n" % removed
+            if name == "EXISTS":
+                return b":%d\r\n" % sum(1 for key in args if self._get(db, key) is not None)
+            if name == "KEYS":
+                pattern = _glob(args[0].decode())
+                keys = [key for key in list(db) if self._get(db, key) is not None
+                        and pattern.fullmatch(key.decode(errors="replace"))]
+                return b"*%d\r\n" % len(keys) + b"".join(_bulk(key) for key in keys)
+            if name == "SCAN":
+                # 游標是插入順序中的位置；與 Redis 相同，每批最多檢查 COUNT 個鍵，回傳的可能比 COUNT 少
+                cursor = int(args[0])
+                options = {args[i].upper(): args[i + 1] for i in range(1, len(args) - 1, 2)}
+                pattern = _glob(options.get(b"MATCH", b"*").decode())
+                count = int(options.get(b"COUNT", b"10"))
+                candidates = list(db)[cursor:cursor + count]
+                next_cursor = cursor + count if cursor + count < len(db) else 0
+                keys = [key for key in candidates if self._get(db, key) is not None
+                        and pattern.fullmatch(key.decode(errors="replace"))]
+                return (b"*2\r\n" + _bulk(str(next_cursor).encode())
+                        + b"*%d\r\n" % len(keys) + b"".join(_bulk(key) for key in keys))
+            if name == "DBSIZE":
+                return b":%d\r\n" % len(db)
+            if name == "FLUSHDB":
+                db.clear()
+                return b"+OK\r\n"
+            return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+
+class FakeRedisServer:
+    """本地的 Redis 協定（RESP）替身，用於測試共用快取，不需要安裝 Redis
+
+    server = FakeRedisServer().start()
+    backend = RedisBackend(port=server.port)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = socketserver.ThreadingTCPServer((host, port), _RedisHandler, bind_and_activate=False)
+        self._server.allow_reuse_address = True
+        self._server.daemon_threads = True
+        # 預設 backlog 只有 5，同時建立多條連線時會等 SYN 重送（約一秒）
+        self._server.request_queue_size = 128
+        self._server.store = _Store()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    @property
+    def commands(self) -> int:
+        return self._server.store.commands
+
+    def start(self) -> "FakeRedisServer":
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,44 +1,167 @@
 from typing import TypedDict, Annotated, Sequence, Literal
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain.tools import Tool
+from contextvars import ContextVar
+import os
+import time
+import uuid
+from langchain_core.tools import Tool
 from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
 from langgraph.graph import StateGraph, END, START
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import ToolNode
 from langgraph.graph.message import add_messages
-from pydantic import BaseModel, Field
-import graphviz
-import pprint
 from models import VocabDatabase
+from retrieval import build_hybrid_retriever
+from embeddings import get_embeddings, get_collection_name
+from topic_classifier import load_topic_classifier
+from lexicon import load_lexicon, extract_word, entry_definition, entry_pos, POS_NAMES_ZH
+from quiz_pool import QuizPool
+from quiz_builder import build_quiz
+from singleflight import SingleFlight, coalesce, canonical_text
+from chat_memory import SummaryUpdater, select_recent, SUMMARY_ENABLED
+from speculation import Speculator, predict_route, GENERATE_ROUTE
+from resilience import ResilientCaller
+from metrics import (LLM_CALLS, LLM_LATENCY, LLM_TOKENS, CACHE_EVENTS, QUEUE_DEPTH,
+                     REQUESTS, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, record_cache)
+
+# 單字查詢是否先查本地詞彙庫；VOCAB_LEXICON_LLM_FILL=0 時完全不呼叫 LLM（不含例句）
+LEXICON_LOOKUP = os.getenv("VOCAB_LEXICON_LOOKUP", "1") == "1"
+LEXICON_LLM_FILL = os.getenv("VOCAB_LEXICON_LLM_FILL", "1") == "1"
+# 測驗引擎：llm（由 LLM 生成整份測驗）或 template（以本地詞彙庫組出題目，LLM 只做可選的解說）
+QUIZ_ENGINE = os.getenv("VOCAB_QUIZ_ENGINE", "llm")
+QUIZ_LLM_EXPLAIN = os.getenv("VOCAB_QUIZ_LLM_EXPLAIN", "0") == "1"
+# 是否使用背景預先生成的測驗池
+QUIZ_POOL_ENABLED = os.getenv("VOCAB_QUIZ_POOL", "1") == "1"
+# 是否合併同時進行中的相同工具請求
+SINGLE_FLIGHT = os.getenv("VOCAB_SINGLE_FLIGHT", "1") == "1"
+# 類別查詢是否先用主題分類器（別名表 + 主題中心向量）判斷主題
+TOPIC_CLASSIFIER = os.getenv("VOCAB_TOPIC_CLASSIFIER", "1") == "1"
+# 路由模式：two_pass（路由器回 DIRECT_RESPONSE 後再由 generate 生成）或 single_pass（不需工具時路由器直接回答）
+ROUTER_MODE = os.getenv("VOCAB_ROUTER_MODE", "two_pass")
+# 是否在路由器呼叫的同時，依關鍵字預判先平行執行最可能的路徑（generate 或工具）
+SPECULATION = os.getenv("VOCAB_SPECULATION", "0") == "1"
 
 # 初始化資料庫
 db = VocabDatabase()
 
+# 目前處理中的用戶（工具函式只接收查詢字串，用戶資訊透過 context 傳遞）
+current_user_id: ContextVar[str | None] = ContextVar("current_user_id", default=None)
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """記錄每種用途的 LLM 呼叫次數、延遲與 token 數"""
+
+    def __init__(self, purpose: str):
+        self.purpose = purpose
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            LLM_LATENCY.labels(self.purpose).observe(time.perf_counter() - start)
+        LLM_CALLS.labels(self.purpose, "ok").inc()
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if not usage:
+            # 沒有 llm_output 時改用訊息上的 usage_metadata
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+        if prompt_tokens:
+            LLM_TOKENS.labels(self.purpose, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(self.purpose, "completion").inc(completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+        LLM_CALLS.labels(self.purpose, "error").inc()
+
+# LLM 呼叫的對沖與斷路（見 resilience.py）
+llm_caller = ResilientCaller()
+UNAVAILABLE_MESSAGE = "抱歉，AI 服務目前暫時無法回應，請稍後再試。"
+
+_llm_cache = None
+
+def get_llm_cache():
+    """跨副本共用的 LLM 回應快取（後端由 VOCAB_CACHE_URL 決定）"""
+    global _llm_cache
+    if _llm_cache is None:
+        from cache import SharedCache, shared_llm_cache
+        _llm_cache = shared_llm_cache(SharedCache("llm"))
+    return _llm_cache
+
+def cached_llm_response(llm: BaseChatModel, prompt: str) -> str | None:
+    """不呼叫 API，只查 LLM 回應快取（與 BaseChatModel 使用相同的鍵）"""
+    from langchain_core.caches import BaseCache
+    from langchain_core.load import dumps
+    if not isinstance(llm.cache, BaseCache):
+        return None
+    generations = llm.cache.lookup(dumps([HumanMessage(content=prompt)]), llm._get_llm_string())
+    return generations[0].text if generations else None
+
+def create_chat_model(purpose: str) -> BaseChatModel:
+    """建立聊天模型，並依用途（router、search、quiz...）記錄指標
+
+    LLM_CACHE_PURPOSES 中的用途（單字查詢）會使用共用的回應快取，相同提示詞在任何副本都只呼叫一次。
+    """
+    # langchain_openai 載入約需一秒，延到第一次呼叫 LLM 時才載入
+    from langchain_openai import ChatOpenAI
+    from cache import LLM_CACHE_PURPOSES
+    from cassette import cassette_chat_model
+    from http_client import model_client_kwargs
+    # VOCAB_CASSETTE_MODE 設定時錄製或重播回應（見 cassette.py）；所有模型共用同一個連線池
+    return cassette_chat_model(
+        ChatOpenAI,
+        model="gpt-4o-mini",
+        temperature=0.7,
+        callbacks=[LLMMetricsHandler(purpose)],
+        cache=get_llm_cache() if purpose in LLM_CACHE_PURPOSES else None,
+        **model_client_kwargs()
+    )
+
+def summarize_chat(previous: str, new_messages: str) -> str:
+    """將較早的對話併入既有摘要"""
+    prompt = PromptTemplate(
+        template=SYSTEM_PROMPTS["summary"],
+        input_variables=["summary", "messages"]
+    )
+    chain = prompt | create_chat_model("summary") | StrOutputParser()
+    return chain.invoke({"summary": previous or "（無）", "messages": new_messages})
+
+summary_updater = SummaryUpdater(summarize_chat, db.set_chat_summary)
+
 def get_recent_chat_history(chat_id: str) -> list[BaseMessage]:
-    """從資料庫獲取最近的聊天記錄"""
+    """從資料庫獲取最近的聊天記錄
+
+    最近的兩輪對話逐字保留（過長的回覆會截斷），更早的對話以滾動摘要呈現，
+    整體不超過 HISTORY_TOKEN_BUDGET，不論聊天多長提示詞大小都有上限。
+    """
     messages = db.get_chat_messages(chat_id)
     if not messages:
         return []
-    
-    # 只取最近的兩輪對話（2個user和2個assistant）
+
+    summary = db.get_chat_summary(chat_id) if SUMMARY_ENABLED else None
+    if SUMMARY_ENABLED:
+        # 背景更新摘要，供下一次查詢使用
+        summary_updater.schedule(chat_id, messages, summary)
+
+    summary_text = (summary or {}).get("text", "")
     recent_messages = []
-    user_count = 0
-    assistant_count = 0
-    
-    # 從最新的消息開始往前遍歷
-    for msg in reversed(messages):
-        if msg["role"] == "user" and user_count < 2:
-            recent_messages.insert(0, HumanMessage(content=msg["content"]))
-            user_count += 1
-        elif msg["role"] == "assistant" and assistant_count < 2:
-            recent_messages.insert(0, AIMessage(content=msg["content"]))
-            assistant_count += 1
-            
-        if user_count >= 2 and assistant_count >= 2:
-            break
-            
+    if summary_text:
+        recent_messages.append(SystemMessage(content=f"先前對話摘要：{summary_text}"))
+    for msg in select_recent(messages, summary_text):
+        if msg["role"] == "user":
+            recent_messages.append(HumanMessage(content=msg["content"]))
+        else:
+            recent_messages.append(AIMessage(content=msg["content"]))
     return recent_messages
 
 # 定義狀態類型
@@ -64,6 +187,23 @@ SYSTEM_PROMPTS = {
 使用建議：[單字使用建議的繁體中文說明]
 ---
 請確保回應嚴格遵循以上格式，所有解釋都使用繁體中文。
+""",
+
+    "search_fill": """
+你是一個專業的英語教師。以下單字的詞性與定義已經確定：
+單字：{word}
+詞性：{part_of_speech}
+定義：{definition}
+
+請只補充例句與使用建議，使用繁體中文，格式如下：
+例句：
+-> [英文例句1]
+    (中文翻譯：[繁體中文翻譯])
+-> [英文例句2]
+    (中文翻譯：[繁體中文翻譯])
+使用建議：[單字使用建議的繁體中文說明]
+
+請確保回應嚴格遵循以上格式，不要輸出其他內容。
 """,
 
     "category": """
@@ -159,6 +299,27 @@ E) 效率
 答案與解釋請完整、詳細、友善、像老師。
 請把格式排版好看。是 markdown 格式。
 三種題型選擇一種來出題就好。
+""",
+
+    "quiz_explain": """
+你是一個專業的英語教師。以下是一份已經出好題目與答案的單字測驗：
+{quiz}
+
+請針對每一題的正確答案，用繁體中文補充詳細、友善、像老師的解說（單字用法、常見搭配與一個英文例句）。
+不要更改題目與答案，只輸出解說內容，使用 markdown 格式。
+""",
+
+    "summary": """
+你負責維護英語學習對話的摘要。以下是目前的摘要與之後新增的對話：
+
+=== 目前的摘要 ===
+{summary}
+
+=== 新增的對話 ===
+{messages}
+
+請用繁體中文輸出更新後的摘要（150 字以內）：記錄用戶查過的單字、主題、做過的測驗與答題狀況、學習偏好。
+不要重述測驗題目或單字卡全文，只輸出摘要本身。
 """,
 
     "other": """
@@ -176,30 +337,128 @@ E) 效率
 """
 }
 
+ROUTER_PROMPT = """你是一個英語學習助手的路由器。
+你的唯一任務是決定是否使用提供的工具來回答用戶的問題。
+- 如果問題需要用工具回答，請使用適當的工具
+- 如果問題不需要工具（比如一般英語學習建議或非英語相關問題），請回覆 "DIRECT_RESPONSE"
+- 注意不要輕易的使用category_vocabulary_list跟vocabulary_quiz_generator這兩個工具，要確定你真的必須使用它們再使用
+不要直接回答用戶的問題，只需決定使用工具或返回標記。"""
+
+SINGLE_PASS_PROMPT = """你是一個英語學習助手。請先決定是否使用提供的工具來回答用戶的問題：
+- 查詢單字、列出主題單字或出測驗時，請使用適當的工具
+- 注意不要輕易的使用category_vocabulary_list跟vocabulary_quiz_generator這兩個工具，要確定你真的必須使用它們再使用
+- 如果問題不需要工具，請直接依照以下說明回答用戶，不要呼叫任何工具：
+""" + SYSTEM_PROMPTS["other"]
+
 def agent(state: VocabState):
     """
     代理節點：決定是否使用工具或直接生成回應
+
+    single_pass 模式下，不需要工具時這一次呼叫的內容就是最終回應。
     """
     print(" *** 調用代理 *** ")
     messages = state["messages"]
+    if SPECULATION:
+        start_speculation(messages)
 
-    system_message = """你是一個英語學習助手的路由器。
-你的唯一任務是決定是否使用提供的工具來回答用戶的問題。
-- 如果問題需要用工具回答，請使用適當的工具
-- 如果問題不需要工具（比如一般英語學習建議或非英語相關問題），請回覆 "DIRECT_RESPONSE"
-- 注意不要輕易的使用category_vocabulary_list跟vocabulary_quiz_generator這兩個工具，要確定你真的必須使用它們再使用
-不要直接回答用戶的問題，只需決定使用工具或返回標記。"""
-    messages = [HumanMessage(content=system_message)] + messages
+    if ROUTER_MODE == "single_pass":
+        messages = [HumanMessage(content=SINGLE_PASS_PROMPT)] + messages
+    else:
+        messages = [HumanMessage(content=ROUTER_PROMPT)] + messages
 
-    model = ChatOpenAI(temperature=0.7, model="gpt-4o-mini")
+    model = create_chat_model("router")
     model = model.bind_tools(tools)
-    response = model.invoke(messages)
+    # 路由呼叫會對沖；斷路時改用關鍵字預判的路徑
+    response = llm_caller.call(
+        "router",
+        lambda: model.invoke(messages),
+        fallback=lambda: fallback_route(state["messages"])
+    )
+    if SPECULATION:
+        resolve_speculation(state["messages"], response)
     return {
         "messages": [response],
         "context": state["context"],
         "user_id": state["user_id"]
     }
 
+def fallback_route(messages: Sequence[BaseMessage]) -> AIMessage:
+    """LLM 無法使用時的路由：以關鍵字預判工具，猜不到時交給 generate"""
+    route, arg = predict_route(str(messages[-1].content))
+    if route == GENERATE_ROUTE:
+        return AIMessage(content="DIRECT_RESPONSE")
+    return AIMessage(content="", tool_calls=[{
+        "name": route,
+        "args": {"__arg1": arg},
+        "id": f"fallback_{uuid.uuid4().hex[:12]}"
+    }])
+
+def route_after_agent(state: VocabState) -> Literal["tools", "generate", "__end__"]:
+    """路由器選了工具就執行工具；single_pass 模式下已有直接回答則結束，否則交給 generate"""
+    last_message = state["messages"][-1]
+    if getattr(last_message, "tool_calls", None):
+        return "tools"
+    content = last_message.content.strip() if isinstance(last_message.content, str) else ""
+    if ROUTER_MODE == "single_pass" and content and content != "DIRECT_RESPONSE":
+        return END
+    return "generate"
+
+def start_speculation(messages: Sequence[BaseMessage]):
+    """依關鍵字預判路徑，在路由器呼叫的同時先執行"""
+    query = str(messages[-1].content)
+    route, arg = predict_route(query)
+    if route == GENERATE_ROUTE:
+        # single_pass 模式下路由器本身就會回答，不需要推測 generate
+        if ROUTER_MODE == "single_pass":
+            return
+        history = list(messages)
+        speculator.start(route, arg, lambda: generate_direct_answer(history))
+    else:
+        speculator.start(route, arg)
+
+def resolve_speculation(messages: Sequence[BaseMessage], response: AIMessage):
+    """路由器決定後比對推測的路徑"""
+    next_step = route_after_agent({"messages": list(messages) + [response]})
+    if next_step == "tools":
+        tool_call = response.tool_calls[0]
+        args = tool_call.get("args") or {}
+        arg = args.get("__arg1", next(iter(args.values()), None)) if isinstance(args, dict) else args
+        speculator.resolve(tool_call["name"], arg)
+    elif next_step == "generate":
+        speculator.resolve(GENERATE_ROUTE)
+    else:
+        speculator.resolve("answered")
+
+def generate_direct_answer(messages: Sequence[BaseMessage]) -> str:
+    """不使用工具時的回答：最後一則為最新問題，之前的為聊天歷史"""
+    llm = create_chat_model("generate")
+
+    # 將聊天歷史轉換為格式化的字符串
+    chat_history = []
+    for msg in messages[:-1]:  # 除了最新消息外的所有歷史
+        if isinstance(msg, SystemMessage):
+            role = "摘要"
+        else:
+            role = "用戶" if isinstance(msg, HumanMessage) else "助手"
+        chat_history.append(f"{role}: {msg.content}")
+    formatted_history = "\n".join(chat_history)
+    
+    current_question = messages[-1].content  # 最新的問題
+
+    prompt = PromptTemplate(
+        template=SYSTEM_PROMPTS["other"] + "\n\n=== 聊天歷史 ===\n{chat_history}\n\n=== 最新問題 ===\n{query}",
+        input_variables=["chat_history", "query"]
+    )
+    chain = prompt | llm | StrOutputParser()
+    return llm_caller.call(
+        "generate",
+        lambda: chain.invoke({
+            "chat_history": formatted_history,
+            "query": current_question
+        }),
+        fallback=lambda: UNAVAILABLE_MESSAGE
+    )
+
 def generate_response(state: VocabState):
     """回應生成節點：生成最終回應"""
     print(" *** 生成回應 *** ")
@@ -214,27 +473,10 @@ def generate_response(state: VocabState):
             "user_id": state["user_id"]
         }
     
-    # 處理其他情況
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
-
-    # 將聊天歷史轉換為格式化的字符串
-    chat_history = []
-    for msg in messages[:-2]:  # 除了最新消息外的所有歷史
-        role = "用戶" if isinstance(msg, HumanMessage) else "助手"
-        chat_history.append(f"{role}: {msg.content}")
-    formatted_history = "\n".join(chat_history)
-    
-    current_question = messages[-2].content  # 最新的問題
-
-    prompt = PromptTemplate(
-        template=SYSTEM_PROMPTS["other"] + "\n\n=== 聊天歷史 ===\n{chat_history}\n\n=== 最新問題 ===\n{query}",
-        input_variables=["chat_history", "query"]
-    )
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({
-        "chat_history": formatted_history,
-        "query": current_question
-    })
+    # 處理其他情況（最後一則是路由器的 DIRECT_RESPONSE 標記，不納入）
+    response = speculator.claim(GENERATE_ROUTE) if SPECULATION else None
+    if response is None:
+        response = generate_direct_answer(messages[:-1])
     
     return {
         "messages": [AIMessage(content=response)],
@@ -242,63 +484,258 @@ def generate_response(state: VocabState):
         "user_id": state["user_id"]
     }
 
-def setup_rag():
+def setup_rag(k: int = 1):
     """設置 RAG 相關組件"""
     print(" *** 調用 RAG *** ")
+    # chromadb 載入很慢，只在第一次需要向量檢索時才載入
+    from langchain_chroma import Chroma
     vectorstore = Chroma(
         persist_directory="./chroma_db",
-        embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"),
-        collection_name="vocabulary_v1"
+        embedding_function=get_embeddings(),
+        collection_name=get_collection_name()
     )
     return vectorstore.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": 1}
+        search_kwargs={"k": k}
     )
 
+# 混合檢索器（本地 BM25 + 向量），首次使用時建立
+hybrid_retriever = None
+
+def setup_hybrid_retriever():
+    """設置混合檢索器；向量檢索器只在需要時才建立"""
+    global hybrid_retriever
+    if hybrid_retriever is None:
+        hybrid_retriever = build_hybrid_retriever(
+            vector_retriever_factory=lambda: setup_rag(k=3)
+        )
+    return hybrid_retriever
+
+def retrieve_category_documents(category: str) -> list[Document]:
+    """取得類別對應的詞彙文件：先用主題分類器，判斷不出時才做完整檢索"""
+    if TOPIC_CLASSIFIER:
+        topic = load_topic_classifier().classify(category)
+        info = load_lexicon().topics.get(topic) if topic else None
+        record_cache("topic_classifier", info is not None)
+        if info:
+            print(f" *** 主題分類命中：{topic} *** ")
+            return [Document(page_content=info["content"], metadata={"topic": topic})]
+    return setup_hybrid_retriever().invoke(category)
+
+def format_search_card(word: str, part_of_speech: str, definition: str,
+                       examples: list[str], related_words: str, tips: str) -> str:
+    """依 SYSTEM_PROMPTS["search"] 的格式組合單字卡"""
+    lines = [
+        "---",
+        f"單字：{word}",
+        f"詞性：{part_of_speech}",
+        f"定義：{definition}",
+        "例句：",
+    ]
+    lines.extend(examples)
+    lines.append(f"相關詞彙：{related_words}")
+    lines.append(f"使用建議：{tips}")
+    lines.append("---")
+    return "\n".join(lines)
+
+def parse_search_fill(response: str) -> tuple[list[str], str] | None:
+    """解析 search_fill 的回應，回傳 (例句行, 使用建議)；格式不符時回傳 None"""
+    examples = []
+    tips = None
+    for line in response.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("-> "):
+            examples.append(f"-> {stripped[3:].strip()}")
+        elif stripped.startswith("(中文翻譯：") and examples:
+            examples.append(f"    {stripped}")
+        elif stripped.startswith("使用建議："):
+            tips = stripped.replace("使用建議：", "").strip()
+    if not examples or not tips:
+        return None
+    return examples, tips
+
+def lookup_local_vocabulary(query: str) -> str | None:
+    """先從本地詞彙庫查詢單字，只請 LLM 補上例句與使用建議；查不到時回傳 None"""
+    lexicon = load_lexicon()
+    entries = lexicon.lookup(extract_word(query))
+    record_cache("lexicon", bool(entries))
+    if not entries:
+        return None
+
+    entry = entries[0]
+    print(" *** 本地詞彙庫命中 *** ")
+    part_of_speech = "、".join(POS_NAMES_ZH[p] for p in entry_pos(entry)) or "片語"
+    definition = entry_definition(entry)
+    topic_zh = lexicon.topics[entry["topic"]]["name_zh"]
+    related_words = "、".join(
+        f"{other['word']}（{'、'.join(POS_NAMES_ZH[p] for p in entry_pos(other)) or '片語'}，"
+        f"{'；'.join(sense for sense, _ in other['senses'])}）"
+        for other in lexicon.related_entries(entry)
+    )
+
+    examples = []
+    tips = f"常用於「{topic_zh}」相關的情境。"
+    if LEXICON_LLM_FILL:
+        llm = create_chat_model("search_fill")
+        prompt = PromptTemplate(
+            template=SYSTEM_PROMPTS["search_fill"],
+            input_variables=["word", "part_of_speech", "definition"]
+        )
+        chain = prompt | llm | StrOutputParser()
+        # 斷路或失敗時只回傳詞彙庫中的內容（沒有例句）
+        response = llm_caller.call(
+            "search_fill",
+            lambda: chain.invoke({
+                "word": entry["word"],
+                "part_of_speech": part_of_speech,
+                "definition": definition
+            }),
+            fallback=lambda: None
+        )
+        if response is not None:
+            parsed = parse_search_fill(response)
+            if parsed is None:
+                return None
+            examples, tips = parsed
+
+    return format_search_card(entry["word"], part_of_speech, definition,
+                              examples, related_words, tips)
+
 def search_vocabulary(query: str) -> str:
     """處理單字查詢"""
     print(" *** 調用單字查詢 *** ")
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+    if LEXICON_LOOKUP:
+        response = lookup_local_vocabulary(query)
+        if response is not None:
+            return response
+
+    llm = create_chat_model("search")
     prompt = PromptTemplate(
         template=SYSTEM_PROMPTS["search"] + "\n\n查詢單字: {query}",
         input_variables=["query"]
     )
     chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({"query": query})
-    return response
+    return llm_caller.call(
+        "search",
+        lambda: chain.invoke({"query": query}),
+        fallback=lambda: cached_llm_response(llm, prompt.format(query=query)) or UNAVAILABLE_MESSAGE
+    )
 
 def get_category_vocabulary(category: str) -> str:
     """處理類別查詢"""
     print(" *** 調用類別查詢 *** ")
-    retriever = setup_rag()
-    docs = retriever.invoke(category)
+    docs = retrieve_category_documents(category)
     context = "\n".join(doc.page_content for doc in docs)
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+    llm = create_chat_model("category")
     prompt = PromptTemplate(
         template=SYSTEM_PROMPTS["category"],
         input_variables=["context"]
     )
     chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({"context": context})
-    return response
+    # 斷路時直接列出檢索到的詞彙資料
+    return llm_caller.call(
+        "category",
+        lambda: chain.invoke({"context": context}),
+        fallback=lambda: context or UNAVAILABLE_MESSAGE
+    )
 
-def generate_quiz(category: str) -> str:
-    """生成類別測驗"""
-    print(" *** 調用生成類別測驗 *** ")
-    retriever = setup_rag()
-    docs = retriever.invoke(category)
-    context = "\n".join(doc.page_content for doc in docs)
-    
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+def generate_quiz_content(context: str) -> str:
+    """以檢索到的詞彙資料生成測驗"""
+    llm = create_chat_model("quiz")
     prompt = PromptTemplate(
         template=SYSTEM_PROMPTS["quiz"],
         input_variables=["context"]
     )
     chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({"context": context})
+    return chain.invoke({"context": context})
+
+def generate_topic_quiz(topic: str) -> str:
+    """以本地詞彙庫中某主題的資料生成測驗（供測驗池背景補充使用）"""
+    return generate_quiz_content(load_lexicon().topics[topic]["content"])
+
+quiz_pool = QuizPool(generate_topic_quiz)
+CACHE_EVENTS.labels("quiz_pool", "hit").set_function(lambda: quiz_pool.hits)
+CACHE_EVENTS.labels("quiz_pool", "miss").set_function(lambda: quiz_pool.misses)
+QUEUE_DEPTH.labels("quiz_pool_refill").set_function(lambda: quiz_pool.stats()["pending_topics"])
+
+def generate_template_quiz(topic: str) -> str:
+    """以本地詞彙庫組出測驗，視設定請 LLM 補充解說"""
+    quiz = build_quiz(load_lexicon(), topic)
+    if not QUIZ_LLM_EXPLAIN:
+        return quiz
+
+    llm = create_chat_model("quiz_explain")
+    prompt = PromptTemplate(
+        template=SYSTEM_PROMPTS["quiz_explain"],
+        input_variables=["quiz"]
+    )
+    chain = prompt | llm | StrOutputParser()
+    explanation = chain.invoke({"quiz": quiz})
+    return f"{quiz}\n===== 老師解說 =====\n\n{explanation}"
+
+def generate_quiz(category: str) -> str:
+    """生成類別測驗"""
+    print(" *** 調用生成類別測驗 *** ")
+    docs = retrieve_category_documents(category)
+    context = "\n".join(doc.page_content for doc in docs)
+
+    topic = docs[0].metadata.get("topic") if docs else None
+    if QUIZ_ENGINE == "template" and topic in load_lexicon().topics:
+        return generate_template_quiz(topic)
+
+    pooled = QUIZ_POOL_ENABLED and topic in load_lexicon().topics
+    user_id = current_user_id.get() or ""
+    if pooled:
+        response = quiz_pool.take(topic, user_id)
+        if response is not None:
+            print(f" *** 測驗池命中：{topic} *** ")
+            return response
+
+    # 斷路時以本地詞彙庫組出測驗；第二個值標示是否為 LLM 生成（後備測驗不放入測驗池）
+    response, generated = llm_caller.call(
+        "quiz",
+        lambda: (generate_quiz_content(context), True),
+        fallback=(lambda: (build_quiz(load_lexicon(), topic), False)) if topic in load_lexicon().topics else None
+    )
+    if pooled and generated:
+        # 同步生成的測驗也放入測驗池，提供給其他用戶
+        quiz_pool.add(topic, response, served_to=[user_id])
     return response
 
+def canonical_category(category: str) -> str:
+    """類別查詢的標準化鍵：能判斷出主題時以主題為鍵，讓「商業」與「business」合併"""
+    if TOPIC_CLASSIFIER:
+        topic = load_topic_classifier().classify(category)
+        if topic:
+            return topic
+    return canonical_text(category)
+
+def share_quiz(category: str, response: str) -> str:
+    """合併的測驗請求共用領頭請求的測驗：記到這位用戶名下（同一用戶不重複出題），
+    這位用戶做過這份測驗時改從測驗池另取一份"""
+    if not QUIZ_POOL_ENABLED:
+        return response
+    user_id = current_user_id.get() or ""
+    if quiz_pool.mark_served(response, user_id):
+        return response
+    topic = canonical_category(category)
+    other = quiz_pool.take(topic, user_id) if topic in load_lexicon().topics else None
+    return other or response
+
+tool_flights = SingleFlight()
+CACHE_EVENTS.labels("singleflight", "hit").set_function(lambda: tool_flights.coalesced)
+CACHE_EVENTS.labels("singleflight", "miss").set_function(lambda: tool_flights.executions)
+QUEUE_DEPTH.labels("singleflight_in_flight").set_function(lambda: tool_flights.stats()["in_flight"])
+
+speculator = Speculator()
+
+def tool_func(name: str, fn, canonicalize=canonical_text, on_shared=None):
+    """依設定為工具函式加上 single-flight 合併，並可取用路由時推測執行的結果"""
+    if SINGLE_FLIGHT:
+        fn = coalesce(tool_flights, name, fn, canonicalize, on_shared)
+    return speculator.wrap(name, fn, canonicalize)
+
 # 創建工具
 tools = [
     Tool(
@@ -314,7 +751,7 @@ tools = [
 - 解釋單字 innovation
 - artificial 是什麼
 """,
-        func=search_vocabulary,
+        func=tool_func("search_vocabulary_details", search_vocabulary),
         return_direct=True
     ),
     Tool(
@@ -337,7 +774,7 @@ tools = [
 - 我想學習醫療領域的詞彙
 - 給我一些科技方面的專業用語
 """,
-        func=get_category_vocabulary,
+        func=tool_func("category_vocabulary_list", get_category_vocabulary, canonical_category),
         return_direct=True
     ),
     Tool(
@@ -354,7 +791,7 @@ tools = [
 - 我要做科技詞彙的測驗
 - 幫我出一份環保主題的單字測驗
 """,
-        func=generate_quiz,
+        func=tool_func("vocabulary_quiz_generator", generate_quiz, canonical_category, share_quiz),
         return_direct=True
     )
 ]
@@ -378,10 +815,11 @@ def create_vocab_chain():
     # 從代理到工具或生成的條件邊
     workflow.add_conditional_edges(
         "agent",
-        tools_condition,
+        route_after_agent,
         {
             "tools": "tools",
-            END: "generate",
+            "generate": "generate",
+            END: END,
         }
     )
     
@@ -393,10 +831,35 @@ def create_vocab_chain():
     # 編譯時加入 checkpointer
     return workflow.compile()
 
+vocab_chain = None
+
+def get_vocab_chain():
+    """取得編譯好的工作流程（只編譯一次，節點在執行時才讀取設定）"""
+    global vocab_chain
+    if vocab_chain is None:
+        vocab_chain = create_vocab_chain()
+    return vocab_chain
+
 def process_vocab_query(query_data: dict):
     """處理查詢請求"""
-    app = create_vocab_chain()
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = run_vocab_query(query_data)
+        status = "ok"
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_LATENCY.observe(time.perf_counter() - start)
+        REQUESTS.labels(status).inc()
+
+def run_vocab_query(query_data: dict):
+    """執行工作流程並回傳最終回應"""
+    app = get_vocab_chain()
     chat_id = query_data["thread_id"]
+    if SPECULATION:
+        speculator.begin()
 
     # 獲取最近的聊天記錄
     previous_messages = get_recent_chat_history(chat_id)
@@ -409,6 +872,7 @@ def process_vocab_query(query_data: dict):
         "context": {},
         "user_id": query_data["user_id"]
     }
+    current_user_id.set(query_data["user_id"])
 
     # 使用準備好的輸入數據調用 stream
     for output in app.stream(input_data):
@@ -422,6 +886,8 @@ def process_vocab_query(query_data: dict):
 
 def generate_workflow_graph():
     """生成工作流程圖"""
+    # 只有「系統架構」頁面會用到
+    import graphviz
     dot = graphviz.Digraph(comment='Vocabulary Learning Workflow')
     dot.attr(rankdir='TB')
     
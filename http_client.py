@@ -0,0 +1,221 @@
+"""所有模型共用的 HTTP 連線池：連線上限、keep-alive、分段與總逾時、可用時啟用 HTTP/2，並記錄連線重用指標
+
+ChatOpenAI 與 OpenAIEmbeddings 以 http_client / http_async_client 注入同一組客戶端，
+同一個主機的請求共用 TCP 與 TLS 連線，不必每次重新握手。
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+from metrics import registry
+
+MAX_CONNECTIONS = int(os.getenv("VOCAB_HTTP_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("VOCAB_HTTP_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("VOCAB_HTTP_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("VOCAB_HTTP_CONNECT_TIMEOUT", "5"))
+# 兩個資料片段之間的最長等待（串流輸出時每個 token 之間）
+READ_TIMEOUT = float(os.getenv("VOCAB_HTTP_READ_TIMEOUT", "30"))
+WRITE_TIMEOUT = float(os.getenv("VOCAB_HTTP_WRITE_TIMEOUT", "10"))
+# 等待連線池釋出連線的時間
+POOL_TIMEOUT = float(os.getenv("VOCAB_HTTP_POOL_TIMEOUT", "5"))
+# 單次請求（含讀完回應）的總時間上限；0 代表不限制
+TOTAL_TIMEOUT = float(os.getenv("VOCAB_HTTP_TOTAL_TIMEOUT", "90"))
+# openai SDK 在逾時或 5xx 時的重試次數
+MAX_RETRIES = int(os.getenv("VOCAB_HTTP_MAX_RETRIES", "2"))
+HTTP2_ENABLED = os.getenv("VOCAB_HTTP2", "1") == "1"
+
+HTTP_REQUESTS = registry.counter("vocab_http_requests_total", "模型 API 的 HTTP 請求數", ["host", "status"])
+HTTP_LATENCY = registry.histogram("vocab_http_request_seconds", "模型 API 的 HTTP 請求延遲（到收到回應標頭）", ["host"])
+HTTP_CONNECTIONS = registry.counter(
+    "vocab_http_connections_total", "請求使用新建立或重用的連線", ["result"]
+)
+HTTP_TLS_HANDSHAKES = registry.counter("vocab_http_tls_handshakes_total", "TLS 握手次數")
+HTTP_POOL_CONNECTIONS = registry.gauge("vocab_http_pool_connections", "連線池中的連線數", ["state"])
+
+
+def http2_available() -> bool:
+    """HTTP/2 需要 h2 套件（httpx[http2]）"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_timeout() -> httpx.Timeout:
+    return httpx.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT)
+
+
+def default_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+class _ConnectionTrace:
+    """httpcore 的 trace 事件：請求過程中有建立 TCP 連線就是新連線，否則是重用"""
+
+    def __init__(self):
+        self.connected = False
+
+    def event(self, name: str):
+        if name == "connection.connect_tcp.complete":
+            self.connected = True
+        elif name == "connection.start_tls.complete":
+            HTTP_TLS_HANDSHAKES.inc()
+
+    def __call__(self, name: str, info: dict):
+        self.event(name)
+
+    def record(self):
+        HTTP_CONNECTIONS.labels("new" if self.connected else "reused").inc()
+
+
+class _AsyncConnectionTrace(_ConnectionTrace):
+    async def __call__(self, name: str, info: dict):
+        self.event(name)
+
+
+class _DeadlineStream(httpx.SyncByteStream):
+    """讀取回應內容時檢查總時間上限"""
+
+    def __init__(self, stream: httpx.SyncByteStream, deadline: float, request: httpx.Request):
+        self._stream = stream
+        self._deadline = deadline
+        self._request = request
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if time.monotonic() > self._deadline:
+                raise httpx.ReadTimeout("超過請求總時間上限", request=self._request)
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+class _AsyncDeadlineStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, deadline: float, request: httpx.Request):
+        self._stream = stream
+        self._deadline = deadline
+        self._request = request
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            if time.monotonic() > self._deadline:
+                raise httpx.ReadTimeout("超過請求總時間上限", request=self._request)
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """記錄每個請求的延遲、狀態碼與連線是否重用，並加上總時間上限"""
+
+    def __init__(self, total_timeout: float = TOTAL_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.total_timeout = total_timeout
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        trace = _ConnectionTrace()
+        request.extensions = {**request.extensions, "trace": trace}
+        host = request.url.host
+        start = time.perf_counter()
+        try:
+            response = super().handle_request(request)
+        except httpx.HTTPError:
+            HTTP_REQUESTS.labels(host, "error").inc()
+            raise
+        finally:
+            trace.record()
+        HTTP_LATENCY.labels(host).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(host, str(response.status_code)).inc()
+        if self.total_timeout:
+            response.stream = _DeadlineStream(response.stream, time.monotonic() + self.total_timeout, request)
+        return response
+
+    def pool_connections(self) -> tuple[int, int]:
+        """（閒置, 使用中）連線數"""
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return idle, len(connections) - idle
+
+
+class AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, total_timeout: float = TOTAL_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.total_timeout = total_timeout
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        trace = _AsyncConnectionTrace()
+        request.extensions = {**request.extensions, "trace": trace}
+        host = request.url.host
+        start = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except httpx.HTTPError:
+            HTTP_REQUESTS.labels(host, "error").inc()
+            raise
+        finally:
+            trace.record()
+        HTTP_LATENCY.labels(host).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(host, str(response.status_code)).inc()
+        if self.total_timeout:
+            response.stream = _AsyncDeadlineStream(response.stream, time.monotonic() + self.total_timeout, request)
+        return response
+
+
+def create_http_client(http2: Optional[bool] = None, total_timeout: float = TOTAL_TIMEOUT) -> httpx.Client:
+    """建立帶連線池設定與指標的客戶端；http2 預設在 h2 可用時開啟"""
+    http2 = (HTTP2_ENABLED and http2_available()) if http2 is None else http2
+    transport = MeteredTransport(total_timeout=total_timeout, http2=http2, limits=default_limits())
+    return httpx.Client(transport=transport, timeout=default_timeout())
+
+
+def create_async_http_client(http2: Optional[bool] = None,
+                             total_timeout: float = TOTAL_TIMEOUT) -> httpx.AsyncClient:
+    http2 = (HTTP2_ENABLED and http2_available()) if http2 is None else http2
+    transport = AsyncMeteredTransport(total_timeout=total_timeout, http2=http2, limits=default_limits())
+    return httpx.AsyncClient(transport=transport, timeout=default_timeout())
+
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.Client:
+    """整個行程共用的同步客戶端"""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = create_http_client()
+            transport = _client._transport
+            HTTP_POOL_CONNECTIONS.labels("idle").set_function(lambda: transport.pool_connections()[0])
+            HTTP_POOL_CONNECTIONS.labels("active").set_function(lambda: transport.pool_connections()[1])
+        return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """整個行程共用的非同步客戶端（ainvoke / astream 使用）"""
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = create_async_http_client()
+        return _async_client
+
+
+def model_client_kwargs() -> dict:
+    """注入 ChatOpenAI / OpenAIEmbeddings 的共用客戶端、逾時與重試設定"""
+    return {
+        "http_client": get_http_client(),
+        "http_async_client": get_async_http_client(),
+        "timeout": default_timeout(),
+        "max_retries": MAX_RETRIES,
+    }
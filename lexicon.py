@@ -0,0 +1,244 @@
+import os
+import re
+from functools import lru_cache
+from typing import TypedDict
+
+# 詞彙檔案目錄（與 notebook/vocabulary_write_to_chroma.py 相同的資料來源）
+VOCAB_DIR = os.getenv("VOCAB_DIR", "notebook/vocabulary_output")
+
+# 主題的繁體中文名稱
+TOPIC_NAMES_ZH = {
+    "daily_life": "日常生活",
+    "work_career": "工作與職涯",
+    "travel_transportation": "旅遊與交通",
+    "food_dining": "飲食與餐飲",
+    "education_learning": "教育與學習",
+    "technology_digital": "科技與數位",
+    "health_medical": "健康與醫療",
+    "entertainment_leisure": "娛樂與休閒",
+    "environment_nature": "環境與自然",
+    "social_relationships": "社交與人際關係",
+}
+
+# 常見類別說法對應的主題（中英文）；主題分類器與詞彙檢索共用
+TOPIC_ALIASES = {
+    "daily_life": ["日常", "生活", "居家", "家務", "daily life", "daily", "everyday", "household"],
+    "work_career": ["商業", "商務", "職場", "工作", "職涯", "職業", "求職", "面試", "金融", "財經",
+                    "business", "work", "career", "job", "office", "finance"],
+    "travel_transportation": ["旅遊", "旅行", "交通", "觀光", "出國", "機場",
+                              "travel", "transportation", "tourism", "airport"],
+    "food_dining": ["飲食", "美食", "餐飲", "餐廳", "烹飪", "食物", "food", "dining", "cooking", "restaurant"],
+    "education_learning": ["教育", "學術", "學校", "校園", "考試", "education", "academic", "school"],
+    "technology_digital": ["科技", "數位", "資訊", "電腦", "網路", "程式", "technology", "tech", "digital", "computer"],
+    "health_medical": ["醫療", "健康", "醫學", "醫院", "疾病", "health", "medical", "medicine", "hospital"],
+    "entertainment_leisure": ["娛樂", "休閒", "電影", "音樂", "遊戲", "運動", "entertainment", "leisure", "movie", "music", "hobby"],
+    "environment_nature": ["環境", "環保", "自然", "生態", "永續", "氣候", "environment", "nature", "ecology", "climate", "sustainability"],
+    "social_relationships": ["社交", "人際", "關係", "朋友", "家庭", "social", "relationship", "relationships", "friends", "family"],
+}
+
+# 詞性縮寫對應的中文說明
+POS_NAMES_ZH = {
+    "n.": "名詞",
+    "v.": "動詞",
+    "adj.": "形容詞",
+    "adv.": "副詞",
+}
+
+_ENTRY_PATTERN = re.compile(r"^\d+\.\s+(?P<word>.+?)\s+-\s+(?P<rest>.+)$")
+_SENSE_PATTERN = re.compile(r"([^()]+?)\s*\(([^()]*)\)")
+_PAREN_PATTERN = re.compile(r"\s*\([^()]*\)")
+_LATIN_PHRASE_PATTERN = re.compile(r"[A-Za-z][A-Za-z\-/' ]*[A-Za-z]|[A-Za-z]")
+
+
+class LexiconEntry(TypedDict):
+    word: str
+    topic: str
+    # 每個詞義為 (繁體中文定義, 詞性縮寫列表)
+    senses: list[tuple[str, list[str]]]
+
+
+def _parse_pos(text: str) -> list[str] | None:
+    """解析詞性縮寫，例如 "n. / v." -> ["n.", "v."]；不是詞性時回傳 None"""
+    parts = [p.strip() for p in text.split("/")]
+    if parts and all(p in POS_NAMES_ZH for p in parts):
+        return parts
+    return None
+
+
+def parse_entry_line(line: str, topic: str) -> LexiconEntry | None:
+    """解析一行詞彙，例如 "11. routine - 例行公事 (n.) / 例行的 (adj.)" """
+    match = _ENTRY_PATTERN.match(line.strip())
+    if not match:
+        return None
+
+    rest = match.group("rest").strip()
+    senses = []
+    last_end = 0
+    for sense in _SENSE_PATTERN.finditer(rest):
+        definition = sense.group(1).strip().lstrip("/").strip()
+        pos = _parse_pos(sense.group(2))
+        if pos is None:
+            # 括號內不是詞性（例如補充說明），併入定義
+            definition = f"{definition}（{sense.group(2).strip()}）"
+            pos = []
+        senses.append((definition, pos))
+        last_end = sense.end()
+
+    tail = rest[last_end:].strip().lstrip("/").strip()
+    if tail:
+        senses.append((tail, []))
+
+    return {"word": match.group("word").strip(), "topic": topic, "senses": senses}
+
+
+def entry_definition(entry: LexiconEntry) -> str:
+    """將詞義合併為一行繁體中文定義"""
+    parts = []
+    for definition, pos in entry["senses"]:
+        if pos:
+            pos_zh = "、".join(POS_NAMES_ZH[p] for p in pos)
+            parts.append(f"{definition}（{pos_zh}）")
+        else:
+            parts.append(definition)
+    return "；".join(parts)
+
+
+def word_keys(word: str) -> list[str]:
+    """單字的查詢鍵：原字、去除括號補充的字，以及 "resume/CV" 這類單字的各別寫法"""
+    word = word.strip().lower()
+    keys = [word]
+    base = _PAREN_PATTERN.sub("", word).strip()
+    if base and base not in keys:
+        keys.append(base)
+    for alt in re.findall(r"\(([^()]*)\)", word):
+        alt = alt.strip()
+        # 例如 "artificial intelligence (AI)" 的縮寫
+        if alt and " " not in alt and alt not in keys:
+            keys.append(alt)
+    if "/" in base and " " not in base:
+        keys.extend(part for part in base.split("/") if part and part not in keys)
+    return keys
+
+
+def extract_word(query: str) -> str:
+    """從查詢字串中取出英文單字或片語，例如 "查詢單字 resilient" -> "resilient" """
+    phrases = _LATIN_PHRASE_PATTERN.findall(query)
+    if len(phrases) != 1:
+        return query.strip().strip("'\"“”‘’「」").strip()
+    return phrases[0].strip()
+
+
+def entry_pos(entry: LexiconEntry) -> list[str]:
+    """取得詞條所有詞性縮寫（保持順序、去除重複）"""
+    result = []
+    for _, pos in entry["senses"]:
+        for p in pos:
+            if p not in result:
+                result.append(p)
+    return result
+
+
+@lru_cache(maxsize=None)
+def _alias_pattern(alias: str) -> re.Pattern:
+    """別名的比對樣式：英文別名需完整單字命中（避免 "it" 命中 "quit"），前後可以是標點、連字號或中文"""
+    if alias.isascii():
+        return re.compile(rf"(?<![a-z0-9]){re.escape(alias)}(?![a-z0-9])")
+    return re.compile(re.escape(alias))
+
+
+def find_aliases(query: str, aliases: dict[str, str]) -> list[str]:
+    """找出查詢中出現的別名（長的先）；已被較長別名涵蓋的部分不重複計算"""
+    normalized = query.strip().lower()
+    found = []
+    for alias in sorted(aliases, key=len, reverse=True):
+        if _alias_pattern(alias).search(normalized) and not any(alias in longer for longer in found):
+            found.append(alias)
+    return found
+
+
+def alias_topics(query: str, aliases: dict[str, str]) -> list[str]:
+    """查詢以別名提到的主題：命中別名總長度長的先，一樣長時（例如「職場關係」）先出現在查詢中的先；
+    主題分類器與詞彙檢索都以這個順序為準，兩者對同一個查詢不會有不同的判斷"""
+    normalized = query.strip().lower()
+    lengths: dict[str, int] = {}
+    positions: dict[str, int] = {}
+    for alias in find_aliases(query, aliases):
+        topic = aliases[alias]
+        position = _alias_pattern(alias).search(normalized).start()
+        lengths[topic] = lengths.get(topic, 0) + len(alias)
+        positions[topic] = min(positions.get(topic, position), position)
+    return sorted(lengths, key=lambda topic: (-lengths[topic], positions[topic]))
+
+
+class Lexicon:
+    """本地詞彙庫：從 vocabulary_output 載入的結構化單字資料"""
+
+    def __init__(self, vocab_dir: str = VOCAB_DIR):
+        self.entries: list[LexiconEntry] = []
+        # 主題 -> {"name": 英文名稱, "name_zh": 中文名稱, "content": 原始檔案內容}
+        self.topics: dict[str, dict] = {}
+        self._by_word: dict[str, list[LexiconEntry]] = {}
+
+        if not os.path.isdir(vocab_dir):
+            return
+
+        for filename in sorted(os.listdir(vocab_dir)):
+            if not filename.endswith(".txt"):
+                continue
+            topic = filename.replace(".txt", "")
+            with open(os.path.join(vocab_dir, filename), "r", encoding="utf-8") as f:
+                content = f.read()
+
+            lines = content.split("\n")
+            name = topic.replace("_", " ").title()
+            if lines and lines[0].startswith("Topic:"):
+                name = lines[0].replace("Topic:", "").strip()
+            self.topics[topic] = {
+                "name": name,
+                "name_zh": TOPIC_NAMES_ZH.get(topic, name),
+                "content": content,
+            }
+
+            for line in lines[1:]:
+                entry = parse_entry_line(line, topic)
+                if entry:
+                    self.entries.append(entry)
+                    for key in word_keys(entry["word"]):
+                        self._by_word.setdefault(key, []).append(entry)
+
+    def lookup(self, word: str) -> list[LexiconEntry]:
+        """以單字查詢詞條（不分大小寫）"""
+        return self._by_word.get(word.strip().lower(), [])
+
+    def related_entries(self, entry: LexiconEntry, limit: int = 3) -> list[LexiconEntry]:
+        """取得同主題、同詞性且在清單中位置相近的詞條"""
+        siblings = self.topic_entries(entry["topic"])
+        positions = {id(other): idx for idx, other in enumerate(siblings)}
+        if id(entry) not in positions:
+            return []
+        position = positions[id(entry)]
+        pos = set(entry_pos(entry))
+        candidates = [
+            other for other in siblings
+            if other is not entry and (not pos or pos & set(entry_pos(other)))
+        ]
+        candidates.sort(key=lambda other: abs(positions[id(other)] - position))
+        return candidates[:limit]
+
+    def topic_aliases(self) -> dict[str, str]:
+        """別名（小寫）-> 主題：主題代號、中英文名稱與 TOPIC_ALIASES 的說法"""
+        aliases = {}
+        for topic, info in self.topics.items():
+            for alias in [topic.replace("_", " "), info["name"], info["name_zh"], *TOPIC_ALIASES.get(topic, [])]:
+                aliases[alias.lower()] = topic
+        return aliases
+
+    def topic_entries(self, topic: str) -> list[LexiconEntry]:
+        """取得某個主題的所有詞條"""
+        return [entry for entry in self.entries if entry["topic"] == topic]
+
+
+@lru_cache(maxsize=None)
+def load_lexicon(vocab_dir: str = VOCAB_DIR) -> Lexicon:
+    """載入並快取本地詞彙庫"""
+    return Lexicon(vocab_dir)
@@ -0,0 +1,43 @@
+"""資料遷移：為沒有 created_ts 的舊聊天補上時間戳記，讓聊天列表可以依 created_ts 排序並只取最近幾筆
+
+重複執行是安全的，已有 created_ts 的聊天會略過。不含時區的 created_at 以 VOCAB_LEGACY_CHAT_TIMEZONE
+（預設 UTC，應設為舊版寫入端的時區）換算；缺少或無法解析 created_at 的聊天會列出並略過，
+這些用戶的聊天列表會繼續全部讀取。
+
+使用方式：
+    python migrate_chats.py --dry-run          # 只統計，不寫入
+    python migrate_chats.py                    # 遷移所有用戶
+    python migrate_chats.py --user <user_id>   # 只遷移指定用戶
+"""
+import argparse
+import sys
+
+from models import VocabDatabase
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="為舊聊天補上可排序的 created_ts")
+    parser.add_argument("--user", action="append", default=[], help="只遷移指定用戶，可重複指定")
+    parser.add_argument("--dry-run", action="store_true", help="只統計，不寫入")
+    args = parser.parse_args(argv)
+
+    db = VocabDatabase()
+    user_ids = args.user or db.list_user_ids()
+    totals = {"users": 0, "chats": 0, "migrated": 0, "skipped": 0}
+    for user_id in user_ids:
+        stats = db.migrate_chat_timestamps(user_id, dry_run=args.dry_run)
+        totals["users"] += 1
+        totals["chats"] += stats["chats"]
+        totals["migrated"] += stats["migrated"]
+        totals["skipped"] += len(stats["skipped"])
+        if stats["migrated"]:
+            print(f"{user_id}：{stats['migrated']}/{stats['chats']} 個聊天{'需要' if args.dry_run else '已'}補上 created_ts")
+        if stats["skipped"]:
+            print(f"{user_id}：略過 {len(stats['skipped'])} 個無法換算的聊天：{', '.join(stats['skipped'])}")
+
+    print(f"完成：{totals['users']} 位用戶，{totals['migrated']}/{totals['chats']} 個聊天，略過 {totals['skipped']} 個")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""資料遷移：將每位用戶單字中內嵌的定義、例句與說明搬到共用的 definitions/{hash}
+
+重複執行是安全的，已搬移的項目（有 definition_ref）會略過。
+
+使用方式：
+    python migrate_definitions.py --dry-run          # 只統計，不寫入
+    python migrate_definitions.py                    # 遷移所有用戶
+    python migrate_definitions.py --user <user_id>   # 只遷移指定用戶
+"""
+import argparse
+import sys
+
+from models import VocabDatabase
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="遷移單字定義到共用的 definitions 節點")
+    parser.add_argument("--user", action="append", default=[], help="只遷移指定用戶，可重複指定")
+    parser.add_argument("--batch-size", type=int, default=200, help="每次多路徑更新的單字數")
+    parser.add_argument("--dry-run", action="store_true", help="只統計，不寫入")
+    args = parser.parse_args(argv)
+
+    db = VocabDatabase()
+    user_ids = args.user or db.list_user_ids()
+    totals = {"users": 0, "entries": 0, "migrated": 0, "definitions": 0}
+    for user_id in user_ids:
+        stats = db.migrate_user_definitions(user_id, batch_size=args.batch_size, dry_run=args.dry_run)
+        totals["users"] += 1
+        for key in ("entries", "migrated", "definitions"):
+            totals[key] += stats[key]
+        print(f"{user_id}：{stats['migrated']}/{stats['entries']} 個單字"
+              f"{'需要' if args.dry_run else '已'}遷移，{stats['definitions']} 個定義")
+
+    print(f"完成：{totals['users']} 位用戶，{totals['migrated']}/{totals['entries']} 個單字，"
+          f"{totals['definitions']} 個定義（跨用戶相同的定義只存一份）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
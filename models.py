@@ -1,16 +1,171 @@
-import firebase_admin
-from firebase_admin import credentials, db
+import base64
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import hashlib
 import json
+import zlib
 from typing import List, Optional
+from zoneinfo import ZoneInfo
+import functools
 import os
+import threading
 from dotenv import load_dotenv
+from cache import MemoryBackend, SharedCache, get_backend
+from metrics import DB_ROUND_TRIPS, DB_LATENCY
+from spaced_repetition import Grade, ReviewState, new_review_state, now_ms, schedule
 
 load_dotenv()
 
+class MeteredQuery:
+    """包裝查詢物件，get() 時記錄一次資料庫來回"""
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def chained(*args, **kwargs):
+            return MeteredQuery(method(*args, **kwargs))
+        return chained
+
+    def get(self):
+        DB_ROUND_TRIPS.labels('query').inc()
+        return self._query.get()
+
+class MeteredReference:
+    """包裝 firebase_admin.db.Reference（或替身），記錄每種操作的來回次數"""
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def key(self):
+        return self._ref.key
+
+    def child(self, path: str) -> 'MeteredReference':
+        return MeteredReference(self._ref.child(path))
+
+    def get(self, shallow: bool = False):
+        DB_ROUND_TRIPS.labels('get').inc()
+        if shallow:
+            return self._ref.get(shallow=True)
+        return self._ref.get()
+
+    def set(self, value):
+        DB_ROUND_TRIPS.labels('set').inc()
+        return self._ref.set(value)
+
+    def push(self, value=''):
+        DB_ROUND_TRIPS.labels('push').inc()
+        return MeteredReference(self._ref.push(value))
+
+    def update(self, value: dict):
+        DB_ROUND_TRIPS.labels('update').inc()
+        return self._ref.update(value)
+
+    def delete(self):
+        DB_ROUND_TRIPS.labels('delete').inc()
+        return self._ref.delete()
+
+    def order_by_child(self, path: str) -> MeteredQuery:
+        return MeteredQuery(self._ref.order_by_child(path))
+
+    def order_by_key(self) -> MeteredQuery:
+        return MeteredQuery(self._ref.order_by_key())
+
+def metered(method):
+    """記錄 VocabDatabase 方法的延遲"""
+    histogram = DB_LATENCY.labels(method.__name__)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with histogram.time():
+            return method(*args, **kwargs)
+    return wrapper
+
+# 資料庫後端：firebase（預設）或 memory（記憶體替身，用於本地測試與效能量測）
+DB_BACKEND = os.getenv('VOCAB_DB_BACKEND', 'firebase')
+# 讀取未快取的共用定義時的並行數
+DEFINITION_FETCH_WORKERS = int(os.getenv('VOCAB_DEFINITION_FETCH_WORKERS', '8'))
+# 共用定義的欄位；舊資料直接存在用戶的單字底下，新資料只存 definition_ref
+DEFINITION_FIELDS = ('word', 'definition', 'examples', 'notes')
+
+# 聊天列表一次載入的筆數（側邊欄的「顯示更多」每次再多載入這麼多）
+CHAT_LIST_LIMIT = int(os.getenv('VOCAB_CHAT_LIST_LIMIT', '20'))
+# Firebase 的伺服器時間戳記：寫入時由伺服器換成毫秒數，不受各副本時鐘差異影響，且可排序
+SERVER_TIMESTAMP = {'.sv': 'timestamp'}
+# 舊聊天的 created_at 是寫入端 datetime.now() 的本地時間（不含時區），遷移時以此時區換算
+LEGACY_CHAT_TIMEZONE = os.getenv('VOCAB_LEGACY_CHAT_TIMEZONE', 'UTC')
+
+# 超過此位元組數（UTF-8）的訊息以 zlib 壓縮後 base64 儲存；0 代表不壓縮
+MESSAGE_COMPRESS_THRESHOLD = int(os.getenv('VOCAB_MESSAGE_COMPRESS_THRESHOLD', '1024'))
+MESSAGE_ENCODING_ZLIB = 'zlib+base64'
+
+def encode_message_content(content: str) -> dict:
+    """長訊息壓縮儲存：回傳要寫入的 content 與 encoding 欄位（壓縮後沒有變小就原樣儲存）"""
+    raw = content.encode('utf-8')
+    if not MESSAGE_COMPRESS_THRESHOLD or len(raw) < MESSAGE_COMPRESS_THRESHOLD:
+        return {'content': content}
+    encoded = base64.b64encode(zlib.compress(raw, 6)).decode('ascii')
+    if len(encoded) >= len(raw):
+        return {'content': content}
+    return {'content': encoded, 'encoding': MESSAGE_ENCODING_ZLIB}
+
+def decode_message_content(message: dict) -> str:
+    """讀取訊息內容，依 encoding 欄位解壓縮（沒有 encoding 的舊訊息原樣傳回）"""
+    if message.get('encoding') == MESSAGE_ENCODING_ZLIB:
+        return zlib.decompress(base64.b64decode(message['content'])).decode('utf-8')
+    return message['content']
+
+def definition_hash(word: str, definition: str, examples: List[str], notes: str) -> str:
+    """共用定義的內容位址：相同內容得到相同的鍵（SHA-256 前 32 碼）"""
+    payload = json.dumps([word, definition, examples, notes], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+_memory_database_lock = threading.Lock()
+_memory_database_instance = None
+
+def _memory_database():
+    """記憶體後端在整個行程共用一份資料（如同所有副本連到同一個 Firebase），
+    Streamlit 每次 rerun 與 graph 建立的 VocabDatabase 才看得到彼此寫入的資料"""
+    global _memory_database_instance
+    with _memory_database_lock:
+        if _memory_database_instance is None:
+            from fake_firebase import FakeDatabase
+            latency = float(os.getenv('VOCAB_FAKE_DB_LATENCY', '0'))
+            _memory_database_instance = FakeDatabase(latency=latency)
+        return _memory_database_instance
+
 class VocabDatabase:
-    def __init__(self):
-        # 初始化 Firebase
+    def __init__(self, root=None):
+        # 可直接注入根節點（例如 fake_firebase.FakeDatabase().reference()）
+        if root is not None:
+            self.db = MeteredReference(root)
+            # 每個注入的資料庫各自一份快取，避免不同資料庫之間共用使用者 ID
+            self.user_cache = SharedCache("users", backend=MemoryBackend())
+            self.definition_cache = SharedCache("definitions", backend=MemoryBackend(), ttl=None)
+            self.chat_timestamp_cache = SharedCache("chat_timestamps", backend=MemoryBackend(), ttl=None)
+            return
+
+        if DB_BACKEND == 'memory':
+            self.db = MeteredReference(_memory_database().reference())
+            self.user_cache = SharedCache("users", backend=MemoryBackend())
+            self.definition_cache = SharedCache("definitions", backend=MemoryBackend(), ttl=None)
+            # 記憶體資料庫整個行程共用一份，這個快取也跟著共用（app.py 每次 rerun 都會重建 VocabDatabase）
+            self.chat_timestamp_cache = SharedCache("chat_timestamps", backend=get_backend("memory://"), ttl=None)
+            return
+
+        # 使用者名稱與 ID 的對應不會改變，所有副本共用
+        self.user_cache = SharedCache("users", ttl=None)
+        # 定義以內容為鍵、寫入後不再改變，可以永久快取
+        self.definition_cache = SharedCache("definitions", ttl=None)
+        # 已確認沒有舊聊天（缺 created_ts）的用戶；新聊天一律帶 created_ts，確認過就不必再查
+        self.chat_timestamp_cache = SharedCache("chat_timestamps", ttl=None)
+
+        # 初始化 Firebase（記憶體模式不需要載入 firebase_admin）
+        import firebase_admin
+        from firebase_admin import credentials, db
         if not firebase_admin._apps:
             # 使用環境變數或服務帳戶金鑰檔案
             if os.getenv('FIREBASE_CREDENTIALS'):
@@ -22,10 +177,14 @@ class VocabDatabase:
                 'databaseURL': os.getenv('FIREBASE_DATABASE_URL')
             })
         
-        self.db = db.reference()
+        self.db = MeteredReference(db.reference())
 
+    @metered
     def get_or_create_user(self, username: str) -> str:
-        """獲取或創建用戶"""
+        """獲取或創建用戶；對應結果存在共用快取，同時登入的同名使用者只會建立一次"""
+        return self.user_cache.get_or_compute(username, lambda: self._get_or_create_user(username))
+
+    def _get_or_create_user(self, username: str) -> str:
         users_ref = self.db.child('users')
         # 查找是否已存在該用戶
         existing_users = users_ref.order_by_child('username').equal_to(username).get()
@@ -42,9 +201,14 @@ class VocabDatabase:
             })
             return new_user_ref.key
 
+    @metered
     def add_vocabulary(self, user_id: str, word: str, definition: str, 
-                      examples: List[str], notes: str = ""):
-        """添加新單字到用戶的詞彙表"""
+                      examples: List[str], notes: str = "", personal_notes: str = ""):
+        """添加新單字到用戶的詞彙表
+
+        定義、例句與查詢產生的說明存在全域的 definitions/{hash}，所有用戶共用同一份；
+        用戶的單字底下只存參照、個人筆記與複習狀態。
+        """
         vocab_ref = self.db.child('vocabulary').child(user_id)
         
         # 檢查單字是否已存在
@@ -52,17 +216,97 @@ class VocabDatabase:
         if existing_vocab:
             raise ValueError(f"單字 '{word}' 已經存在於您的單字本中")
         
+        # 寫入共用定義（內容相同時鍵相同，已快取代表已寫入過）
+        shared = {'word': word, 'definition': definition, 'examples': examples, 'notes': notes}
+        ref = definition_hash(word, definition, examples, notes)
+        if self.definition_cache.get(ref) is None:
+            self.db.child('definitions').child(ref).set(shared)
+            self.definition_cache.set(ref, shared)
+
         # 添加新單字
         new_vocab = {
             'word': word,
-            'definition': definition,
-            'examples': examples,
-            'notes': notes,
-            'created_at': str(datetime.now())
+            'definition_ref': ref,
+            'created_at': str(datetime.now()),
+            # 複習狀態；review/due 建有索引（database.rules.json），複習佇列以範圍查詢取得
+            'review': new_review_state()
         }
+        if personal_notes:
+            new_vocab['personal_notes'] = personal_notes
         vocab_ref.push().set(new_vocab)
         return True
 
+    def _fetch_definition(self, ref: str) -> Optional[dict]:
+        return self.db.child('definitions').child(ref).get()
+
+    def _load_definitions(self, refs: List[str]) -> dict:
+        """取得多個共用定義：先查快取，未命中的並行讀取後寫回快取"""
+        refs = list(dict.fromkeys(refs))
+        if not refs:
+            return {}
+        definitions = {ref: value for ref, value in zip(refs, self.definition_cache.get_many(refs))
+                       if value is not None}
+        missing = [ref for ref in refs if ref not in definitions]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(DEFINITION_FETCH_WORKERS, len(missing))) as executor:
+                for ref, value in zip(missing, executor.map(self._fetch_definition, missing)):
+                    if value is not None:
+                        definitions[ref] = value
+                        self.definition_cache.set(ref, value)
+        return definitions
+
+    def _resolve_vocabulary(self, items: dict) -> dict:
+        """將用戶的單字項目補上共用定義；舊格式（定義直接存在項目中）原樣使用"""
+        definitions = self._load_definitions(
+            [value['definition_ref'] for value in items.values() if 'definition_ref' in value]
+        )
+        resolved = {}
+        for key, value in items.items():
+            shared = definitions.get(value.get('definition_ref'), {})
+            entry = {field: value.get(field, shared.get(field)) for field in DEFINITION_FIELDS}
+            entry['personal_notes'] = value.get('personal_notes', '')
+            entry['review'] = value.get('review')
+            resolved[key] = entry
+        return resolved
+
+    @metered
+    def get_due_vocabulary(self, user_id: str, limit: int = 20,
+                           now: Optional[int] = None) -> List[dict]:
+        """依到期時間取得最多 limit 個該複習的單字（沒有複習狀態的舊單字視為已到期）
+
+        以 review/due 排序的範圍查詢只傳回需要的筆數，不必讀取整本單字本。
+        """
+        now = now_ms() if now is None else now
+        due_items = (self.db.child('vocabulary').child(user_id)
+                     .order_by_child('review/due').end_at(now).limit_to_first(limit).get())
+        if not due_items:
+            return []
+
+        return [
+            {
+                'key': key,
+                'word': value['word'],
+                'definition': value['definition'] or '',
+                'examples': value['examples'] or [],
+                'notes': value['notes'] or '',
+                'personal_notes': value['personal_notes'],
+                'review': value['review']
+            }
+            for key, value in self._resolve_vocabulary(due_items).items()
+        ]
+
+    @metered
+    def record_review(self, user_id: str, vocab_key: str, grade: Grade,
+                      review: Optional[ReviewState] = None) -> ReviewState:
+        """記錄一次複習並排定下次複習時間；傳入目前的複習狀態可省去一次讀取"""
+        review_ref = self.db.child('vocabulary').child(user_id).child(vocab_key).child('review')
+        if review is None:
+            review = review_ref.get()
+        new_review = schedule(review, grade)
+        review_ref.set(new_review)
+        return new_review
+
+    @metered
     def get_user_vocabulary(self, user_id: str):
         """獲取用戶的詞彙表"""
         vocab_ref = self.db.child('vocabulary').child(user_id).get()
@@ -70,15 +314,17 @@ class VocabDatabase:
             return []
         
         vocab_list = []
-        for key, value in vocab_ref.items():
+        for key, value in self._resolve_vocabulary(vocab_ref).items():
             vocab_list.append({
                 'word': value['word'],
-                'definition': value['definition'],
-                'examples': value['examples'],
-                'notes': value['notes']
+                'definition': value['definition'] or '',
+                'examples': value['examples'] or [],
+                'notes': value['notes'] or '',
+                'personal_notes': value['personal_notes']
             })
         return sorted(vocab_list, key=lambda x: x['word'])
 
+    @metered
     def delete_vocabulary(self, user_id: str, word: str) -> bool:
         """刪除用戶的單字"""
         vocab_ref = self.db.child('vocabulary').child(user_id)
@@ -90,12 +336,56 @@ class VocabDatabase:
             return True
         return False
 
+    @metered
+    def migrate_user_definitions(self, user_id: str, batch_size: int = 200,
+                                 dry_run: bool = False) -> dict:
+        """將用戶單字中內嵌的定義搬到共用的 definitions/{hash}，項目改存 definition_ref
+
+        每批以一次多路徑 update 寫入（定義與參照在同一次寫入中完成），中斷後重跑只會處理尚未搬移的項目。
+        """
+        vocab_ref = self.db.child('vocabulary').child(user_id)
+        vocabulary = vocab_ref.get() or {}
+        pending = {key: value for key, value in vocabulary.items()
+                   if 'definition_ref' not in value and 'definition' in value}
+        stats = {'entries': len(vocabulary), 'migrated': 0, 'definitions': set()}
+
+        items = list(pending.items())
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            updates = {}
+            for key, value in batch:
+                shared = {
+                    'word': value['word'],
+                    'definition': value['definition'],
+                    'examples': value.get('examples', []),
+                    'notes': value.get('notes', '')
+                }
+                ref = definition_hash(**shared)
+                stats['definitions'].add(ref)
+                updates[f'definitions/{ref}'] = shared
+                updates[f'vocabulary/{user_id}/{key}/definition_ref'] = ref
+                # 設為 None 即刪除欄位；word 保留在項目中供索引查詢
+                for field in ('definition', 'examples', 'notes'):
+                    updates[f'vocabulary/{user_id}/{key}/{field}'] = None
+            if not dry_run:
+                self.db.update(updates)
+            stats['migrated'] += len(batch)
+
+        stats['definitions'] = len(stats['definitions'])
+        return stats
+
+    def list_user_ids(self) -> List[str]:
+        """所有用戶的 ID"""
+        return list((self.db.child('users').get() or {}).keys())
+
+    @metered
     def create_chat_session(self, user_id: str, name: str, chat_id: str = None) -> str:
         """創建新的聊天會話"""
         chats_ref = self.db.child('chats').child(user_id)
         new_chat = {
             'name': name,
-            'created_at': str(datetime.now())
+            'created_at': str(datetime.now()),
+            'created_ts': SERVER_TIMESTAMP
         }
         
         if chat_id:
@@ -106,9 +396,19 @@ class VocabDatabase:
             new_chat_ref.set(new_chat)
             return new_chat_ref.key
 
-    def get_user_chats(self, user_id: str) -> List[dict]:
-        """獲取用戶的所有聊天會話"""
-        chats_ref = self.db.child('chats').child(user_id).get()
+    @metered
+    def get_user_chats(self, user_id: str, limit: Optional[int] = None) -> List[dict]:
+        """依建立時間由新到舊獲取用戶的聊天會話，最多 limit 筆（None 代表全部）
+
+        以 created_ts 排序的查詢只傳回最近的 limit 筆，聊天再多也不必每次 rerun 都全部下載。
+        還有沒有 created_ts 的舊聊天時（尚未執行 migrate_chats.py），排序查詢無法正確取出最近幾筆，
+        改為全部讀取後在本地排序，舊聊天排在最後。
+        """
+        chats_ref = self.db.child('chats').child(user_id)
+        if limit is None or self._has_legacy_chats(user_id):
+            chats_ref = chats_ref.get()
+        else:
+            chats_ref = chats_ref.order_by_child('created_ts').limit_to_last(limit).get()
         if not chats_ref:
             return []
         
@@ -116,21 +416,68 @@ class VocabDatabase:
         for chat_id, chat_data in chats_ref.items():
             chats.append({
                 'id': chat_id,
-                'name': chat_data['name'],
-                'created_at': chat_data['created_at']
+                'name': chat_data.get('name', ''),
+                'created_at': chat_data.get('created_at', ''),
+                'created_ts': chat_data.get('created_ts')
             })
-        return sorted(chats, key=lambda x: x['created_at'], reverse=True)
+        chats.sort(key=lambda x: (x['created_ts'] is not None, x['created_ts'] or 0, x['created_at']), reverse=True)
+        return chats if limit is None else chats[:limit]
 
+    def _has_legacy_chats(self, user_id: str) -> bool:
+        """用戶是否還有沒有 created_ts 的舊聊天；依 created_ts 排序時缺值的排在最前面，只需讀第一筆"""
+        if self.chat_timestamp_cache.get(user_id):
+            return False
+        first = self.db.child('chats').child(user_id).order_by_child('created_ts').limit_to_first(1).get() or {}
+        if any('created_ts' not in chat_data for chat_data in first.values()):
+            return True
+        self.chat_timestamp_cache.set(user_id, True)
+        return False
+
+    @metered
+    def count_user_chats(self, user_id: str) -> int:
+        """用戶的聊天數；shallow 讀取只下載聊天 ID，不含內容"""
+        return len(self.db.child('chats').child(user_id).get(shallow=True) or {})
+
+    def migrate_chat_timestamps(self, user_id: str, dry_run: bool = False) -> dict:
+        """為沒有 created_ts 的舊聊天補上由 created_at 換算的毫秒時間戳記（一次多路徑 update）
+
+        不含時區的 created_at 以 LEGACY_CHAT_TIMEZONE 解讀；缺少或無法解析 created_at 的聊天略過並列在 skipped。
+        全部遷移完成的用戶會記在 chat_timestamp_cache，之後讀取聊天列表不必再檢查舊聊天。
+        """
+        timezone = ZoneInfo(LEGACY_CHAT_TIMEZONE)
+        chats = self.db.child('chats').child(user_id).get() or {}
+        updates = {}
+        skipped = []
+        for chat_id, chat_data in chats.items():
+            if isinstance(chat_data, dict) and 'created_ts' in chat_data:
+                continue
+            try:
+                created_at = datetime.fromisoformat(chat_data['created_at'])
+            except (KeyError, TypeError, ValueError):
+                print(f"聊天 {user_id}/{chat_id} 缺少或無法解析 created_at，略過")
+                skipped.append(chat_id)
+                continue
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone)
+            updates[f'{chat_id}/created_ts'] = int(created_at.timestamp() * 1000)
+        if updates and not dry_run:
+            self.db.child('chats').child(user_id).update(updates)
+        if not skipped and not dry_run:
+            self.chat_timestamp_cache.set(user_id, True)
+        return {'chats': len(chats), 'migrated': len(updates), 'skipped': skipped}
+
+    @metered
     def add_chat_message(self, chat_id: str, role: str, content: str):
         """添加聊天消息"""
         messages_ref = self.db.child('messages').child(chat_id)
         new_message = {
             'role': role,
-            'content': content,
+            **encode_message_content(content),
             'created_at': str(datetime.now())
         }
         messages_ref.push().set(new_message)
 
+    @metered
     def get_chat_messages(self, chat_id: str) -> List[dict]:
         """獲取聊天會話的所有消息"""
         messages_ref = self.db.child('messages').child(chat_id).get()
@@ -141,16 +488,32 @@ class VocabDatabase:
         for msg_data in messages_ref.values():
             messages.append({
                 'role': msg_data['role'],
-                'content': msg_data['content'],
+                'content': decode_message_content(msg_data),
                 'created_at': msg_data['created_at']
             })
         return sorted(messages, key=lambda x: x['created_at'])
 
+    @metered
+    def get_chat_summary(self, chat_id: str) -> Optional[dict]:
+        """獲取聊天的滾動摘要：{'text', 'covered'（已摘要的訊息數）, 'updated_at'}"""
+        return self.db.child('chat_summaries').child(chat_id).get()
+
+    @metered
+    def set_chat_summary(self, chat_id: str, text: str, covered: int):
+        """儲存聊天的滾動摘要"""
+        self.db.child('chat_summaries').child(chat_id).set({
+            'text': text,
+            'covered': covered,
+            'updated_at': str(datetime.now())
+        })
+
+    @metered
     def delete_chat_session(self, chat_id: str) -> bool:
         """刪除聊天會話及其所有消息"""
         try:
-            # 刪除所有相關消息
+            # 刪除所有相關消息與摘要
             self.db.child('messages').child(chat_id).delete()
+            self.db.child('chat_summaries').child(chat_id).delete()
             
             # 找到並刪除聊天會話
             chats = self.db.child('chats').get()
@@ -162,6 +525,7 @@ class VocabDatabase:
         except Exception:
             return False
 
+    @metered
     def update_chat_name(self, chat_id: str, new_name: str) -> bool:
         """更新聊天會話名稱"""
         try:
@@ -56,11 +56,17 @@ from langgraph.prebuilt import tools_condition
 from langgraph.graph import END, StateGraph, START
 from langgraph.prebuilt import ToolNode
 import pprint
+import os
+import sys
+
+# 以 VOCAB_CASSETTE_MODE=record/replay 錄製或離線重播模型回應（見專案根目錄的 cassette.py）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cassette import cassette_chat_model, cassette_embeddings
 
 # 載入數據庫
 vectorstore = Chroma(
     persist_directory="./chroma_db",
-    embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"),
+    embedding_function=cassette_embeddings(OpenAIEmbeddings, model="text-embedding-3-small"),
     collection_name="rag-example"
 )
 # 創建檢索器
@@ -99,7 +105,7 @@ def grade_documents(state) -> Literal["generate", "rewrite"]:
         binary_score: str = Field(description="相關性評分 'yes' 或 'no'")
 
     # LLM
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=True)
+    model = cassette_chat_model(ChatOpenAI, temperature=0, model="gpt-4o-mini", streaming=True)
 
     # 帶有工具和驗證的 LLM
     llm_with_tool = model.with_structured_output(grade)
@@ -149,7 +155,7 @@ def agent(state):
     """
     print(" *** 調用代理 *** ")
     messages = state["messages"]
-    model = ChatOpenAI(temperature=0, streaming=True, model="gpt-4o-mini")
+    model = cassette_chat_model(ChatOpenAI, temperature=0, streaming=True, model="gpt-4o-mini")
     model = model.bind_tools(tools)
     response = model.invoke(messages)
     # 我們返回一個列表，因為這將被添加到現有列表中
@@ -183,7 +189,7 @@ def rewrite(state):
     ]
 
     # 評分器
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=True)
+    model = cassette_chat_model(ChatOpenAI, temperature=0, model="gpt-4o-mini", streaming=True)
     response = model.invoke(msg)
     return {"messages": [response]}
 
@@ -208,7 +214,7 @@ def generate(state):
     prompt = hub.pull("rlm/rag-prompt")
 
     # LLM
-    llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0, streaming=True)
+    llm = cassette_chat_model(ChatOpenAI, model_name="gpt-4o-mini", temperature=0, streaming=True)
 
     # 後處理
     def format_docs(docs):
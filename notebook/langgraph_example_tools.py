@@ -12,6 +12,12 @@ from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
+import os
+import sys
+
+# 以 VOCAB_CASSETTE_MODE=record/replay 錄製或離線重播模型回應（見專案根目錄的 cassette.py）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cassette import cassette_chat_model
 
 # 定義狀態類型
 class State(TypedDict):
@@ -82,7 +88,7 @@ date_tool = Tool(
 
 # 設置工具和LLM
 tools = [math_tool, date_tool]
-llm = ChatOpenAI(model="gpt-4o-mini")
+llm = cassette_chat_model(ChatOpenAI, model="gpt-4o-mini")
 llm_with_tools = llm.bind_tools(tools + [RequestAssistance])
 
 # 定義聊天機器人節點
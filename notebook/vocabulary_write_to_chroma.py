@@ -1,7 +1,10 @@
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embeddings import get_embeddings, get_collection_name
 
 def load_vocabulary_files():
     documents = []
@@ -32,11 +35,11 @@ def main():
     # 載入詞彙文件
     documents = load_vocabulary_files()
     
-    # 創建向量存儲
+    # 創建向量存儲（VOCAB_EMBEDDING_PROVIDER=local 時可離線建立）
     vectorstore = Chroma.from_documents(
         documents=documents,
-        collection_name="vocabulary_v1",
-        embedding=OpenAIEmbeddings(model="text-embedding-3-small"),
+        collection_name=get_collection_name(),
+        embedding=get_embeddings(),
         persist_directory="./chroma_db"
     )
     
@@ -0,0 +1,7 @@
+def percentile(values: list[float], pct: float) -> float:
+    """最近排名法的百分位數（values 為空時回傳 0）；效能測試與批次查詢共用"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,153 @@
+import random
+from typing import Literal
+
+from lexicon import Lexicon, LexiconEntry, entry_definition, entry_pos, POS_NAMES_ZH
+
+QuizKind = Literal["choice", "fill", "matching"]
+QUIZ_KINDS: list[QuizKind] = ["choice", "fill", "matching"]
+
+_KIND_TITLES = {
+    "choice": "【第一種：選擇題】",
+    "fill": "【第二種：填空題】",
+    "matching": "【第三種：配對題】",
+}
+_OPTION_LABELS = "ABCDE"
+
+
+def _pos_zh(entry: LexiconEntry) -> str:
+    return "、".join(POS_NAMES_ZH[p] for p in entry_pos(entry)) or "片語"
+
+
+def _senses_zh(entry: LexiconEntry) -> str:
+    """只取中文定義，不含詞性"""
+    return "；".join(sense for sense, _ in entry["senses"])
+
+
+def pick_distractors(lexicon: Lexicon, entry: LexiconEntry, count: int,
+                     rng: random.Random) -> list[LexiconEntry]:
+    """挑選干擾選項：優先同主題同詞性，不足時放寬為同主題、再放寬為全部詞條"""
+    pos = set(entry_pos(entry))
+    same_topic = [e for e in lexicon.topic_entries(entry["topic"]) if e is not entry]
+    pools = [
+        [e for e in same_topic if pos & set(entry_pos(e))],
+        same_topic,
+        [e for e in lexicon.entries if e is not entry],
+    ]
+
+    chosen: list[LexiconEntry] = []
+    seen = {entry["word"].lower()}
+    seen_definitions = {_senses_zh(entry)}
+    for pool in pools:
+        candidates = [
+            e for e in pool
+            if e["word"].lower() not in seen and _senses_zh(e) not in seen_definitions
+        ]
+        rng.shuffle(candidates)
+        for candidate in candidates[:count - len(chosen)]:
+            chosen.append(candidate)
+            seen.add(candidate["word"].lower())
+            seen_definitions.add(_senses_zh(candidate))
+        if len(chosen) >= count:
+            break
+    return chosen
+
+
+def _choice_section(lexicon: Lexicon, entries: list[LexiconEntry], rng: random.Random) -> tuple[list[str], list[str]]:
+    questions = ["說明：每題皆有四個選項，請選出最適當的答案", "--------------------"]
+    answers = ["【選擇題答案】"]
+    for number, entry in enumerate(entries, start=1):
+        options = [entry] + pick_distractors(lexicon, entry, 3, rng)
+        rng.shuffle(options)
+        correct = _OPTION_LABELS[options.index(entry)]
+
+        questions.append(f"{number}. 「{_senses_zh(entry)}」（{_pos_zh(entry)}）的英文是哪一個？  ")
+        questions.extend(f"   {_OPTION_LABELS[i]}) {option['word']}  " for i, option in enumerate(options))
+        questions.append("")
+
+        answers.append(f"{number}. {correct}  ")
+        others = "、".join(
+            f"{option['word']}（{_senses_zh(option)}）" for option in options if option is not entry
+        )
+        answers.append(f"解釋：{entry['word']} 的意思是「{entry_definition(entry)}」。其他選項：{others}。")
+        answers.append("")
+    return questions, answers
+
+
+def _fill_section(entries: list[LexiconEntry]) -> tuple[list[str], list[str]]:
+    questions = ["說明：請依提示填入適當的英文單字或片語", "--------------------"]
+    answers = ["【填空題答案】"]
+    for number, entry in enumerate(entries, start=1):
+        word = entry["word"]
+        letters = sum(ch.isalpha() for ch in word)
+        questions.append(
+            f"{number}. ________   ----- (提示：{_senses_zh(entry)}，{_pos_zh(entry)}，"
+            f"以 {word[0]} 開頭，共 {letters} 個字母)"
+        )
+        questions.append("")
+        answers.append(f"{number}. {word}  ")
+        answers.append(f"解釋：{word} 的意思是「{entry_definition(entry)}」。")
+        answers.append("")
+    return questions, answers
+
+
+def _matching_section(entries: list[LexiconEntry], rng: random.Random) -> tuple[list[str], list[str]]:
+    questions = ["說明：請將上方的單字與下方的解釋配對，在橫線上填入對應的選項代號", "--------------------", "單字："]
+    shuffled = list(entries)
+    rng.shuffle(shuffled)
+    labels = {id(entry): _OPTION_LABELS[i] for i, entry in enumerate(shuffled)}
+
+    questions.extend(f"{number}. ________ {entry['word']}  " for number, entry in enumerate(entries, start=1))
+    questions.append("")
+    questions.append("解釋：")
+    questions.extend(f"{labels[id(entry)]}) {_senses_zh(entry)}  " for entry in shuffled)
+    questions.append("")
+
+    key = "  ".join(f"{number}. {labels[id(entry)]}" for number, entry in enumerate(entries, start=1))
+    answers = ["【配對題答案】", f"{key}  ", "解釋："]
+    answers.extend(
+        f"- {entry['word']} ({labels[id(entry)]})：{entry_definition(entry)}" for entry in entries
+    )
+    answers.append("")
+    return questions, answers
+
+
+def build_quiz(lexicon: Lexicon, topic: str, kind: QuizKind | None = None,
+               count: int = 5, seed: int | None = None) -> str:
+    """以本地詞彙庫生成與 SYSTEM_PROMPTS["quiz"] 格式相同的測驗（不需要 LLM）"""
+    rng = random.Random(seed)
+    kind = kind or rng.choice(QUIZ_KINDS)
+    topic_entries = lexicon.topic_entries(topic)
+    if len(topic_entries) < count:
+        raise ValueError(f"主題 '{topic}' 的單字不足以出題")
+
+    # 同一份測驗中避免出現中文定義相同的單字，以免答案不唯一
+    entries = []
+    definitions = set()
+    for entry in rng.sample(topic_entries, len(topic_entries)):
+        if _senses_zh(entry) in definitions:
+            continue
+        entries.append(entry)
+        definitions.add(_senses_zh(entry))
+        if len(entries) == count:
+            break
+
+    if kind == "choice":
+        questions, answers = _choice_section(lexicon, entries, rng)
+    elif kind == "fill":
+        questions, answers = _fill_section(entries)
+    else:
+        questions, answers = _matching_section(entries, rng)
+
+    topic_name = lexicon.topics[topic]["name_zh"]
+    lines = [
+        f"### 📝 {topic_name} 單字測驗",
+        "",
+        "===== 測驗開始 =====",
+        "",
+        f"{_KIND_TITLES[kind]}(共{len(entries)}題)",
+        *questions,
+        "===== 答案與解釋 =====",
+        "",
+        *answers,
+    ]
+    return "\n".join(lines).rstrip() + "\n"
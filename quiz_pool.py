@@ -0,0 +1,210 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable
+
+from metrics import QUIZ_POOL_REFILL_LAG
+
+QUIZ_POOL_DIR = os.getenv("VOCAB_QUIZ_POOL_DIR", "./.quiz_pool")
+# 每個主題保留的現成測驗數量
+QUIZ_POOL_CAPACITY = int(os.getenv("VOCAB_QUIZ_POOL_CAPACITY", "3"))
+# 一份測驗最多提供給幾位不同用戶，之後就汰換
+QUIZ_POOL_MAX_SERVES = int(os.getenv("VOCAB_QUIZ_POOL_MAX_SERVES", "20"))
+
+
+class QuizPool:
+    """每個主題預先生成的測驗池：存放在磁碟，由背景執行緒非同步補充"""
+
+    def __init__(self, generator: Callable[[str], str], pool_dir: str = QUIZ_POOL_DIR,
+                 capacity: int = QUIZ_POOL_CAPACITY, max_serves: int = QUIZ_POOL_MAX_SERVES):
+        self.generator = generator
+        self.pool_dir = pool_dir
+        self.capacity = capacity
+        self.max_serves = max_serves
+
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        # 已排入補充佇列的主題 -> 排入時間，避免重複排隊
+        self._pending: dict[str, float] = {}
+        self._worker = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.refill_lags: list[float] = []
+
+    def _topic_dir(self, topic: str) -> str:
+        return os.path.join(self.pool_dir, topic)
+
+    def _load(self, topic: str) -> list[dict]:
+        """讀取某主題目前的所有測驗（依建立時間排序）"""
+        topic_dir = self._topic_dir(topic)
+        if not os.path.isdir(topic_dir):
+            return []
+        quizzes = []
+        for filename in os.listdir(topic_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(topic_dir, filename), "r", encoding="utf-8") as f:
+                    quizzes.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(quizzes, key=lambda x: x["created_at"])
+
+    def _save(self, quiz: dict):
+        """以暫存檔 + rename 的方式寫入，避免讀到寫到一半的檔案"""
+        topic_dir = self._topic_dir(quiz["topic"])
+        os.makedirs(topic_dir, exist_ok=True)
+        path = os.path.join(topic_dir, f"{quiz['id']}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(quiz, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _remove(self, quiz: dict):
+        try:
+            os.remove(os.path.join(self._topic_dir(quiz["topic"]), f"{quiz['id']}.json"))
+        except FileNotFoundError:
+            pass
+
+    def size(self, topic: str) -> int:
+        """某主題目前存放的測驗數量"""
+        return len(self._load(topic))
+
+    def available(self, topic: str, user_id: str | None = None) -> int:
+        """某主題還能提供給 user_id 的測驗數量（不指定用戶時為全部）"""
+        return sum(1 for q in self._load(topic) if user_id is None or user_id not in q["served_to"])
+
+    def _evict(self, topic: str):
+        """超過容量時先汰換提供過最多次的測驗，次數相同時汰換較舊的"""
+        quizzes = self._load(topic)
+        excess = len(quizzes) - self.capacity
+        if excess <= 0:
+            return
+        for quiz in sorted(quizzes, key=lambda q: (-len(q["served_to"]), q["created_at"]))[:excess]:
+            self._remove(quiz)
+
+    def take(self, topic: str, user_id: str) -> str | None:
+        """從池中取一份該用戶沒做過的測驗；沒有時回傳 None，並排入背景補充"""
+        with self._lock:
+            quiz = next(
+                (q for q in self._load(topic) if user_id not in q["served_to"]),
+                None
+            )
+            if quiz is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                quiz["served_to"].append(user_id)
+                if len(quiz["served_to"]) >= self.max_serves:
+                    self._remove(quiz)
+                else:
+                    self._save(quiz)
+
+        self.request_refill(topic, user_id)
+        return quiz["content"] if quiz else None
+
+    def mark_served(self, content: str, user_id: str) -> bool:
+        """把同一份測驗（例如合併請求共用的結果）記到 user_id 名下；該用戶做過這份測驗時回傳 False"""
+        with self._lock:
+            topics = os.listdir(self.pool_dir) if os.path.isdir(self.pool_dir) else []
+            for topic in topics:
+                quiz = next((q for q in self._load(topic) if q["content"] == content), None)
+                if quiz is None:
+                    continue
+                if user_id in quiz["served_to"]:
+                    return False
+                quiz["served_to"].append(user_id)
+                if len(quiz["served_to"]) >= self.max_serves:
+                    self._remove(quiz)
+                else:
+                    self._save(quiz)
+                return True
+        return True
+
+    def add(self, topic: str, content: str, served_to: list[str] | None = None):
+        """加入一份測驗，例如同步生成的測驗；超過容量時汰換（見 _evict）"""
+        quiz = {
+            "id": str(uuid.uuid4()),
+            "topic": topic,
+            "content": content,
+            "served_to": list(served_to or []),
+            "created_at": str(datetime.now()),
+        }
+        with self._lock:
+            self._save(quiz)
+            self._evict(topic)
+
+    def request_refill(self, topic: str, user_id: str | None = None):
+        """測驗池不足容量，或 user_id 已做完所有現成測驗時，排入背景補充
+
+        只為做完所有測驗的用戶多補一份（新測驗汰換提供過最多次的，總數不超過容量）；
+        若每次取用都依該用戶補滿，每次命中都會生成一份新測驗並汰換剛提供過的，served_to 的紀錄也跟著消失。
+        """
+        with self._lock:
+            if topic in self._pending:
+                return
+            missing = self.capacity - self.size(topic)
+            if user_id is not None and self.available(topic, user_id) == 0:
+                missing = max(missing, 1)
+            if missing <= 0:
+                return
+            self._pending[topic] = time.monotonic()
+        self._ensure_worker()
+        self._queue.put((topic, missing))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="quiz-pool-refill", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """背景補充：一次補滿一個主題"""
+        while True:
+            topic, missing = self._queue.get()
+            try:
+                # 生成的數量在排入時就決定，汰換不會讓迴圈停不下來
+                for _ in range(missing):
+                    content = self.generator(topic)
+                    self.add(topic, content)
+                    self.refills += 1
+            except Exception as e:
+                self.refill_errors += 1
+                print(f"補充測驗池失敗（{topic}）：{str(e)}")
+            finally:
+                with self._lock:
+                    requested_at = self._pending.pop(topic, None)
+                    if requested_at is not None:
+                        lag = time.monotonic() - requested_at
+                        QUIZ_POOL_REFILL_LAG.observe(lag)
+                        self.refill_lags.append(lag)
+                        # 只保留最近的紀錄
+                        del self.refill_lags[:-100]
+                self._queue.task_done()
+
+    def wait_idle(self):
+        """等待目前排入的補充工作完成（測試與預熱使用）"""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        """測驗池命中率與補充延遲"""
+        with self._lock:
+            total = self.hits + self.misses
+            lags = sorted(self.refill_lags)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "refills": self.refills,
+                "refill_errors": self.refill_errors,
+                "pending_topics": len(self._pending),
+                "refill_lag_p50": lags[len(lags) // 2] if lags else 0.0,
+                "refill_lag_max": lags[-1] if lags else 0.0,
+            }
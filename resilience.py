@@ -0,0 +1,257 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+from metrics import registry
+
+# 哪些用途的 LLM 呼叫可以對沖（輸出短、重送成本低的路由與單字查詢）；留空代表關閉
+HEDGE_PURPOSES = set(filter(None, os.getenv("VOCAB_HEDGE_PURPOSES", "router,search,search_fill").split(",")))
+# 對沖延遲取該用途最近延遲的第幾百分位數
+HEDGE_PERCENTILE = float(os.getenv("VOCAB_HEDGE_PERCENTILE", "95"))
+# 樣本不足時的對沖延遲與延遲下限（秒）
+HEDGE_DEFAULT_DELAY = float(os.getenv("VOCAB_HEDGE_DEFAULT_DELAY", "3"))
+HEDGE_MIN_DELAY = float(os.getenv("VOCAB_HEDGE_MIN_DELAY", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("VOCAB_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WORKERS = int(os.getenv("VOCAB_HEDGE_WORKERS", "16"))
+
+CIRCUIT_BREAKER_ENABLED = os.getenv("VOCAB_CIRCUIT_BREAKER", "1") == "1"
+# 統計視窗內的呼叫數達到下限、且失敗率超過門檻時斷路
+CIRCUIT_FAILURE_RATE = float(os.getenv("VOCAB_CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("VOCAB_CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_WINDOW = float(os.getenv("VOCAB_CIRCUIT_WINDOW", "30"))
+# 斷路後多久放一個試探請求
+CIRCUIT_OPEN_SECONDS = float(os.getenv("VOCAB_CIRCUIT_OPEN_SECONDS", "30"))
+
+HEDGES = registry.counter(
+    "vocab_llm_hedges_total", "對沖請求：送出第二個請求的次數與最後由誰勝出", ["purpose", "winner"]
+)
+HEDGE_DELAY = registry.gauge("vocab_llm_hedge_delay_seconds", "目前的對沖延遲", ["purpose"])
+CIRCUIT_STATE = registry.gauge("vocab_circuit_state", "斷路器狀態（0 關閉、1 半開、2 開啟）", ["circuit"])
+CIRCUIT_REJECTED = registry.counter("vocab_circuit_rejected_total", "斷路時直接改用後備回答的次數", ["circuit", "purpose"])
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """斷路器開啟中，請求沒有送出"""
+
+
+def is_provider_error(error: BaseException) -> bool:
+    """是否為模型供應商或網路造成的錯誤（逾時、連線失敗、5xx 與 429）；只有這類錯誤會改用後備回答並計入斷路器
+
+    程式錯誤與 cassette.CassetteMiss（重播時找不到錄製）等其他例外照常拋出。
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        httpx = None
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class LatencyTracker:
+    """每個用途最近 window 次成功呼叫的延遲"""
+
+    def __init__(self, window: int = 200):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque] = {}
+
+    def observe(self, purpose: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(purpose, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, purpose: str, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(purpose, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+class CircuitBreaker:
+    """依滑動視窗內的失敗率斷路：開啟時直接失敗，經過 open_seconds 後放一個試探請求（半開），成功即恢復"""
+
+    def __init__(self, name: str, failure_rate: float = CIRCUIT_FAILURE_RATE, min_calls: int = CIRCUIT_MIN_CALLS,
+                 window: float = CIRCUIT_WINDOW, open_seconds: float = CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._calls: deque[tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: str):
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+        if state != CLOSED:
+            print(f"斷路器 {self.name}：{state}")
+
+    def allow(self) -> bool:
+        """是否可以送出請求；半開時只允許一個試探請求（停用斷路器時一律允許）"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return True
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """請求以非供應商錯誤結束：不影響統計，但放開半開狀態的試探名額"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool):
+        """記錄一次呼叫結果；停用斷路器時不記錄，之後啟用時才不會從過時的統計或開啟狀態開始"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self._calls.clear()
+                    self._set_state(CLOSED)
+                else:
+                    self._opened_at = now
+                    self._set_state(OPEN)
+                return
+            self._calls.append((now, ok))
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._calls.popleft()
+            failures = sum(1 for _, success in self._calls if not success)
+            if (self._state == CLOSED and len(self._calls) >= self.min_calls
+                    and failures / len(self._calls) >= self.failure_rate):
+                self._opened_at = now
+                self._set_state(OPEN)
+
+
+class ResilientCaller:
+    """LLM 呼叫的對沖與斷路
+
+    對沖：呼叫超過該用途最近延遲的 p95 仍未完成時送出第二個相同請求，採用先完成的結果
+    （落後的請求無法中途取消，會跑完後丟棄）。
+    斷路：失敗率過高時不再送出請求，直接改用呼叫端提供的後備回答（快取或本地結果）。
+    """
+
+    def __init__(self, breaker: CircuitBreaker | None = None, workers: int = HEDGE_WORKERS,
+                 hedge_purposes: set[str] | None = None, percentile: float = HEDGE_PERCENTILE):
+        self.breaker = breaker or CircuitBreaker("llm")
+        self.hedge_purposes = HEDGE_PURPOSES if hedge_purposes is None else hedge_purposes
+        self.percentile = percentile
+        self.latencies = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def hedge_delay(self, purpose: str) -> float:
+        value = self.latencies.percentile(purpose, self.percentile)
+        delay = HEDGE_DEFAULT_DELAY if value is None else max(HEDGE_MIN_DELAY, value)
+        HEDGE_DELAY.labels(purpose).set(delay)
+        return delay
+
+    def _submit(self, fn: Callable[[], Any]) -> Future:
+        # 每個請求各自複製 context（同一個 Context 不能同時在兩個執行緒中執行）
+        return self._executor.submit(contextvars.copy_context().run, fn)
+
+    def _timed(self, purpose: str, fn: Callable[[], Any]) -> Callable[[], Any]:
+        def run():
+            start = time.perf_counter()
+            result = fn()
+            self.latencies.observe(purpose, time.perf_counter() - start)
+            return result
+        return run
+
+    def _hedged(self, purpose: str, fn: Callable[[], Any]) -> Any:
+        timed = self._timed(purpose, fn)
+        primary = self._submit(timed)
+        try:
+            return primary.result(timeout=self.hedge_delay(purpose))
+        except TimeoutError:
+            pass
+
+        self.hedged += 1
+        hedge = self._submit(timed)
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = "hedge" if future is hedge else "primary"
+                    if winner == "hedge":
+                        self.hedge_wins += 1
+                    HEDGES.labels(purpose, winner).inc()
+                    return future.result()
+                error = future.exception()
+        HEDGES.labels(purpose, "failed").inc()
+        raise error
+
+    def call(self, purpose: str, fn: Callable[[], Any], fallback: Callable[[], Any] | None = None) -> Any:
+        """執行 fn；斷路中或供應商錯誤時改用 fallback（沒有 fallback 時拋出例外），其他例外直接拋出"""
+        if not self.breaker.allow():
+            self.rejected += 1
+            CIRCUIT_REJECTED.labels(self.breaker.name, purpose).inc()
+            if fallback is None:
+                raise CircuitOpenError(f"{self.breaker.name} 斷路中，暫停呼叫 {purpose}")
+            return fallback()
+
+        try:
+            if purpose in self.hedge_purposes and self.breaker.state == CLOSED:
+                result = self._hedged(purpose, fn)
+            else:
+                result = self._timed(purpose, fn)()
+        except Exception as e:
+            if not is_provider_error(e):
+                self.breaker.release()
+                raise
+            self.breaker.record(False)
+            if fallback is None:
+                raise
+            return fallback()
+        self.breaker.record(True)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+        }
@@ -0,0 +1,157 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Literal
+
+from langchain_core.documents import Document
+
+from lexicon import Lexicon, load_lexicon, entry_definition, alias_topics
+
+# 檢索模式：hybrid（詞彙 + 向量融合）、lexical（僅詞彙索引）、vector（僅向量）
+RetrievalMode = Literal["hybrid", "lexical", "vector"]
+RETRIEVAL_MODE: RetrievalMode = os.getenv("VOCAB_RETRIEVAL_MODE", "hybrid")
+
+_LATIN_PATTERN = re.compile(r"[a-z0-9]+")
+_CJK_PATTERN = re.compile(r"[一-鿿]+")
+
+# 查詢中常見、但對判斷主題沒有幫助的詞
+STOPWORDS = {
+    "the", "a", "an", "of", "and", "or", "to", "in", "on", "for", "about",
+    "related", "vocabulary", "vocab", "words", "word", "quiz", "test", "english",
+    "相關", "單字", "詞彙", "領域", "測驗", "方面", "主題", "英文", "一些",
+    "我想", "想學", "給我", "請給", "專業", "用語", "的單", "的詞", "關的",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """切詞：英文以單字為單位，中文以雙字（bigram）為單位"""
+    text = text.lower()
+    tokens = _LATIN_PATTERN.findall(text)
+    for run in _CJK_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+class BM25Index:
+    """簡易 BM25 倒排索引"""
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(documents)
+        self.doc_lengths = []
+        # 詞 -> [(文件索引, 詞頻)]
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+
+        for idx, doc in enumerate(documents):
+            counts = Counter(tokenize(doc))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((idx, tf))
+
+        total = sum(self.doc_lengths)
+        self.avg_length = total / self.doc_count if self.doc_count else 0.0
+        self.idf = {
+            term: math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 10) -> list[tuple[int, float]]:
+        """回傳分數最高的 k 個 (文件索引, 分數)"""
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / self.avg_length)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """以 Reciprocal Rank Fusion 合併多個排序結果"""
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+class HybridRetriever:
+    """結合本地 BM25 與向量檢索的主題檢索器，介面與 LangChain retriever 的 invoke 相同"""
+
+    def __init__(self, lexicon: Lexicon,
+                 vector_retriever_factory: Callable[[], object] | None = None,
+                 mode: RetrievalMode = RETRIEVAL_MODE, k: int = 1):
+        self.lexicon = lexicon
+        self.mode = mode
+        self.k = k
+        self._vector_retriever_factory = vector_retriever_factory
+        self._vector_retriever = None
+
+        # 文件：每個單字一份，另外每個主題名稱（中英文）各一份
+        self._doc_topics = []
+        documents = []
+        for entry in lexicon.entries:
+            info = lexicon.topics[entry["topic"]]
+            documents.append(f"{entry['word']} {entry_definition(entry)} {info['name']} {info['name_zh']}")
+            self._doc_topics.append(entry["topic"])
+        for topic, info in lexicon.topics.items():
+            # 主題名稱重複幾次，讓直接命中主題名稱的查詢權重較高
+            documents.append(" ".join([topic.replace("_", " "), info["name"], info["name_zh"]] * 3))
+            self._doc_topics.append(topic)
+        self.index = BM25Index(documents)
+        self.aliases = lexicon.topic_aliases()
+
+    def lexical_topics(self, query: str, k: int = 50) -> list[tuple[str, float]]:
+        """以 BM25 命中的詞條分數加總出主題排序；查詢提到類別說法（別名表）的主題排在前面"""
+        topic_scores: dict[str, float] = defaultdict(float)
+        for idx, score in self.index.search(query, k=k):
+            topic_scores[self._doc_topics[idx]] += score
+        # 例如「商業」只出現在教育主題的 business 詞條，單靠 BM25 會排到教育主題
+        named = alias_topics(query, self.aliases)
+        ranking = [(topic, topic_scores.get(topic, 0.0)) for topic in named]
+        rest = [(topic, score) for topic, score in topic_scores.items() if topic not in named]
+        return ranking + sorted(rest, key=lambda x: x[1], reverse=True)
+
+    def vector_documents(self, query: str) -> list[Document]:
+        """以向量檢索取得主題文件（需要一次 embedding 呼叫）"""
+        if self._vector_retriever is None:
+            self._vector_retriever = self._vector_retriever_factory()
+        return self._vector_retriever.invoke(query)
+
+    def invoke(self, query: str) -> list[Document]:
+        """依檢索模式回傳前 k 個主題的完整詞彙文件"""
+        lexical = [topic for topic, _ in self.lexical_topics(query)] if self.mode != "vector" else []
+        vector_docs = {}
+        if self._vector_retriever_factory is not None and not (self.mode == "lexical" and lexical):
+            for doc in self.vector_documents(query):
+                vector_docs.setdefault(doc.metadata.get("topic"), doc)
+
+        if not vector_docs:
+            ranking = lexical
+        elif not lexical:
+            ranking = list(vector_docs)
+        else:
+            ranking = [topic for topic, _ in reciprocal_rank_fusion([lexical, list(vector_docs)])]
+
+        docs = []
+        for topic in ranking[:self.k]:
+            info = self.lexicon.topics.get(topic)
+            if info:
+                docs.append(Document(page_content=info["content"], metadata={"topic": topic}))
+            elif topic in vector_docs:
+                docs.append(vector_docs[topic])
+        return docs
+
+
+def build_hybrid_retriever(vector_retriever_factory: Callable[[], object] | None = None,
+                           mode: RetrievalMode = RETRIEVAL_MODE, k: int = 1) -> HybridRetriever:
+    """以預設詞彙庫建立混合檢索器"""
+    return HybridRetriever(load_lexicon(), vector_retriever_factory, mode=mode, k=k)
@@ -0,0 +1,36 @@
+"""容器進入點：先預熱，再於同一個行程啟動 Streamlit
+
+Streamlit 要等第一個使用者連線才會執行 app.py，因此預熱改在這裡觸發；
+預熱的模組與連線留在同一個行程中，app.py 直接沿用。
+預設等預熱完成才開始監聽 PORT，讓只檢查埠號的啟動探測（例如 Cloud Run）也不會把請求送進冷的實例；
+另外在指標伺服器上提供 /ready（預熱完成才回 200）與 /live。
+"""
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from metrics import start_metrics_server
+from warmup import start_warmup, wait_ready
+
+# 是否等預熱完成才啟動 Streamlit
+WARMUP_BLOCKING = os.getenv("VOCAB_WARMUP_BLOCKING", "1") == "1"
+WARMUP_TIMEOUT = float(os.getenv("VOCAB_WARMUP_TIMEOUT", "180"))
+
+
+def main() -> int:
+    start_metrics_server()
+    start_warmup()
+    if WARMUP_BLOCKING and not wait_ready(WARMUP_TIMEOUT):
+        print("預熱未完成或失敗，仍啟動 Streamlit；/ready 會持續回報 503")
+
+    from streamlit.web import cli as stcli
+    port = os.getenv("PORT", "8080")
+    sys.argv = ["streamlit", "run", "--server.port", port, "app.py", *sys.argv[1:]]
+    return stcli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合併同時進行中的相同請求：同一個 key 只執行一次，其他呼叫者等待並共用結果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再通知，之後的新請求會重新執行而不是拿到舊結果
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """執行次數與被合併的請求數"""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+def canonical_text(text: str) -> str:
+    """標準化查詢字串：忽略大小寫與多餘空白"""
+    return " ".join(text.lower().split())
+
+
+def coalesce(group: SingleFlight, name: str, fn: Callable[[str], str],
+             canonicalize: Callable[[str], str] = canonical_text,
+             on_shared: Callable[[str, str], str] | None = None) -> Callable[[str], str]:
+    """包裝單一參數的工具函式，以 (工具名稱, 標準化參數) 合併同時進行的相同請求
+
+    on_shared(arg, result)：被合併的呼叫者拿到共用結果後的處理（例如依用戶記錄），回傳給該呼叫者的結果。
+    """
+    def wrapper(arg: str) -> str:
+        leader = False
+
+        def run():
+            nonlocal leader
+            leader = True
+            return fn(arg)
+
+        result = group.do((name, canonicalize(arg)), run)
+        if on_shared is not None and not leader:
+            return on_shared(arg, result)
+        return result
+
+    wrapper.__name__ = getattr(fn, "__name__", name)
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
@@ -0,0 +1,77 @@
+import time
+from typing import Literal, TypedDict
+
+# 複習評分（SM-2）：again 代表忘記，會重新開始間隔
+Grade = Literal["again", "hard", "good", "easy"]
+GRADE_QUALITY: dict[str, int] = {"again": 1, "hard": 3, "good": 4, "easy": 5}
+GRADE_LABELS_ZH: dict[str, str] = {"again": "忘記了", "hard": "困難", "good": "記得", "easy": "很簡單"}
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DAY_MS = 24 * 60 * 60 * 1000
+# 忘記時十分鐘後再複習一次
+RELEARN_DELAY_MS = 10 * 60 * 1000
+
+
+class ReviewState(TypedDict):
+    """每個單字的複習狀態；due 為下次複習時間（毫秒 epoch），讓資料庫能依此排序建立索引"""
+    due: int
+    interval: float
+    ease: float
+    reps: int
+    lapses: int
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def new_review_state(now: int | None = None) -> ReviewState:
+    """新加入的單字立即可以複習"""
+    return {
+        "due": now_ms() if now is None else now,
+        "interval": 0.0,
+        "ease": DEFAULT_EASE,
+        "reps": 0,
+        "lapses": 0,
+    }
+
+
+def schedule(state: ReviewState | None, grade: Grade, now: int | None = None) -> ReviewState:
+    """依 SM-2 計算下一次複習：間隔 1 天、6 天，之後乘上 ease；忘記時重設間隔並降低 ease"""
+    now = now_ms() if now is None else now
+    state = dict(state) if state else new_review_state(now)
+    quality = GRADE_QUALITY[grade]
+
+    ease = state["ease"] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    ease = max(MIN_EASE, round(ease, 3))
+
+    if quality < 3:
+        return {
+            "due": now + RELEARN_DELAY_MS,
+            "interval": 0.0,
+            "ease": ease,
+            "reps": 0,
+            "lapses": state["lapses"] + 1,
+        }
+
+    reps = state["reps"] + 1
+    if reps == 1:
+        interval = 1.0
+    elif reps == 2:
+        interval = 6.0
+    else:
+        interval = state["interval"] * ease
+    if grade == "hard":
+        interval = max(1.0, interval * 0.8)
+    elif grade == "easy":
+        interval *= 1.3
+    interval = round(interval, 2)
+
+    return {
+        "due": now + int(interval * DAY_MS),
+        "interval": interval,
+        "ease": ease,
+        "reps": reps,
+        "lapses": state["lapses"],
+    }
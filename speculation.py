@@ -0,0 +1,179 @@
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from chat_memory import estimate_tokens
+from metrics import registry
+
+# 可推測執行的路徑；測驗會消耗用戶的測驗池，預設不推測
+SPECULATION_ROUTES = set(os.getenv(
+    "VOCAB_SPECULATION_ROUTES",
+    "generate,search_vocabulary_details,category_vocabulary_list"
+).split(","))
+SPECULATION_WORKERS = int(os.getenv("VOCAB_SPECULATION_WORKERS", "4"))
+
+# 不經過工具、由 generate_response 直接回答的路徑
+GENERATE_ROUTE = "generate"
+
+SPECULATIONS = registry.counter(
+    "vocab_speculations_total", "推測執行次數與結果（hit：路由器選了相同路徑）", ["route", "outcome"]
+)
+SPECULATION_WASTED_TOKENS = registry.counter(
+    "vocab_speculation_wasted_tokens_total", "推測錯誤時被丟棄的輸出 token 數（估計）", ["route"]
+)
+
+_LATIN_WORD = re.compile(r"[A-Za-z][A-Za-z\-']*(?: [A-Za-z][A-Za-z\-']*){0,2}")
+QUIZ_KEYWORDS = ("測驗", "考我", "考考", "quiz", "練習題")
+CATEGORY_KEYWORDS = ("相關單字", "相關的單字", "相關詞彙", "領域", "主題", "方面的")
+LOOKUP_KEYWORDS = ("意思", "是什麼", "查詢", "解釋", "怎麼用", "meaning")
+
+
+def predict_route(query: str) -> tuple[str, str]:
+    """以關鍵字快速猜測路由器會選的路徑，回傳 (路徑, 參數)；猜不到工具時為 generate"""
+    lowered = query.lower()
+    if any(keyword in lowered for keyword in QUIZ_KEYWORDS):
+        return "vocabulary_quiz_generator", query
+    if any(keyword in lowered for keyword in CATEGORY_KEYWORDS):
+        return "category_vocabulary_list", query
+    words = _LATIN_WORD.findall(query)
+    stripped = query.strip().strip("'\"“”‘’「」?？")
+    if len(words) == 1 and (stripped == words[0] or any(keyword in lowered for keyword in LOOKUP_KEYWORDS)):
+        return "search_vocabulary_details", words[0]
+    return GENERATE_ROUTE, query
+
+
+class _Slot:
+    """單一請求的推測狀態；由 process_vocab_query 建立，各節點透過 ContextVar 共用"""
+
+    def __init__(self):
+        self.route: str | None = None
+        self.key: Any = None
+        self.future: Future | None = None
+        self.hit = False
+
+
+class Speculator:
+    """在路由器呼叫進行時先執行最可能的路徑
+
+    路由器選了相同路徑（工具名稱與標準化參數都相同）時，工具與 generate 節點直接取用推測結果；
+    選了其他路徑時取消尚未開始的工作，已開始的結果丟棄並記錄浪費的 token。
+    """
+
+    def __init__(self, workers: int = SPECULATION_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculation")
+        self._tools: dict[str, tuple[Callable[[str], str], Callable[[str], Any]]] = {}
+        self._current: ContextVar[_Slot | None] = ContextVar("speculation_slot", default=None)
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted_tokens = 0
+
+    def begin(self):
+        """為目前的請求建立推測狀態（需在執行工作流程之前呼叫）"""
+        self._current.set(_Slot())
+
+    def wrap(self, name: str, fn: Callable[[str], str],
+             canonicalize: Callable[[str], Any]) -> Callable[[str], str]:
+        """註冊可推測的工具，回傳會優先取用推測結果的工具函式"""
+        self._tools[name] = (fn, canonicalize)
+
+        def wrapper(arg: str) -> str:
+            slot = self._current.get()
+            # 只有命中同一個工具時才需要計算標準化參數
+            if slot is not None and slot.hit and slot.route == name:
+                result = self.claim(name, canonicalize(arg))
+                if result is not None:
+                    return result
+            return fn(arg)
+
+        wrapper.__name__ = getattr(fn, "__name__", name)
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+
+    def start(self, route: str, arg: str, fn: Callable[[], str] | None = None) -> bool:
+        """開始推測執行；工具路徑使用 wrap 註冊的函式，generate 路徑需提供 fn"""
+        slot = self._current.get()
+        if slot is None or route not in SPECULATION_ROUTES:
+            return False
+        if route == GENERATE_ROUTE:
+            if fn is None:
+                return False
+            key = None
+            task = fn
+        elif route in self._tools:
+            tool_fn, canonicalize = self._tools[route]
+            key = canonicalize(arg)
+            task = lambda: tool_fn(arg)
+        else:
+            return False
+
+        slot.route, slot.key = route, key
+        # 在複製的 context 中執行，讓工具取得目前的用戶
+        context = contextvars.copy_context()
+        slot.future = self._executor.submit(context.run, task)
+        with self._lock:
+            self.started += 1
+        return True
+
+    def resolve(self, route: str, arg: str | None = None):
+        """路由器做出決定後呼叫：相同路徑保留結果，否則取消或丟棄"""
+        slot = self._current.get()
+        if slot is None or slot.future is None:
+            return
+        key = None
+        if route == slot.route and route in self._tools and arg is not None:
+            key = self._tools[route][1](arg)
+        if slot.route == route and slot.key == key:
+            slot.hit = True
+            with self._lock:
+                self.hits += 1
+            SPECULATIONS.labels(slot.route, "hit").inc()
+            return
+
+        future, wasted_route = slot.future, slot.route
+        slot.future = None
+        with self._lock:
+            self.misses += 1
+        if future.cancel():
+            SPECULATIONS.labels(wasted_route, "cancelled").inc()
+            return
+        SPECULATIONS.labels(wasted_route, "miss").inc()
+        future.add_done_callback(lambda f: self._record_waste(wasted_route, f))
+
+    def _record_waste(self, route: str, future: Future):
+        if future.exception() is not None:
+            return
+        tokens = estimate_tokens(str(future.result()))
+        with self._lock:
+            self.wasted_tokens += tokens
+        SPECULATION_WASTED_TOKENS.labels(route).inc(tokens)
+
+    def claim(self, route: str, key: Any = None) -> str | None:
+        """取用已確認命中的推測結果；沒有可用結果時回傳 None（推測失敗時改為正常執行）"""
+        slot = self._current.get()
+        if slot is None or not slot.hit or slot.future is None:
+            return None
+        if slot.route != route or slot.key != key:
+            return None
+        future, slot.future = slot.future, None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"推測執行失敗，改為正常執行：{str(e)}")
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+                "wasted_tokens": self.wasted_tokens,
+            }
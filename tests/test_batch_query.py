@@ -0,0 +1,31 @@
+import json
+
+import batch_query
+
+
+def fake_run_query(item, default_user_id):
+    return {"id": item["id"], "query": item["query"], "response": "ok", "error": None, "elapsed": 0.01}
+
+
+def test_resume_from_truncated_output(tmp_path, monkeypatch):
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text("".join(json.dumps({"id": f"q{i}", "query": f"query {i}"}) + "\n" for i in range(3)),
+                       encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    # 上次在寫 q1 時中斷
+    output.write_text(json.dumps(fake_run_query({"id": "q0", "query": "query 0"}, "batch")) + "\n"
+                      + '{"id": "q1", "que', encoding="utf-8")
+    monkeypatch.setattr(batch_query, "run_query", fake_run_query)
+
+    assert batch_query.main([str(queries), str(output), "--resume"]) == 0
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert sorted(record["id"] for record in records) == ["q0", "q1", "q2"]
+    assert batch_query.load_completed_ids(str(output)) == {"q0", "q1", "q2"}
+
+
+def test_truncate_partial_line_keeps_complete_files(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text('{"id": "q0"}\n', encoding="utf-8")
+    batch_query.truncate_partial_line(str(output))
+    assert output.read_text(encoding="utf-8") == '{"id": "q0"}\n'
@@ -0,0 +1,28 @@
+from lexicon import find_aliases
+
+ALIASES = {
+    "business": "work_career",
+    "travel": "travel_transportation",
+    "food": "food_dining",
+    "daily life": "daily_life",
+    "daily": "daily_life",
+    "it": "technology_digital",
+    "商業": "work_career",
+}
+
+
+def test_find_aliases_matches_english_aliases_next_to_punctuation():
+    assert find_aliases("business-related words", ALIASES) == ["business"]
+    assert find_aliases("travel, please", ALIASES) == ["travel"]
+    assert find_aliases("(food)", ALIASES) == ["food"]
+    assert find_aliases("生成business測驗", ALIASES) == ["business"]
+
+
+def test_find_aliases_requires_whole_english_words():
+    assert find_aliases("quit smoking", ALIASES) == []
+    assert find_aliases("businesses", ALIASES) == []
+
+
+def test_find_aliases_skips_aliases_inside_longer_matches():
+    assert find_aliases("Daily life tips", ALIASES) == ["daily life"]
+    assert find_aliases("生成商業英文測驗", ALIASES) == ["商業"]
@@ -0,0 +1,35 @@
+import models
+from fake_firebase import FakeDatabase
+
+
+def test_legacy_chat_probe_is_cached_across_instances(monkeypatch):
+    # app.py 每次 rerun 都會建立新的 VocabDatabase
+    monkeypatch.setattr(models, "DB_BACKEND", "memory")
+    monkeypatch.setattr(models, "_memory_database_instance", FakeDatabase())
+    database = models._memory_database()
+    models.VocabDatabase().create_chat_session("probe_user", "new chat")
+
+    database.reset_stats()
+    models.VocabDatabase().get_user_chats("probe_user", limit=5)
+    first = database.stats()["round_trips"]
+    database.reset_stats()
+    models.VocabDatabase().get_user_chats("probe_user", limit=5)
+
+    assert database.stats()["round_trips"] == first - 1
+
+
+def test_legacy_chats_fall_back_to_a_full_read():
+    database = FakeDatabase()
+    db = models.VocabDatabase(database.reference())
+    chats = database.reference().child("chats").child("u1")
+    for i in range(3):
+        chats.child(f"old{i}").set({"name": f"old{i}", "created_at": f"2024-01-0{i + 1} 10:00:00"})
+    chats.child("broken").set({"name": "broken"})
+    for i in range(3):
+        db.create_chat_session("u1", f"new{i}")
+
+    assert [chat["name"] for chat in db.get_user_chats("u1", limit=4)] == ["new2", "new1", "new0", "old2"]
+
+    stats = db.migrate_chat_timestamps("u1")
+    assert stats["migrated"] == 3
+    assert stats["skipped"] == ["broken"]
@@ -0,0 +1,54 @@
+from metrics import QUIZ_POOL_REFILL_LAG, registry
+from quiz_pool import QuizPool
+
+
+def refill_lag_count() -> int:
+    child = QUIZ_POOL_REFILL_LAG.labels()
+    with child.lock:
+        return sum(child.counts)
+
+
+def test_refill_lag_is_exported(tmp_path):
+    pool = QuizPool(lambda topic: f"{topic} quiz", pool_dir=str(tmp_path), capacity=2)
+    before = refill_lag_count()
+
+    pool.request_refill("daily_life")
+    pool.wait_idle()
+
+    assert pool.size("daily_life") == 2
+    assert refill_lag_count() == before + 1
+    assert "vocab_quiz_pool_refill_lag_seconds_count" in registry.render()
+
+
+def test_hits_keep_served_to_and_do_not_churn_the_pool(tmp_path):
+    generated = []
+
+    def generator(topic):
+        generated.append(topic)
+        return f"{topic} quiz {len(generated)}"
+
+    pool = QuizPool(generator, pool_dir=str(tmp_path), capacity=3)
+    pool.request_refill("daily_life")
+    pool.wait_idle()
+    assert len(generated) == 3
+
+    for user_id in ("alice", "bob"):
+        assert pool.take("daily_life", user_id) is not None
+        pool.wait_idle()
+
+    # 每位用戶還有沒做過的測驗，不需要補充
+    assert len(generated) == 3
+    served = sorted(user for quiz in pool._load("daily_life") for user in quiz["served_to"])
+    assert served == ["alice", "bob"]
+
+
+def test_user_who_has_seen_every_quiz_gets_a_new_one(tmp_path):
+    pool = QuizPool(lambda topic: "quiz", pool_dir=str(tmp_path), capacity=2)
+    for _ in range(2):
+        pool.add("daily_life", "quiz", served_to=["alice"])
+
+    assert pool.take("daily_life", "alice") is None
+    pool.wait_idle()
+
+    assert pool.size("daily_life") == 2
+    assert pool.available("daily_life", "alice") == 1
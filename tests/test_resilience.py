@@ -0,0 +1,25 @@
+import resilience
+from resilience import CLOSED, OPEN, CircuitBreaker
+
+
+def test_breaker_opens_on_failures():
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=2)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_disabled_breaker_does_not_record(monkeypatch):
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=2)
+    monkeypatch.setattr(resilience, "CIRCUIT_BREAKER_ENABLED", False)
+    for _ in range(5):
+        breaker.record(False)
+    assert breaker.allow()
+
+    # 之後啟用時不會從停用期間累積的失敗開始
+    monkeypatch.setattr(resilience, "CIRCUIT_BREAKER_ENABLED", True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CLOSED
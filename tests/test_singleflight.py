@@ -0,0 +1,63 @@
+import threading
+import time
+
+from quiz_pool import QuizPool
+from singleflight import SingleFlight, coalesce
+
+
+def run_concurrently(fn, args):
+    results = {}
+
+    def call(arg):
+        results[arg] = fn(arg)
+
+    threads = [threading.Thread(target=call, args=(arg,)) for arg in args]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_coalesce_shares_one_execution_and_calls_on_shared_for_followers():
+    group = SingleFlight()
+    started = threading.Event()
+    shared = []
+
+    def slow(arg):
+        started.set()
+        time.sleep(0.2)
+        return "quiz"
+
+    def on_shared(arg, result):
+        shared.append(arg)
+        return result
+
+    # 標準化後都是同一個鍵，不同用戶的請求也會合併
+    wrapped = coalesce(group, "quiz", slow, lambda arg: "work_career", on_shared)
+    leader = threading.Thread(target=wrapped, args=("leader",))
+    leader.start()
+    started.wait()
+    results = run_concurrently(wrapped, ["alice", "bob", "carol"])
+    leader.join()
+
+    assert set(results.values()) == {"quiz"}
+    assert group.stats()["executions"] == 1
+    assert group.stats()["coalesced"] == 3
+    assert sorted(shared) == ["alice", "bob", "carol"]
+
+
+def test_followers_are_recorded_in_the_quiz_pool(tmp_path):
+    pool = QuizPool(lambda topic: "other quiz", pool_dir=str(tmp_path), capacity=3)
+    pool.add("work_career", "quiz", served_to=["leader"])
+
+    assert pool.mark_served("quiz", "alice")
+    assert pool.mark_served("quiz", "bob")
+    # 已做過這份測驗的用戶不重複記錄
+    assert not pool.mark_served("quiz", "alice")
+    # 不在測驗池中的結果（例如後備測驗）不需要記錄
+    assert pool.mark_served("template quiz", "alice")
+
+    quiz, = pool._load("work_career")
+    assert quiz["served_to"] == ["leader", "alice", "bob"]
+    assert pool.available("work_career", "alice") == 0
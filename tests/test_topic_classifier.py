@@ -0,0 +1,31 @@
+import pytest
+
+from topic_classifier import load_topic_classifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return load_topic_classifier()
+
+
+@pytest.mark.parametrize("query, topic", [
+    ("商業", "work_career"),
+    ("business", "work_career"),
+    ("生成商業英文測驗", "work_career"),
+    ("business-related words", "work_career"),
+    ("travel,", "travel_transportation"),
+    ("職場關係", "work_career"),
+])
+def test_classify_alias_queries(classifier, query, topic):
+    assert classifier.classify(query) == topic
+
+
+@pytest.mark.parametrize("query", ["shopping", "marketing", "vaccine", "dating marriage", "你好"])
+def test_classify_leaves_uncertain_queries_to_retrieval(classifier, query):
+    # 這些查詢的中心向量第一名分數都不低，但主題是錯的
+    assert classifier.classify(query) is None
+
+
+@pytest.mark.parametrize("query", ["商業", "business-related words", "職場關係", "daily work", "旅遊飲食"])
+def test_classifier_and_lexical_retrieval_agree_on_aliases(classifier, query):
+    assert classifier.classify(query) == classifier.retriever.lexical_topics(query)[0][0]
@@ -0,0 +1,76 @@
+from functools import lru_cache
+
+import numpy as np
+
+from embeddings import LocalHashEmbeddings
+from lexicon import Lexicon, load_lexicon, entry_definition, alias_topics
+from retrieval import HybridRetriever
+
+# 向量分類的最低相似度與第一、二名的最小差距，不足時交回完整檢索
+# 以詞彙庫詞條（英文單字、中文定義）量測：最高分中位數約 0.06–0.09，第 90 百分位約 0.11–0.17；
+# 0.15 且差距 0.05 以上時英文單字約三分之二分對（中文很少達到），其餘仍會分錯，所以另外要求與詞彙檢索一致
+MIN_SIMILARITY = 0.15
+MIN_MARGIN = 0.05
+
+
+class TopicClassifier:
+    """以別名表與預先計算的主題中心向量判斷類別查詢屬於哪個主題"""
+
+    def __init__(self, lexicon: Lexicon, embedder: LocalHashEmbeddings | None = None,
+                 retriever: HybridRetriever | None = None):
+        self.embedder = embedder or LocalHashEmbeddings()
+        self.topics = list(lexicon.topics)
+        # 向量判斷需與詞彙檢索的第一名一致才採用（只用到本地 BM25，不會呼叫向量檢索）
+        self.retriever = retriever or HybridRetriever(lexicon)
+
+        self.aliases = lexicon.topic_aliases()
+
+        # 主題中心向量：該主題詞條向量的平均減去全體平均（去除各主題共有的 n-gram），再正規化
+        self.centroids = np.zeros((len(self.topics), self.embedder.dim), dtype=np.float32)
+        if lexicon.entries:
+            vectors = self.embedder.embed_matrix(
+                [f"{entry['word']} {entry_definition(entry)}" for entry in lexicon.entries]
+            )
+            labels = np.array([self.topics.index(entry["topic"]) for entry in lexicon.entries])
+            overall = vectors.mean(axis=0)
+            for row in range(len(self.topics)):
+                members = vectors[labels == row]
+                if len(members) == 0:
+                    continue
+                centroid = members.mean(axis=0) - overall
+                norm = np.linalg.norm(centroid)
+                if norm > 0:
+                    self.centroids[row] = centroid / norm
+
+    def match_alias(self, query: str) -> str | None:
+        """以別名表判斷主題；命中多個主題時的取捨與詞彙檢索相同（見 lexicon.alias_topics）"""
+        topics = alias_topics(query, self.aliases)
+        return topics[0] if topics else None
+
+    def scores(self, query: str) -> np.ndarray:
+        """查詢與每個主題中心向量的餘弦相似度"""
+        return self.centroids @ self.embedder.embed_matrix([query])[0]
+
+    def classify(self, query: str) -> str | None:
+        """回傳判斷出的主題；不夠確定時回傳 None"""
+        topic = self.match_alias(query)
+        if topic or not self.topics:
+            return topic
+
+        scores = self.scores(query)
+        order = np.argsort(scores)[::-1]
+        best = scores[order[0]]
+        runner_up = scores[order[1]] if len(order) > 1 else 0.0
+        if best < MIN_SIMILARITY or best - runner_up < MIN_MARGIN:
+            return None
+        # 中心向量只是雜湊 n-gram 的平均，分數高也常會分錯（例如 "shopping" 判成教育），
+        # 與詞彙檢索的第一名一致才略過完整檢索
+        topic = self.topics[order[0]]
+        lexical = self.retriever.lexical_topics(query)
+        return topic if lexical and lexical[0][0] == topic else None
+
+
+@lru_cache(maxsize=None)
+def load_topic_classifier() -> TopicClassifier:
+    """以預設詞彙庫建立並快取主題分類器"""
+    return TopicClassifier(load_lexicon())
@@ -0,0 +1,51 @@
+def parse_vocab_response(response: str) -> dict:
+    """解析工具回應的內容,區分是否為結構化單字資訊"""
+    try:
+        lines = response.split('\n')
+        vocab_info = {
+            "is_word": False,  # 預設為非結構化單字
+            "word": None,
+            "definition": None,
+            "examples": [],
+            "part_of_speech": None,
+            "related_words": None,
+            "tips": None,
+            "content": response  # 保存原始回應
+        }
+        
+        # 檢查是否包含結構化單字資訊的關鍵標記
+        if "單字：" in response and "定義：" in response:
+            vocab_info["is_word"] = True
+            
+            for line in lines:
+                line = line.strip()
+                if not line or line == "---":
+                    continue
+                    
+                if line.startswith("單字："):
+                    vocab_info["word"] = line.replace("單字：", "").strip()
+                elif line.startswith("詞性："):
+                    vocab_info["part_of_speech"] = line.replace("詞性：", "").strip()
+                elif line.startswith("定義："):
+                    vocab_info["definition"] = line.replace("定義：", "").strip()
+                elif line.startswith("相關詞彙："):
+                    vocab_info["related_words"] = line.replace("相關詞彙：", "").strip()
+                elif line.startswith("使用建議："):
+                    vocab_info["tips"] = line.replace("使用建議：", "").strip()
+                elif line.startswith("-> "):
+                    example = line.replace("-> ", "").strip()
+                    vocab_info["examples"].append(example)
+                elif line.startswith("   (中文翻譯：") and line.endswith(")"):
+                    if vocab_info["examples"]:
+                        translation = line.replace("   (中文翻譯：", "").rstrip(")")
+                        last_example = vocab_info["examples"][-1]
+                        vocab_info["examples"][-1] = f"{last_example}\n{translation}"
+                        
+        return vocab_info
+        
+    except Exception as e:
+        print(f"解析錯誤：{str(e)}")
+        return {
+            "is_word": False,
+            "content": response
+        }
@@ -0,0 +1,141 @@
+import importlib
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+from metrics import registry, register_route
+
+# 預熱時額外跑一次完整查詢（會呼叫 LLM）；留空時只跑不需要 LLM 的本地查詢
+WARMUP_QUERY = os.getenv("VOCAB_WARMUP_QUERY", "")
+WARMUP_USER_ID = "__warmup__"
+
+READY = registry.gauge("vocab_ready", "預熱完成且可以接受請求時為 1")
+WARMUP_STEP_SECONDS = registry.gauge("vocab_warmup_step_seconds", "預熱各步驟耗時", ["step"])
+
+
+class WarmupState:
+    """記錄預熱進度；ready 只在必要步驟（資料庫、工作流程）都成功後才成立"""
+
+    def __init__(self):
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.steps: dict[str, dict] = {}
+        self.done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.done.is_set() and all(
+            step["ok"] for step in self.steps.values() if step["required"]
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "finished": self.done.is_set(),
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "steps": self.steps,
+        }
+
+
+state = WarmupState()
+
+
+def _step(name: str, fn: Callable[[], object], required: bool = True):
+    start = time.perf_counter()
+    try:
+        fn()
+        state.steps[name] = {"ok": True, "required": required}
+    except Exception as e:
+        state.steps[name] = {"ok": False, "required": required, "error": str(e)}
+        print(f"預熱步驟 {name} 失敗：{str(e)}")
+    elapsed = time.perf_counter() - start
+    state.steps[name]["seconds"] = round(elapsed, 3)
+    WARMUP_STEP_SECONDS.labels(name).set(elapsed)
+
+
+def _local_query(graph):
+    """不呼叫 LLM 的查詢：詞彙庫、主題分類、混合檢索與回應解析"""
+    from lexicon import load_lexicon
+    from topic_classifier import load_topic_classifier
+    from vocab_parser import parse_vocab_response
+
+    lexicon = load_lexicon()
+    load_topic_classifier().classify("商業")
+    graph.setup_hybrid_retriever().invoke("商業")
+    lexicon.lookup("deadline")
+    parse_vocab_response(graph.format_search_card("deadline", "名詞", "截止期限", [], "", ""))
+
+
+def _full_query(graph):
+    from langchain_core.messages import HumanMessage
+
+    graph.process_vocab_query({
+        "messages": [HumanMessage(content=WARMUP_QUERY)],
+        "user_id": WARMUP_USER_ID,
+        "thread_id": WARMUP_USER_ID,
+    })
+
+
+def warm_up():
+    """載入工作流程、初始化資料庫連線、開啟檢索器、建立模型客戶端並編譯工作流程"""
+    state.started_at = time.time()
+    print(" *** 開始預熱 *** ")
+    modules = {}
+    _step("import", lambda: modules.setdefault("graph", importlib.import_module("graph")))
+    graph = modules.get("graph")
+    if graph is None:
+        return
+
+    # 讀取一個不存在的路徑，建立資料庫連線；以側邊欄相同的排序查詢，缺少 created_ts 索引時會在這裡失敗
+    _step("database", lambda: graph.db.get_user_chats(WARMUP_USER_ID, limit=1))
+    _step("compile_graph", graph.get_vocab_chain)
+    _step("retriever", graph.setup_hybrid_retriever, required=False)
+    _step("model_client", lambda: graph.create_chat_model("warmup"), required=False)
+    _step("local_query", lambda: _local_query(graph), required=False)
+    if WARMUP_QUERY:
+        _step("full_query", lambda: _full_query(graph), required=False)
+
+
+def _run():
+    try:
+        warm_up()
+    finally:
+        state.finished_at = time.time()
+        state.done.set()
+        READY.set(1 if state.ready else 0)
+        print(f" *** 預熱完成：{'ready' if state.ready else 'not ready'}，"
+              f"{state.finished_at - state.started_at:.1f} 秒 *** ")
+
+
+def _ready_route() -> tuple[int, str, str]:
+    body = json.dumps(state.to_dict(), ensure_ascii=False) + "\n"
+    return (200 if state.ready else 503), "application/json; charset=utf-8", body
+
+
+def _live_route() -> tuple[int, str, str]:
+    return 200, "text/plain; charset=utf-8", "ok\n"
+
+
+register_route("/ready", _ready_route)
+register_route("/live", _live_route)
+
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def start_warmup() -> threading.Thread:
+    """在背景執行預熱；重複呼叫（例如 Streamlit rerun）只會執行一次"""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def wait_ready(timeout: float | None = None) -> bool:
+    """等待預熱完成，回傳是否 ready"""
+    state.done.wait(timeout)
+    return state.ready